@@ -1,27 +1,20 @@
 import os
-import json
+import click
+from contextlib import contextmanager
 from flask import Flask, session
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_babel import Babel
+from sqlalchemy import inspect, text
 from werkzeug.middleware.proxy_fix import ProxyFix
 from config import config
 from models import db, User
+from services.translations import catalog as translation_catalog
 
 migrate = Migrate()
 login_manager = LoginManager()
 babel = Babel()
 
-# Load translations
-translations = {}
-try:
-    basedir = os.path.abspath(os.path.dirname(__file__))
-    with open(os.path.join(basedir, 'translations.json'), 'r', encoding='utf-8') as f:
-        translations = json.load(f)
-except Exception as e:
-    print(f"Warning: Could not load translations.json: {e}")
-
-
 class URLPrefixMiddleware:
     """Force SCRIPT_NAME when the app is mounted below a URL prefix."""
 
@@ -68,28 +61,19 @@ def create_app(config_name='default'):
     # Add translation function to Jinja2
     @app.context_processor
     def inject_translations():
-        def _(text):
-            locale = get_locale() or app.config['BABEL_DEFAULT_LOCALE']
-            if text in translations and locale in translations[text]:
-                return translations[text][locale]
-            return text
         current_locale = get_locale() or app.config['BABEL_DEFAULT_LOCALE']
+        # Resolve the locale's dict once per render, not once per string.
+        strings = translation_catalog(current_locale)
+
+        def _(text):
+            return strings.get(text, text)
         return dict(_=_, current_locale=current_locale)
     
     @app.context_processor
     def inject_platform_settings():
         """Inject platform settings into all templates"""
-        from models import PlatformSettings
-        settings = {}
-        platform_name = PlatformSettings.query.filter_by(key='platform_name').first()
-        platform_logo = PlatformSettings.query.filter_by(key='platform_logo').first()
-        footer_text = PlatformSettings.query.filter_by(key='footer_text').first()
-        
-        settings['PLATFORM_NAME'] = platform_name.value if platform_name else 'CTF Platform'
-        settings['PLATFORM_LOGO'] = platform_logo.value if platform_logo else None
-        settings['FOOTER_TEXT'] = footer_text.value if footer_text else '100% Written by AI · Made with ♥ by Matt'
-        
-        return dict(config=settings)
+        from services.platform_settings import template_settings
+        return dict(config=template_settings())
     
     # Login manager configuration
     login_manager.login_view = 'auth.login'
@@ -97,7 +81,8 @@ def create_app(config_name='default'):
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        from services.identity import load_identity
+        return load_identity(int(user_id))
     
     # Register blueprints
     from routes.auth import auth_bp
@@ -113,19 +98,87 @@ def create_app(config_name='default'):
     app.register_blueprint(teams_bp, url_prefix='/')
     
     # Serve uploaded files
-    from flask import send_from_directory
+    from services.uploads import serve_upload, static_cache_headers, version_url_defaults
     @app.route('/uploads/<path:filename>')
     def uploaded_file(filename):
         """Serve uploaded files"""
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        return serve_upload(filename)
+    
+    # Content-versioned upload / static URLs are cached as immutable
+    app.url_defaults(version_url_defaults)
+    app.after_request(static_cache_headers)
+    
+    @app.cli.command('rebuild-scores')
+    def rebuild_scores_command():
+        """Rebuild the materialized leaderboard scores from submissions"""
+        from services.scoring import rebuild_all
+        count = rebuild_all()
+        db.session.commit()
+        print(f"Rebuilt leaderboard scores for {count} competitions.")
+    
+    @app.cli.command('dify-worker')
+    @click.option('--max-in-flight', type=int, default=None, help='Global cap on outstanding Dify requests')
+    @click.option('--max-per-host', type=int, default=None, help='Cap on outstanding requests per hook host')
+    def dify_worker_command(max_in_flight, max_per_host):
+        """Run the asyncio Dify review executor (DIFY_EXECUTOR=async)"""
+        import asyncio
+        from services.dify_async import AsyncReviewer
+        
+        async def run():
+            async with AsyncReviewer(app, max_in_flight, max_per_host) as reviewer:
+                print(f"Reviewing with up to {reviewer.max_in_flight} requests in flight "
+                      f"({reviewer.max_per_host} per host).")
+                await reviewer.run()
+        
+        asyncio.run(run())
+    
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create missing tables, the default admin and platform settings; backfill scores into new score tables"""
+        provision_database(app)
+        print("Database initialized.")
     
-    # Create admin user if not exists
-    with app.app_context():
+    # No database I/O here: every web worker, Celery worker and test builds the app.
+    # Provisioning is `flask init-db` / `python init_db.py`.
+    return app
+
+
+# pg_advisory_lock key serializing `flask init-db` across replicas started together
+PROVISION_LOCK_KEY = 0x43544601
+
+
+@contextmanager
+def provisioning_lock():
+    """Hold a PostgreSQL advisory lock while provisioning; other databases are not shared by replicas"""
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    with db.engine.connect() as conn:
+        conn.execute(text('SELECT pg_advisory_lock(:key)'), {'key': PROVISION_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': PROVISION_LOCK_KEY})
+
+
+def provision_database(app):
+    """Create missing tables and seed the default admin and settings (idempotent)
+
+    The materialized leaderboard scores are backfilled only when this run
+    created their tables: rebuilding bumps every competition version, so doing
+    it on each start would invalidate all caches and ETags mid-event. Use
+    `flask rebuild-scores` to rebuild them on purpose.
+    """
+    with provisioning_lock():
+        backfill = not inspect(db.engine).has_table('user_scores')
         db.create_all()
         create_default_admin(app)
         create_default_settings(app)
-    
-    return app
+        if backfill:
+            from services.scoring import rebuild_all
+            count = rebuild_all()
+            db.session.commit()
+            print(f"Backfilled leaderboard scores for {count} competitions.")
 
 
 def create_default_admin(app):
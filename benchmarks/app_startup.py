@@ -0,0 +1,125 @@
+"""Cold-start cost of the app: import time, ``create_app`` time and SQL run while building it.
+
+Every gunicorn worker, Celery worker process and test pays this. Each run is
+a fresh interpreter, so module imports are measured cold:
+
+    import app  →  create_app()  →  tasks.get_flask_app()  (a second app, as a Celery worker builds)
+
+``create_app`` must not touch the database (provisioning is ``flask init-db``
+/ ``python init_db.py``), so the statement count is expected to be 0 and any
+statement is reported as a regression.
+
+Usage:
+    python benchmarks/app_startup.py --runs 20
+    python benchmarks/app_startup.py --json /tmp/startup.json
+    python benchmarks/app_startup.py --baseline /tmp/startup.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+STEPS = ('import app', 'create_app', 'tasks.get_flask_app')
+
+# Runs in a fresh interpreter; prints one JSON line.
+CHILD = r'''
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda conn, cursor, statement, *args: statements.append(statement))
+
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app_module.create_app(sys.argv[2])
+created = time.perf_counter()
+import tasks
+tasks.get_flask_app()
+worker = time.perf_counter()
+print(json.dumps({
+    'import app': (imported - start) * 1000,
+    'create_app': (created - imported) * 1000,
+    'tasks.get_flask_app': (worker - created) * 1000,
+    'statements': len(statements),
+}))
+'''
+
+
+def run_once(config_name):
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, PROJECT_ROOT, config_name],
+        capture_output=True, text=True, check=True, cwd=PROJECT_ROOT,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(samples):
+    report = {}
+    for step in STEPS:
+        values = sorted(sample[step] for sample in samples)
+        report[step] = {
+            'runs': len(values),
+            'p50_ms': round(_percentile(values, 0.5), 2),
+            'p95_ms': round(_percentile(values, 0.95), 2),
+            'max_ms': round(values[-1], 2),
+        }
+    report['statements'] = max(sample['statements'] for sample in samples)
+    return report
+
+
+def print_report(report):
+    print(f'\n{"step":<22}{"n":>5}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}')
+    for step in STEPS:
+        row = report[step]
+        print(f'{step:<22}{row["runs"]:>5}{row["p50_ms"]:>10.2f}{row["p95_ms"]:>10.2f}{row["max_ms"]:>10.2f}')
+    print(f'SQL statements while starting: {report["statements"]}')
+
+
+def regressions(report, baseline, tolerance):
+    """Steps whose p95 grew by more than ``tolerance``, and any SQL run at startup."""
+    found = []
+    for step in STEPS:
+        before = baseline.get(step)
+        if before and report[step]['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            found.append(f'{step}: p95 {before["p95_ms"]:.2f} → {report[step]["p95_ms"]:.2f} ms')
+    if report['statements']:
+        found.append(f'startup ran {report["statements"]} SQL statements (expected none)')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--config', default='production', help='config name passed to create_app')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--baseline', help='report from an earlier run; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth over the baseline')
+    args = parser.parse_args()
+
+    samples = [run_once(args.config) for _ in range(args.runs)]
+
+    report = summarize(samples)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f'REGRESSION {line}')
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
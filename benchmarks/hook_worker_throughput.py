@@ -0,0 +1,109 @@
+"""Tasks per second one Celery worker process gets through ``trigger_external_hook``.
+
+Runs the task body in-process, as a solo worker would, against a stub Dify
+endpoint that auto-approves every answer. Compares building the Flask app per
+task (the old behaviour) with the per-process app from ``tasks.get_flask_app``.
+
+Usage:
+    python benchmarks/hook_worker_throughput.py --tasks 200 --latency-ms 20
+
+Uses a throwaway SQLite database by default (BENCH_DATABASE_URL to override);
+Redis is disabled unless --redis is given, so leaderboard fan-out is not measured.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+class StubDifyHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+        answer = json.dumps({'success': True, 'auto_approved': True, 'score': 100, 'feedback': 'stub'})
+        body = json.dumps({'answer': answer}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(latency_ms):
+    StubDifyHandler.latency = latency_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubDifyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def seed(app, count):
+    from models import db, Challenge, Competition, Submission, User
+    with app.app_context():
+        db.create_all()
+        competition = Competition(name='Hook bench', status='running')
+        db.session.add(competition)
+        db.session.flush()
+        challenge = Challenge(title='Hook bench', description='', points=100, competition_id=competition.id)
+        users = [User(username=f'hookbench{i}', email=f'hookbench{i}@bench.local', password_hash='x')
+                 for i in range(count)]
+        db.session.add(challenge)
+        db.session.add_all(users)
+        db.session.flush()
+        submissions = [Submission(user_id=user.id, challenge_id=challenge.id, answer_text='bench', status='pending')
+                       for user in users]
+        db.session.add_all(submissions)
+        db.session.commit()
+        return [submission.id for submission in submissions]
+
+
+def run(submission_ids, rebuild_app_per_task):
+    import tasks
+    start = time.perf_counter()
+    for submission_id in submission_ids:
+        if rebuild_app_per_task:
+            tasks._flask_app = None
+        result = tasks.trigger_external_hook(submission_id)
+        if not result.get('success'):
+            raise RuntimeError(result)
+    return len(submission_ids) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='stub Dify response time')
+    parser.add_argument('--redis', action='store_true', help='keep REDIS_URL (publishes leaderboard deltas)')
+    args = parser.parse_args()
+
+    server = start_stub(args.latency_ms)
+    database_url = os.environ.get('BENCH_DATABASE_URL', 'sqlite:////tmp/ctf_hook_bench.db')
+    if database_url == 'sqlite:////tmp/ctf_hook_bench.db' and os.path.exists('/tmp/ctf_hook_bench.db'):
+        os.remove('/tmp/ctf_hook_bench.db')
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['EXTERNAL_HOOK_URL'] = f'http://127.0.0.1:{server.server_address[1]}/v1/chat-messages'
+    if not args.redis:
+        os.environ['REDIS_URL'] = ''
+
+    import tasks
+    submission_ids = seed(tasks.get_flask_app(), args.tasks * 2)
+    per_task = run(submission_ids[:args.tasks], rebuild_app_per_task=True)
+    reused = run(submission_ids[args.tasks:], rebuild_app_per_task=False)
+    server.shutdown()
+
+    print(f'stub latency {args.latency_ms:.0f} ms, {args.tasks} tasks per mode')
+    print(f'{"app per task":<20}{per_task:>10.1f} tasks/s')
+    print(f'{"app per process":<20}{reused:>10.1f} tasks/s  ({reused / per_task:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
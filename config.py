@@ -5,6 +5,16 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 load_dotenv(os.path.join(basedir, '.env'))
 
 
+def _parse_host_sizes(value):
+    """Parse ``host[:port]=size,...`` into a dict."""
+    sizes = {}
+    for item in (value or '').split(','):
+        host, _, size = item.strip().rpartition('=')
+        if host and size.isdigit():
+            sizes[host.lower()] = int(size)
+    return sizes
+
+
 class Config:
     """Base configuration"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-me'
@@ -16,6 +26,11 @@ class Config:
     UPLOAD_FOLDER = os.path.join(basedir, os.environ.get('UPLOAD_FOLDER', 'uploads'))
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'txt', 'pdf', 'zip'}
+    # app: Flask sends upload bytes; x-accel / x-sendfile: hand them to NGINX / Apache (see nginx.conf.example)
+    UPLOAD_SERVE_MODE = os.environ.get('UPLOAD_SERVE_MODE', 'app').lower()
+    UPLOAD_ACCEL_PREFIX = os.environ.get('UPLOAD_ACCEL_PREFIX', '/_uploads/')
+    # Browser cache lifetime of content-versioned (?v=...) upload and static URLs
+    UPLOAD_CACHE_MAX_AGE = int(os.environ.get('UPLOAD_CACHE_MAX_AGE', 365 * 24 * 3600))
     URL_PREFIX = os.environ.get('CTF_URL_PREFIX', '').rstrip('/')
     APPLICATION_ROOT = URL_PREFIX or '/'
     SESSION_COOKIE_PATH = APPLICATION_ROOT
@@ -37,11 +52,63 @@ class Config:
     CELERY_BROKER_URL = REDIS_URL
     CELERY_RESULT_BACKEND = REDIS_URL
     
+    # Live leaderboard (Server-Sent Events over Redis pub/sub)
+    LEADERBOARD_STREAM_MAX_SECONDS = int(os.environ.get('LEADERBOARD_STREAM_MAX_SECONDS', 300))
+    LEADERBOARD_STREAM_HEARTBEAT_SECONDS = int(os.environ.get('LEADERBOARD_STREAM_HEARTBEAT_SECONDS', 15))
+    # Streams per gunicorn worker; keep it below --threads so plain requests always get a thread
+    LEADERBOARD_STREAM_MAX_PER_WORKER = int(os.environ.get('LEADERBOARD_STREAM_MAX_PER_WORKER', 8))
+    
+    # /api/competitions/<id>/stats: the submission count may lag new submissions by this long
+    STATS_REFRESH_SECONDS = int(os.environ.get('STATS_REFRESH_SECONDS', 10))
+    
+    # Shared leaderboard cache (Redis); the lock bounds how long workers wait for one rebuild
+    LEADERBOARD_CACHE_TTL = int(os.environ.get('LEADERBOARD_CACHE_TTL', 300))
+    LEADERBOARD_CACHE_LOCK_SECONDS = int(os.environ.get('LEADERBOARD_CACHE_LOCK_SECONDS', 5))
+    
+    # Logged-in user snapshot (flags, team, unlocked competitions) cached in Redis; changes invalidate it explicitly
+    IDENTITY_CACHE_SECONDS = int(os.environ.get('IDENTITY_CACHE_SECONDS', 300))
+    
+    # Competition reset: archive submissions in a Celery job, in id-range chunks of this size
+    COMPETITION_RESET_ASYNC = os.environ.get('COMPETITION_RESET_ASYNC', 'true').lower() == 'true'
+    COMPETITION_RESET_CHUNK_SIZE = int(os.environ.get('COMPETITION_RESET_CHUNK_SIZE', 1000))
+    
     # External hook (Dify integration)
     EXTERNAL_HOOK_ENABLED = os.environ.get('EXTERNAL_HOOK_ENABLED', 'false').lower() == 'true'
     EXTERNAL_HOOK_URL = os.environ.get('EXTERNAL_HOOK_URL', '')
     DIFY_API_KEY = os.environ.get('DIFY_API_KEY', '')
     UPLOAD_URL_PREFIX = os.environ.get('UPLOAD_URL_PREFIX', 'http://localhost:5000/uploads')
+    # blocking: wait for the whole answer; streaming: consume Dify's SSE events and persist progress as they arrive
+    DIFY_RESPONSE_MODE = os.environ.get('DIFY_RESPONSE_MODE', 'blocking').lower()
+    DIFY_STREAM_FLUSH_SECONDS = float(os.environ.get('DIFY_STREAM_FLUSH_SECONDS', 1.0))
+    # Failed Dify calls: retries with jittered exponential backoff, then the dead-letter list (/admin/dify/dead-letters)
+    DIFY_RETRY_MAX = int(os.environ.get('DIFY_RETRY_MAX', 5))
+    DIFY_RETRY_BACKOFF_SECONDS = float(os.environ.get('DIFY_RETRY_BACKOFF_SECONDS', 10))
+    DIFY_RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get('DIFY_RETRY_BACKOFF_MAX_SECONDS', 600))
+    # Circuit breaker per hook URL: open after N consecutive transient failures, probe again after the cool-down
+    DIFY_BREAKER_THRESHOLD = int(os.environ.get('DIFY_BREAKER_THRESHOLD', 5))
+    DIFY_BREAKER_COOLDOWN_SECONDS = float(os.environ.get('DIFY_BREAKER_COOLDOWN_SECONDS', 60))
+    # Reuse the verdict for identical resubmissions (same challenge, hook, answer and files) for this long; 0 disables
+    DIFY_DEDUP_TTL_SECONDS = int(os.environ.get('DIFY_DEDUP_TTL_SECONDS', 86400))
+    # Fair review queue (needs Redis): round-robin across competitions and players, first attempts first
+    DIFY_FAIR_QUEUE = os.environ.get('DIFY_FAIR_QUEUE', 'true').lower() == 'true'
+    DIFY_FAIR_MAX_IN_FLIGHT = int(os.environ.get('DIFY_FAIR_MAX_IN_FLIGHT', 32))
+    DIFY_FAIR_MAX_IN_FLIGHT_PER_USER = int(os.environ.get('DIFY_FAIR_MAX_IN_FLIGHT_PER_USER', 2))
+    DIFY_FAIR_INFLIGHT_TIMEOUT_SECONDS = int(os.environ.get('DIFY_FAIR_INFLIGHT_TIMEOUT_SECONDS', 1800))
+    # Batch re-review of a challenge (/admin/challenges/<id>/rereview): defaults for the admin form
+    DIFY_REREVIEW_CONCURRENCY = int(os.environ.get('DIFY_REREVIEW_CONCURRENCY', 4))
+    DIFY_REREVIEW_RATE_PER_MINUTE = int(os.environ.get('DIFY_REREVIEW_RATE_PER_MINUTE', 60))
+    # Review executor: 'celery' (one blocking call per task) or 'async' (flask dify-worker, many in flight)
+    DIFY_EXECUTOR = os.environ.get('DIFY_EXECUTOR', 'celery').lower()
+    DIFY_ASYNC_MAX_IN_FLIGHT = int(os.environ.get('DIFY_ASYNC_MAX_IN_FLIGHT', 100))
+    DIFY_ASYNC_MAX_PER_HOST = int(os.environ.get('DIFY_ASYNC_MAX_PER_HOST', 20))
+    # Threads running the executor's database / Redis work off the event loop (one DB connection each)
+    DIFY_ASYNC_DB_THREADS = int(os.environ.get('DIFY_ASYNC_DB_THREADS', 4))
+    # Keep-alive connection pool per hook host, e.g. DIFY_POOL_MAXSIZE_BY_HOST="dify.example.com=32,10.0.0.5:8080=8"
+    DIFY_POOL_MAXSIZE = int(os.environ.get('DIFY_POOL_MAXSIZE', 10))
+    DIFY_POOL_MAXSIZE_BY_HOST = _parse_host_sizes(os.environ.get('DIFY_POOL_MAXSIZE_BY_HOST'))
+    
+    # Platform name / logo / footer are cached per process this long; saving them in the admin reloads every worker
+    PLATFORM_SETTINGS_CACHE_SECONDS = float(os.environ.get('PLATFORM_SETTINGS_CACHE_SECONDS', 30))
     
     # Admin defaults
     ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'admin@ctf.local')
@@ -58,8 +125,21 @@ class ProductionConfig(Config):
     DEBUG = False
 
 
+class TestingConfig(Config):
+    """Testing configuration (in-memory SQLite, no CSRF)"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+    WTF_CSRF_ENABLED = False
+    EXTERNAL_HOOK_ENABLED = False
+    COMPETITION_RESET_ASYNC = False
+    DIFY_RETRY_MAX = 0  # Tests that exercise retries opt in
+    REDIS_URL = ''  # Redis-backed features fall back to the database path
+    DIFY_ASYNC_DB_THREADS = 1  # In-memory SQLite is one connection shared by every thread
+
+
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
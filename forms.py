@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, TextAreaField, IntegerField, DateTimeField, FileField, SelectField
+from wtforms import StringField, PasswordField, BooleanField, TextAreaField, IntegerField, DateTimeField, FileField, SelectField, SelectMultipleField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, Optional, ValidationError
 from flask_wtf.file import FileAllowed
 import re
@@ -99,6 +99,16 @@ class ReviewForm(FlaskForm):
     points_awarded = IntegerField('Points Awarded', validators=[Optional(), NumberRange(min=0)])
 
 
+class ReReviewForm(FlaskForm):
+    """Batch re-review form"""
+    statuses = SelectMultipleField('Submissions',
+                                   choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')],
+                                   default=['pending', 'approved', 'rejected'], validators=[DataRequired()])
+    dry_run = BooleanField('Dry run', default=True)
+    concurrency = IntegerField('Concurrency', validators=[DataRequired(), NumberRange(min=1, max=50)])
+    rate_per_minute = IntegerField('Requests per minute', validators=[DataRequired(), NumberRange(min=1, max=600)])
+
+
 class PlatformSettingsForm(FlaskForm):
     """Platform settings form"""
     platform_name = StringField('Platform Name', validators=[DataRequired(), Length(max=200)])
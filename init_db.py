@@ -54,6 +54,13 @@ def init_database():
         db.session.commit()
         print("✅ Platform settings created!")
         
+        # Backfill materialized leaderboard scores (safe to re-run)
+        print("\nRebuilding leaderboard scores...")
+        from services.scoring import rebuild_all
+        count = rebuild_all()
+        db.session.commit()
+        print(f"✅ Leaderboard scores rebuilt for {count} competitions!")
+        
         print("\n" + "="*50)
         print("✅ CTF Platform initialization completed!")
         print("="*50)
@@ -0,0 +1,38 @@
+"""Indexes for the hot submission / challenge access paths
+
+Revision ID: 0001_submission_access_indexes
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+Tables are created by ``db.create_all()`` (``init_db.py``); this revision only
+adds the indexes declared in ``models.py`` to databases created before they
+existed. ``if_not_exists`` keeps it a no-op on fresh databases.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_submission_access_indexes'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = (
+    ('ix_submissions_user_challenge_submitted', 'submissions', ['user_id', 'challenge_id', 'submitted_at']),
+    ('ix_submissions_challenge_status', 'submissions', ['challenge_id', 'status']),
+    ('ix_submissions_status_submitted', 'submissions', ['status', 'submitted_at']),
+    ('ix_submissions_status_reviewed', 'submissions', ['status', 'reviewed_at']),
+    ('ix_challenges_competition_active_order', 'challenges', ['competition_id', 'is_active', 'order_index']),
+    ('ix_competition_access_competition', 'competition_access', ['competition_id']),
+)
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
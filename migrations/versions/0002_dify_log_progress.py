@@ -0,0 +1,43 @@
+"""Streaming progress columns on submission_dify_logs
+
+Revision ID: 0002_dify_log_progress
+Revises: 0001_submission_access_indexes
+Create Date: 2026-10-18 00:00:00
+
+Fresh databases get these columns from ``db.create_all()``; existing ones only
+gain the columns that are missing, so the revision is safe on either.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_dify_log_progress'
+down_revision = '0001_submission_access_indexes'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = (
+    sa.Column('status', sa.String(20), nullable=True),
+    sa.Column('answer_chars', sa.Integer(), nullable=True),
+)
+
+
+def _existing_columns():
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns('submission_dify_logs')}
+
+
+def upgrade():
+    existing = _existing_columns()
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column('submission_dify_logs', column)
+
+
+def downgrade():
+    existing = _existing_columns()
+    with op.batch_alter_table('submission_dify_logs') as batch_op:
+        for column in reversed(COLUMNS):
+            if column.name in existing:
+                batch_op.drop_column(column.name)
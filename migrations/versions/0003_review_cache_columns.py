@@ -0,0 +1,45 @@
+"""Verdict cache columns: uploaded file hashes and cache hits on Dify logs
+
+Revision ID: 0003_review_cache_columns
+Revises: 0002_dify_log_progress
+Create Date: 2026-10-18 00:00:00
+
+Fresh databases get these columns from ``db.create_all()``; existing ones only
+gain the columns that are missing, so the revision is safe on either. Files
+uploaded before the revision keep a NULL hash and are hashed from disk when
+their submission is reviewed.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_review_cache_columns'
+down_revision = '0002_dify_log_progress'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = (
+    ('submission_files', sa.Column('content_hash', sa.String(64), nullable=True)),
+    ('submission_file_history', sa.Column('content_hash', sa.String(64), nullable=True)),
+    ('submission_dify_logs', sa.Column('cache_key', sa.String(64), nullable=True)),
+    ('submission_dify_logs', sa.Column('cache_hit', sa.Boolean(), nullable=True)),
+)
+
+
+def _existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    for table, column in COLUMNS:
+        if column.name not in _existing_columns(table):
+            op.add_column(table, column)
+
+
+def downgrade():
+    for table, column in reversed(COLUMNS):
+        if column.name in _existing_columns(table):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.drop_column(column.name)
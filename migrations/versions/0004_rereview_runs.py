@@ -0,0 +1,67 @@
+"""Batch re-review runs and their per-submission results
+
+Revision ID: 0004_rereview_runs
+Revises: 0003_review_cache_columns
+Create Date: 2026-10-18 00:00:00
+
+Fresh databases get these tables from ``db.create_all()``; existing ones only
+gain the tables that are missing, so the revision is safe on either.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_rereview_runs'
+down_revision = '0003_review_cache_columns'
+branch_labels = None
+depends_on = None
+
+
+def _tables():
+    return (
+        ('rereview_runs', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('challenge_id', sa.Integer(), sa.ForeignKey('challenges.id'), nullable=False, index=True),
+            sa.Column('dry_run', sa.Boolean(), nullable=False),
+            sa.Column('statuses', sa.String(100)),
+            sa.Column('concurrency', sa.Integer(), nullable=False),
+            sa.Column('rate_per_minute', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(20)),
+            sa.Column('error', sa.Text()),
+            sa.Column('created_by_id', sa.Integer(), sa.ForeignKey('users.id')),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('finished_at', sa.DateTime()),
+            sa.Column('applied_at', sa.DateTime()),
+        )),
+        ('rereview_results', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('run_id', sa.Integer(), sa.ForeignKey('rereview_runs.id'), nullable=False),
+            sa.Column('submission_id', sa.Integer(), nullable=False),
+            sa.Column('state', sa.String(20)),
+            sa.Column('old_status', sa.String(20)),
+            sa.Column('old_points', sa.Integer()),
+            sa.Column('new_status', sa.String(20)),
+            sa.Column('new_points', sa.Integer()),
+            sa.Column('score', sa.Integer()),
+            sa.Column('feedback', sa.Text()),
+            sa.Column('answer_text', sa.Text()),
+            sa.Column('error', sa.Text()),
+            sa.Column('reviewed_at', sa.DateTime()),
+            sa.UniqueConstraint('run_id', 'submission_id', name='uq_rereview_run_submission'),
+        )),
+    )
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    for name, columns in _tables():
+        if name not in existing:
+            op.create_table(name, *columns)
+
+
+def downgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    for name, _ in reversed(_tables()):
+        if name in existing:
+            op.drop_table(name)
@@ -26,6 +26,8 @@ class User(UserMixin, db.Model):
     
     # Relationships
     submissions = db.relationship('Submission', foreign_keys='Submission.user_id', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    challenge_scores = db.relationship('ChallengeScore', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    scores = db.relationship('UserScore', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     
     def set_password(self, password):
         """Set hashed password"""
@@ -57,6 +59,9 @@ class Competition(db.Model):
     # Relationships
     challenges = db.relationship('Challenge', backref='competition', lazy='dynamic', cascade='all, delete-orphan')
     access_records = db.relationship('CompetitionAccess', backref='competition', lazy='dynamic', cascade='all, delete-orphan')
+    user_scores = db.relationship('UserScore', backref='competition', lazy='dynamic', cascade='all, delete-orphan')
+    team_scores = db.relationship('TeamScore', backref='competition', lazy='dynamic', cascade='all, delete-orphan')
+    version_stamp = db.relationship('CompetitionVersion', uselist=False, cascade='all, delete-orphan')
     
     def is_running(self):
         """Check if competition is currently running"""
@@ -81,6 +86,10 @@ class Competition(db.Model):
 class Challenge(db.Model):
     """Challenge model"""
     __tablename__ = 'challenges'
+    __table_args__ = (
+        # Competition page: active challenges of a competition in display order.
+        db.Index('ix_challenges_competition_active_order', 'competition_id', 'is_active', 'order_index'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -99,6 +108,8 @@ class Challenge(db.Model):
     submissions = db.relationship('Submission', backref='challenge', lazy='dynamic', cascade='all, delete-orphan')
     dify_config = db.relationship('ChallengeDifyConfig', backref='challenge', uselist=False, cascade='all, delete-orphan')
     dify_credential = db.relationship('ChallengeDifyCredential', backref='challenge', uselist=False, cascade='all, delete-orphan')
+    scores = db.relationship('ChallengeScore', backref='challenge', lazy='dynamic', cascade='all, delete-orphan')
+    rereview_runs = db.relationship('ReReviewRun', backref='challenge', lazy='dynamic', cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Challenge {self.title}>'
@@ -138,6 +149,16 @@ class ChallengeDifyCredential(db.Model):
 class Submission(db.Model):
     """Submission model"""
     __tablename__ = 'submissions'
+    __table_args__ = (
+        # Latest submission of a user per challenge (competition / challenge pages, score refresh).
+        db.Index('ix_submissions_user_challenge_submitted', 'user_id', 'challenge_id', 'submitted_at'),
+        # Approved submissions of a challenge (score rebuild, stats).
+        db.Index('ix_submissions_challenge_status', 'challenge_id', 'status'),
+        # Admin review queue: filter by status, newest first.
+        db.Index('ix_submissions_status_submitted', 'status', 'submitted_at'),
+        # Score timeline: approved submissions in review order, from a cursor.
+        db.Index('ix_submissions_status_reviewed', 'status', 'reviewed_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     answer_text = db.Column(db.Text)  # Text answer
@@ -164,7 +185,11 @@ class Submission(db.Model):
 class CompetitionAccess(db.Model):
     """Tracks which users have unlocked a competition via PIN"""
     __tablename__ = 'competition_access'
-    __table_args__ = (db.UniqueConstraint('user_id', 'competition_id', name='uq_user_competition'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'competition_id', name='uq_user_competition'),
+        # The unique constraint leads with user_id; per-competition lookups need their own index.
+        db.Index('ix_competition_access_competition', 'competition_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -184,6 +209,7 @@ class SubmissionFile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     filepath = db.Column(db.String(500), nullable=False)
+    content_hash = db.Column(db.String(64))  # SHA-256 of the file; NULL for files uploaded before it was stored
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Foreign keys
@@ -201,6 +227,12 @@ class SubmissionDifyLog(db.Model):
     submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id'), nullable=False, unique=True)
     feedback = db.Column(db.Text)
     score = db.Column(db.Integer)
+    # streaming (answer still arriving), completed, failed; NULL for logs written before streaming support
+    status = db.Column(db.String(20))
+    answer_chars = db.Column(db.Integer, default=0)  # Answer characters received so far
+    # Verdict cache: key of the reviewed content, and whether the verdict was reused (NULL when not consulted)
+    cache_key = db.Column(db.String(64))
+    cache_hit = db.Column(db.Boolean)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -208,6 +240,56 @@ class SubmissionDifyLog(db.Model):
         return f'<SubmissionDifyLog submission={self.submission_id}>'
 
 
+class ReReviewRun(db.Model):
+    """A batch re-review of a challenge's submissions through the Dify hook."""
+    __tablename__ = 'rereview_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id'), nullable=False, index=True)
+    dry_run = db.Column(db.Boolean, nullable=False, default=True)  # Store verdicts only, leave submissions alone
+    statuses = db.Column(db.String(100))  # Comma-separated submission statuses selected
+    concurrency = db.Column(db.Integer, nullable=False)
+    rate_per_minute = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='queued')  # queued, running, completed, failed
+    error = db.Column(db.Text)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    applied_at = db.Column(db.DateTime)  # When a dry run's verdicts were applied
+
+    created_by = db.relationship('User')
+    results = db.relationship('ReReviewResult', backref='run', lazy='dynamic', cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return f'<ReReviewRun {self.id} challenge={self.challenge_id}>'
+
+
+class ReReviewResult(db.Model):
+    """One submission of a re-review run: the verdict before and the new one."""
+    __tablename__ = 'rereview_results'
+    __table_args__ = (
+        db.UniqueConstraint('run_id', 'submission_id', name='uq_rereview_run_submission'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('rereview_runs.id'), nullable=False)
+    submission_id = db.Column(db.Integer, nullable=False)  # Plain id: survives archiving the submission
+    state = db.Column(db.String(20), default='queued')  # queued, done, failed
+    old_status = db.Column(db.String(20))
+    old_points = db.Column(db.Integer)
+    # approved / rejected, or NULL when Dify left the decision to a human
+    new_status = db.Column(db.String(20))
+    new_points = db.Column(db.Integer)
+    score = db.Column(db.Integer)
+    feedback = db.Column(db.Text)
+    answer_text = db.Column(db.Text)  # Raw Dify answer, applied later for dry runs
+    error = db.Column(db.Text)
+    reviewed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ReReviewResult run={self.run_id} submission={self.submission_id}>'
+
+
 class PlatformSettings(db.Model):
     """Platform settings model"""
     __tablename__ = 'platform_settings'
@@ -259,6 +341,7 @@ class SubmissionFileHistory(db.Model):
     original_file_id = db.Column(db.Integer, nullable=False)
     filename = db.Column(db.String(255), nullable=False)
     filepath = db.Column(db.String(500), nullable=False)
+    content_hash = db.Column(db.String(64))  # SHA-256 of the file; NULL for files uploaded before it was stored
     uploaded_at = db.Column(db.DateTime)
     archived_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -284,6 +367,8 @@ class Team(db.Model):
     captain = db.relationship('User', foreign_keys=[captain_id], backref='led_teams')
     members = db.relationship('TeamMember', backref='team', lazy='dynamic',
                               cascade='all, delete-orphan')
+    scores = db.relationship('TeamScore', backref='team', lazy='dynamic',
+                             cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<Team {self.name}>'
@@ -303,3 +388,70 @@ class TeamMember(db.Model):
 
     def __repr__(self):
         return f'<TeamMember user={self.user_id} team={self.team_id}>'
+
+
+class ChallengeScore(db.Model):
+    """Best approved score per (competition, user, challenge) — maintained by services.scoring"""
+    __tablename__ = 'challenge_scores'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'challenge_id', name='uq_challenge_score_user_challenge'),
+        db.Index('ix_challenge_scores_competition_user', 'competition_id', 'user_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    competition_id = db.Column(db.Integer, db.ForeignKey('competitions.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id'), nullable=False)
+    points = db.Column(db.Integer, nullable=False, default=0)
+    last_solve_time = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ChallengeScore user={self.user_id} challenge={self.challenge_id} points={self.points}>'
+
+
+class UserScore(db.Model):
+    """Per-user competition total — sum of the user's ChallengeScore rows"""
+    __tablename__ = 'user_scores'
+    __table_args__ = (
+        db.UniqueConstraint('competition_id', 'user_id', name='uq_user_score_competition_user'),
+        db.Index('ix_user_scores_ranking', 'competition_id', 'total_points', 'last_solve_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    competition_id = db.Column(db.Integer, db.ForeignKey('competitions.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    total_points = db.Column(db.Integer, nullable=False, default=0)
+    last_solve_time = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<UserScore competition={self.competition_id} user={self.user_id} total={self.total_points}>'
+
+
+class TeamScore(db.Model):
+    """Per-team competition total — best member score per challenge, summed"""
+    __tablename__ = 'team_scores'
+    __table_args__ = (
+        db.UniqueConstraint('competition_id', 'team_id', name='uq_team_score_competition_team'),
+        db.Index('ix_team_scores_ranking', 'competition_id', 'total_points', 'last_solve_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    competition_id = db.Column(db.Integer, db.ForeignKey('competitions.id'), nullable=False)
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), nullable=False)
+    total_points = db.Column(db.Integer, nullable=False, default=0)
+    last_solve_time = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<TeamScore competition={self.competition_id} team={self.team_id} total={self.total_points}>'
+
+
+class CompetitionVersion(db.Model):
+    """Per-competition version stamp, bumped on every scoring / leaderboard-visible change"""
+    __tablename__ = 'competition_versions'
+
+    competition_id = db.Column(db.Integer, db.ForeignKey('competitions.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CompetitionVersion competition={self.competition_id} version={self.version}>'
@@ -4,28 +4,32 @@ import zipfile
 from io import BytesIO
 from datetime import datetime
 from functools import wraps
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, send_file, session
+import redis
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, send_file, session, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from models import db, User, Challenge, Competition, Submission, PlatformSettings, ChallengeDifyConfig, ChallengeDifyCredential
-from forms import ChallengeForm, CompetitionForm, ReviewForm, PlatformSettingsForm, ResetPasswordForm
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+from models import db, User, Challenge, Competition, CompetitionAccess, Submission, TeamMember, TeamScore, PlatformSettings, ChallengeDifyConfig, ChallengeDifyCredential, ReReviewResult, ReReviewRun
+from forms import ChallengeForm, CompetitionForm, ReviewForm, PlatformSettingsForm, ResetPasswordForm, ReReviewForm
 from dify_secrets import mask_api_key, obfuscate_api_key, reveal_api_key
+from services.leaderboard_events import notify_leaderboard_changed
+from services.platform_settings import invalidate as invalidate_platform_settings, load_settings
+from services.archive import archive_submissions
+from services.dify_review import dead_letters, redrive
+from services.identity import invalidate as invalidate_identity, invalidate_many as invalidate_identities
+from services.rereview import apply_run, create_run, run_progress
+from services.submissions import review_queue
+from services.translations import gettext
+from services.scoring import (clear_competition, rebuild_competition, refresh_challenge_scores, refresh_submission_score,
+                              refresh_team)
+from services.versions import bump_competition_version
 
 admin_bp = Blueprint('admin', __name__)
 
-# Load translations
 def _(text):
     """Get translated text based on current locale"""
-    try:
-        basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
-        with open(os.path.join(basedir, 'translations.json'), 'r', encoding='utf-8') as f:
-            translations = json.load(f)
-        locale = session.get('locale', 'en')
-        if text in translations and locale in translations[text]:
-            return translations[text][locale]
-    except:
-        pass
-    return text
+    return gettext(text, session.get('locale', 'en'))
 
 
 def admin_required(f):
@@ -95,25 +99,24 @@ def settings():
                 db.session.add(footer_setting)
         
         db.session.commit()
+        invalidate_platform_settings()
         flash('Platform settings updated successfully.', 'success')
         return redirect(url_for('admin.settings'))
     
     # Load current settings
-    platform_name = PlatformSettings.query.filter_by(key='platform_name').first()
-    platform_logo = PlatformSettings.query.filter_by(key='platform_logo').first()
-    footer_text = PlatformSettings.query.filter_by(key='footer_text').first()
+    current = load_settings()
     
-    if platform_name:
-        form.platform_name.data = platform_name.value
+    if 'platform_name' in current:
+        form.platform_name.data = current['platform_name']
     
-    if footer_text:
-        form.footer_text.data = footer_text.value
+    if 'footer_text' in current:
+        form.footer_text.data = current['footer_text']
     
     return render_template('admin/settings.html', 
                          form=form,
-                         current_platform_name=platform_name.value if platform_name else None,
-                         current_logo=platform_logo.value if platform_logo else None,
-                         current_footer_text=footer_text.value if footer_text else None)
+                         current_platform_name=current.get('platform_name'),
+                         current_logo=current.get('platform_logo'),
+                         current_footer_text=current.get('footer_text'))
 
 
 # Competition Management
@@ -158,6 +161,7 @@ def competition_edit(competition_id):
         competition.name = form.name.data
         competition.description = form.description.data
         competition.countdown_minutes = form.countdown_minutes.data or 0
+        bump_competition_version(competition.id)
         
         db.session.commit()
         flash('Competition updated successfully.', 'success')
@@ -171,8 +175,10 @@ def competition_edit(competition_id):
 def competition_delete(competition_id):
     """Delete competition"""
     competition = Competition.query.get_or_404(competition_id)
+    unlocked_by = [user_id for (user_id,) in competition.access_records.with_entities(CompetitionAccess.user_id)]
     db.session.delete(competition)
     db.session.commit()
+    invalidate_identities(unlocked_by)
     
     flash('Competition deleted successfully.', 'success')
     return redirect(url_for('admin.competitions'))
@@ -225,54 +231,50 @@ def competition_reset(competition_id):
     """Reset competition - archive all submissions to history and set status to draft"""
     competition = Competition.query.get_or_404(competition_id)
     
-    # Archive all submissions for this competition's challenges
-    challenge_ids = [c.id for c in competition.challenges]
-    if challenge_ids:
-        from models import SubmissionFile, SubmissionHistory, SubmissionFileHistory
-        submissions = Submission.query.filter(Submission.challenge_id.in_(challenge_ids)).all()
-        
-        archived_count = 0
-        for submission in submissions:
-            # Create history record
-            history = SubmissionHistory(
-                original_submission_id=submission.id,
-                answer_text=submission.answer_text,
-                status=submission.status,
-                points_awarded=submission.points_awarded,
-                submitted_at=submission.submitted_at,
-                reviewed_at=submission.reviewed_at,
-                user_id=submission.user_id,
-                challenge_id=submission.challenge_id,
-                competition_id=competition_id,
-                reviewed_by_id=submission.reviewed_by_id
-            )
-            db.session.add(history)
-            db.session.flush()  # Get history ID
-            
-            # Archive associated files
-            for file in submission.files:
-                file_history = SubmissionFileHistory(
-                    original_file_id=file.id,
-                    filename=file.filename,
-                    filepath=file.filepath,
-                    uploaded_at=file.uploaded_at,
-                    submission_history_id=history.id
-                )
-                db.session.add(file_history)
-                db.session.delete(file)
-            
-            db.session.delete(submission)
-            archived_count += 1
-    
-    # Reset competition status
+    # Stop accepting submissions and clear the leaderboard right away; the
+    # archive itself runs in chunks, in the background when Celery is available.
     competition.status = 'draft'
     competition.countdown_started_at = None
-    
+    clear_competition(competition_id)
     db.session.commit()
+    notify_leaderboard_changed(competition_id)
+
+    if current_app.config['COMPETITION_RESET_ASYNC']:
+        from tasks import reset_competition
+        try:
+            task = reset_competition.delay(competition_id)
+        except Exception as e:
+            current_app.logger.warning(f'Background reset unavailable, archiving inline: {e}')
+        else:
+            flash(f'Competition "{competition.name}" has been reset. Submissions are being archived to history.', 'success')
+            return redirect(url_for('admin.competitions', reset_competition=competition_id, reset_task=task.id))
+
+    archived_count = archive_submissions(competition_id, chunk_size=current_app.config['COMPETITION_RESET_CHUNK_SIZE'])
+    clear_competition(competition_id)
+    db.session.commit()
+    notify_leaderboard_changed(competition_id)
     flash(f'Competition "{competition.name}" has been reset. {archived_count} submissions archived to history.', 'success')
     return redirect(url_for('admin.competitions'))
 
 
+@admin_bp.route('/competitions/<int:competition_id>/reset-status/<task_id>')
+@admin_required
+def competition_reset_status(competition_id, task_id):
+    """Progress of a background competition reset (AJAX)"""
+    from tasks import celery
+    result = celery.AsyncResult(task_id)
+    info = result.info if isinstance(result.info, dict) else {}
+    payload = {
+        'competition_id': competition_id,
+        'state': result.state,
+        'archived': info.get('archived', 0),
+        'total': info.get('total'),
+    }
+    if result.failed():
+        payload['error'] = str(result.result)
+    return jsonify(payload)
+
+
 @admin_bp.route('/competitions/<int:competition_id>/reset-pin', methods=['POST'])
 @admin_required
 def competition_reset_pin(competition_id):
@@ -656,6 +658,7 @@ def challenge_new():
                     api_key_masked=mask_api_key(new_key)
                 ))
 
+        bump_competition_version(challenge.competition_id)
         db.session.commit()
         
         flash('Challenge created successfully.', 'success')
@@ -688,7 +691,13 @@ def challenge_edit(challenge_id):
         challenge.description = form.description.data
         challenge.points = form.points.data
         challenge.category = form.category.data
+        previous_competition_id = challenge.competition_id
         challenge.competition_id = form.competition_id.data
+        moved_competition = challenge.competition_id != previous_competition_id
+        if moved_competition:
+            # Existing scores follow the challenge to its new competition.
+            rebuild_competition(previous_competition_id)
+            rebuild_competition(challenge.competition_id)
 
         existing_config = challenge.dify_config
         if form.use_custom_dify.data:
@@ -710,6 +719,9 @@ def challenge_edit(challenge_id):
             existing_config.enabled = False
         
         db.session.commit()
+        if moved_competition:
+            notify_leaderboard_changed(previous_competition_id)
+            notify_leaderboard_changed(challenge.competition_id)
         flash('Challenge updated successfully.', 'success')
         return redirect(url_for('admin.challenges'))
     
@@ -728,8 +740,11 @@ def challenge_edit(challenge_id):
 def challenge_delete(challenge_id):
     """Delete challenge"""
     challenge = Challenge.query.get_or_404(challenge_id)
+    competition_id = challenge.competition_id
     db.session.delete(challenge)
+    rebuild_competition(competition_id)
     db.session.commit()
+    notify_leaderboard_changed(competition_id)
     
     flash('Challenge deleted successfully.', 'success')
     return redirect(url_for('admin.challenges'))
@@ -741,6 +756,7 @@ def challenge_toggle(challenge_id):
     """Toggle challenge active status"""
     challenge = Challenge.query.get_or_404(challenge_id)
     challenge.is_active = not challenge.is_active
+    bump_competition_version(challenge.competition_id)
     db.session.commit()
     
     status = 'activated' if challenge.is_active else 'deactivated'
@@ -900,15 +916,61 @@ def upload_image():
 @admin_bp.route('/submissions')
 @admin_required
 def submissions():
-    """List all submissions"""
+    """List submissions, one keyset page at a time"""
+    status_filter, filters, submissions, next_cursor = _review_queue_page()
+    competitions = Competition.query.order_by(Competition.name).all()
+    challenges = Challenge.query.filter_by(competition_id=filters['competition_id']).order_by(
+        Challenge.order_index.asc(), Challenge.id.asc()
+    ).all() if filters['competition_id'] else []
+    reviewers = ['AI'] + [name for (name,) in db.session.query(User.username).filter_by(is_admin=True).order_by(User.username)]
+    return render_template('admin/submissions.html', submissions=submissions, status_filter=status_filter,
+                           filters=filters, next_cursor=next_cursor, competitions=competitions,
+                           challenges=challenges, reviewers=reviewers)
+
+
+@admin_bp.route('/submissions.json')
+@admin_required
+def submissions_json():
+    """JSON page of the review queue, for fetching the next page without re-rendering"""
+    _, _, submissions, next_cursor = _review_queue_page()
+    return jsonify({
+        'submissions': [{
+            'id': submission.id,
+            'user': {'id': submission.user_id, 'username': submission.user.username},
+            'challenge': {'id': submission.challenge_id, 'title': submission.challenge.title,
+                          'competition_id': submission.challenge.competition_id},
+            'status': submission.status,
+            'points_awarded': submission.points_awarded,
+            'submitted_at': submission.submitted_at.isoformat() if submission.submitted_at else None,
+            'reviewed_at': submission.reviewed_at.isoformat() if submission.reviewed_at else None,
+            'reviewed_by_name': submission.reviewed_by_name,
+            'review_url': url_for('admin.submission_review', submission_id=submission.id)
+        } for submission in submissions],
+        'next_cursor': next_cursor
+    })
+
+
+def _review_queue_page():
+    """Parse the queue filters from the query string and load one page."""
     status_filter = request.args.get('status', 'pending')
-    
-    query = Submission.query
-    if status_filter != 'all':
-        query = query.filter_by(status=status_filter)
-    
-    submissions = query.order_by(Submission.submitted_at.desc()).all()
-    return render_template('admin/submissions.html', submissions=submissions, status_filter=status_filter)
+    if status_filter not in ('pending', 'approved', 'rejected', 'all'):
+        abort(400)
+    filters = {
+        'competition_id': request.args.get('competition_id', type=int),
+        'challenge_id': request.args.get('challenge_id', type=int),
+        'reviewer': request.args.get('reviewer') or None,
+    }
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+    try:
+        submissions, next_cursor = review_queue(
+            status=None if status_filter == 'all' else status_filter,
+            before=request.args.get('before') or None,
+            limit=per_page,
+            **filters
+        )
+    except ValueError:
+        abort(400)
+    return status_filter, filters, submissions, next_cursor
 
 
 @admin_bp.route('/submissions/<int:submission_id>/review', methods=['GET', 'POST'])
@@ -921,6 +983,7 @@ def submission_review(submission_id):
     if form.validate_on_submit():
         from datetime import datetime
         
+        was_approved = submission.status == 'approved'
         submission.status = form.status.data
         submission.reviewed_at = datetime.utcnow()
         submission.reviewed_by_id = current_user.id
@@ -933,7 +996,10 @@ def submission_review(submission_id):
         else:
             submission.points_awarded = 0
         
+        refresh_submission_score(submission)
         db.session.commit()
+        # Re-reviewing an approved answer rewrites history; anything else only appends.
+        notify_leaderboard_changed(submission.challenge.competition_id, append_only=not was_approved)
         flash('Submission reviewed successfully.', 'success')
         return redirect(url_for('admin.submissions'))
     
@@ -943,6 +1009,216 @@ def submission_review(submission_id):
     return render_template('admin/submission_review.html', submission=submission, form=form)
 
 
+BULK_REVIEW_MAX_ITEMS = 1000
+
+
+@admin_bp.route('/submissions/bulk-review', methods=['POST'])
+@admin_required
+def submissions_bulk_review():
+    """Approve / reject many submissions in one transaction (AJAX)
+
+    Body: ``{"items": [{"id": 1, "status": "approved", "points": 80}, ...]}``;
+    ``points`` defaults to the challenge's points for approvals and is 0 for rejections.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'message': 'No submissions provided'}), 400
+    if len(items) > BULK_REVIEW_MAX_ITEMS:
+        return jsonify({'success': False, 'message': f'At most {BULK_REVIEW_MAX_ITEMS} submissions per request'}), 400
+    decisions = {}
+    for item in items:
+        try:
+            submission_id = int(item['id'])
+            points = item.get('points')
+            points = None if points is None else int(points)
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'success': False, 'message': f'Invalid item: {item!r}'}), 400
+        if item.get('status') not in ('approved', 'rejected') or (points is not None and points < 0):
+            return jsonify({'success': False, 'message': f'Invalid item: {item!r}'}), 400
+        decisions[submission_id] = (item['status'], points)
+
+    rows = db.session.query(
+        Submission.id, Submission.user_id, Submission.challenge_id, Submission.status,
+        Challenge.points, Challenge.competition_id
+    ).join(Challenge).filter(Submission.id.in_(decisions)).all()
+
+    now = datetime.utcnow()
+    updates, score_keys, rewrites_history = [], set(), set()
+    for submission_id, user_id, challenge_id, previous_status, challenge_points, competition_id in rows:
+        status, points = decisions[submission_id]
+        updates.append({
+            'id': submission_id,
+            'status': status,
+            'points_awarded': (challenge_points if points is None else points) if status == 'approved' else 0,
+            'reviewed_at': now,
+            'reviewed_by_id': current_user.id,
+            'reviewed_by_name': current_user.username,
+        })
+        score_keys.add((competition_id, user_id, challenge_id))
+        if previous_status == 'approved':
+            rewrites_history.add(competition_id)
+
+    if updates:
+        # executemany of a single UPDATE ... WHERE id = ? statement.
+        db.session.execute(update(Submission), updates)
+        refresh_challenge_scores(score_keys)
+        db.session.commit()
+    for competition_id in {competition_id for competition_id, _, _ in score_keys}:
+        notify_leaderboard_changed(competition_id, append_only=competition_id not in rewrites_history)
+
+    found = {row[0] for row in rows}
+    return jsonify({
+        'success': True,
+        'reviewed': len(updates),
+        'missing': sorted(submission_id for submission_id in decisions if submission_id not in found)
+    })
+
+
+@admin_bp.route('/dify/metrics')
+@admin_required
+def dify_metrics():
+    """Per-host Dify connection / latency metrics, circuit breakers, review queues and verdict cache hits (JSON)"""
+    from services.dify_breaker import breaker_states
+    from services.dify_client import host_metrics
+    from services.review_cache import cache_stats
+    from services.review_scheduler import queue_metrics
+    return jsonify({'hosts': host_metrics(), 'breakers': breaker_states(), 'queues': queue_metrics(),
+                    'verdict_cache': cache_stats()})
+
+
+@admin_bp.route('/dify/dead-letters')
+@admin_required
+def dify_dead_letters():
+    """Dify reviews that failed after all retries, for bulk re-drive"""
+    try:
+        entries = dead_letters()
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Dead-letter list unavailable: {e}')
+        flash('The failed review list is unavailable: Redis is not reachable.', 'danger')
+        entries = []
+    submissions = {}
+    if entries:
+        submissions = {
+            submission.id: submission
+            for submission in Submission.query.options(joinedload(Submission.user), joinedload(Submission.challenge))
+            .filter(Submission.id.in_([entry['submission_id'] for entry in entries]))
+        }
+    return render_template('admin/dify_dead_letters.html', entries=entries, submissions=submissions)
+
+
+@admin_bp.route('/dify/dead-letters/redrive', methods=['POST'])
+@admin_required
+def dify_redrive():
+    """Re-queue dead-lettered Dify reviews (AJAX)
+
+    Body: ``{"ids": [1, 2, ...]}`` or ``{"all": true}``. Submissions that are no
+    longer pending are removed from the list instead of being re-queued.
+    """
+    data = request.get_json(silent=True) or {}
+    ids = None
+    if not data.get('all'):
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return jsonify({'success': False, 'message': 'No submissions provided'}), 400
+        try:
+            ids = [int(submission_id) for submission_id in ids]
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Invalid submission id'}), 400
+    try:
+        redriven, skipped = redrive(ids)
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Re-drive failed: {e}')
+        return jsonify({'success': False, 'message': 'Redis is not reachable'}), 503
+    return jsonify({'success': True, 'redriven': redriven, 'skipped': skipped})
+
+
+@admin_bp.route('/challenges/<int:challenge_id>/rereview', methods=['GET', 'POST'])
+@admin_required
+def challenge_rereview(challenge_id):
+    """Start a batch re-review of a challenge's submissions; lists earlier runs"""
+    challenge = Challenge.query.get_or_404(challenge_id)
+    form = ReReviewForm()
+    if request.method == 'GET':
+        form.concurrency.data = current_app.config['DIFY_REREVIEW_CONCURRENCY']
+        form.rate_per_minute.data = current_app.config['DIFY_REREVIEW_RATE_PER_MINUTE']
+
+    if form.validate_on_submit():
+        run = create_run(challenge, form.statuses.data, form.dry_run.data, form.concurrency.data,
+                         form.rate_per_minute.data, created_by_id=current_user.id)
+        if _enqueue_rereview(run):
+            flash(f'Re-review of "{challenge.title}" started.', 'success')
+        return redirect(url_for('admin.rereview_run', run_id=run.id))
+
+    runs = challenge.rereview_runs.order_by(ReReviewRun.created_at.desc()).limit(20).all()
+    return render_template('admin/challenge_rereview.html', challenge=challenge, form=form,
+                           runs=[(run, run_progress(run)) for run in runs])
+
+
+def _enqueue_rereview(run):
+    """Hand a run to the Celery worker; on failure it stays queued for a retry.
+
+    A re-review takes minutes, so it is never run inline: the request would be
+    killed by the gunicorn timeout and leave the run stuck in ``running``.
+    """
+    from tasks import rereview_challenge
+    try:
+        rereview_challenge.delay(run.id)
+    except Exception as e:
+        current_app.logger.error(f'Could not queue re-review run {run.id}: {e}')
+        flash('The background worker is unavailable; the re-review stays queued. Try again later.', 'danger')
+        return False
+    return True
+
+
+@admin_bp.route('/rereview/<int:run_id>')
+@admin_required
+def rereview_run(run_id):
+    """Old and new verdicts of a re-review run"""
+    run = ReReviewRun.query.get_or_404(run_id)
+    results = run.results.order_by(ReReviewResult.submission_id).all()
+    submissions = {
+        submission.id: submission
+        for submission in Submission.query.options(joinedload(Submission.user))
+        .filter(Submission.id.in_([result.submission_id for result in results]))
+    }
+    return render_template('admin/rereview_run.html', run=run, progress=run_progress(run), results=results,
+                           submissions=submissions)
+
+
+@admin_bp.route('/rereview/<int:run_id>/status')
+@admin_required
+def rereview_status(run_id):
+    """Progress of a re-review run (AJAX)"""
+    return jsonify(run_progress(ReReviewRun.query.get_or_404(run_id)))
+
+
+@admin_bp.route('/rereview/<int:run_id>/enqueue', methods=['POST'])
+@admin_required
+def rereview_enqueue(run_id):
+    """Queue a run again whose hand-off to the worker failed"""
+    run = ReReviewRun.query.get_or_404(run_id)
+    if run.status != 'queued':
+        flash('Only a queued re-review can be queued again.', 'warning')
+    elif _enqueue_rereview(run):
+        flash('Re-review queued.', 'success')
+    return redirect(url_for('admin.rereview_run', run_id=run.id))
+
+
+@admin_bp.route('/rereview/<int:run_id>/apply', methods=['POST'])
+@admin_required
+def rereview_apply(run_id):
+    """Apply the verdicts of a finished dry run"""
+    run = ReReviewRun.query.get_or_404(run_id)
+    if not run.dry_run or run.status != 'completed' or run.applied_at is not None:
+        flash('Only a finished dry run can be applied, once.', 'warning')
+        return redirect(url_for('admin.rereview_run', run_id=run.id))
+    applied, skipped = apply_run(run)
+    flash(f'Applied {len(applied)} verdicts; {len(skipped)} submissions changed since the dry run were skipped.',
+          'success')
+    return redirect(url_for('admin.rereview_run', run_id=run.id))
+
+
 # User Management
 @admin_bp.route('/users')
 @admin_required
@@ -965,6 +1241,7 @@ def user_toggle_admin(user_id):
     
     user.is_admin = not user.is_admin
     db.session.commit()
+    invalidate_identity(user.id)
     
     status = 'granted' if user.is_admin else 'revoked'
     flash(f'Admin privileges {status} for user {user.username}.', 'success')
@@ -984,6 +1261,7 @@ def user_toggle_disable(user_id):
         return redirect(url_for('admin.users'))
     user.is_disabled = not user.is_disabled
     db.session.commit()
+    invalidate_identity(user.id)
     action = 'disabled' if user.is_disabled else 'enabled'
     flash(f'User {user.username} has been {action}.', 'success')
     return redirect(url_for('admin.users'))
@@ -1001,8 +1279,32 @@ def user_delete(user_id):
         flash('Admin accounts cannot be deleted.', 'danger')
         return redirect(url_for('admin.users'))
     username = user.username
+    # Competitions whose board or stats lose this user's scores and submissions.
+    changed = {cid for (cid,) in db.session.query(Challenge.competition_id).join(
+        Submission, Submission.challenge_id == Challenge.id
+    ).filter(Submission.user_id == user.id).distinct()}
+    membership = user.team_membership
+    team = membership.team if membership else None
+    if membership:
+        db.session.delete(membership)
+    if team and team.captain_id == user.id:
+        successor = TeamMember.query.filter(TeamMember.team_id == team.id, TeamMember.user_id != user.id).first()
+        if successor:
+            team.captain_id = successor.user_id
+        else:
+            changed.update(cid for (cid,) in team.scores.with_entities(TeamScore.competition_id))
+            db.session.delete(team)
+            team = None
     db.session.delete(user)
+    db.session.flush()
+    if team:
+        changed.update(refresh_team(team.id))
+    for competition_id in changed:
+        bump_competition_version(competition_id)
     db.session.commit()
+    invalidate_identity(user_id)
+    for competition_id in changed:
+        notify_leaderboard_changed(competition_id)
     flash(f'User {username} has been deleted.', 'success')
     return redirect(url_for('admin.users'))
 
@@ -1,139 +1,189 @@
-from collections import defaultdict
+import json
+import threading
+import time
 from datetime import datetime
-from flask import Blueprint, jsonify
-from models import Competition, Challenge, Submission, Team, TeamMember
+import redis
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+from werkzeug.http import is_resource_modified
+from models import Competition, Challenge, Submission
 from sqlalchemy import func
 from models import db
+from services.leaderboard_cache import get_leaderboard
+from services.leaderboard_events import channel_name, current_seq
+from services.redis_client import get_redis
+from services.timeline import BUCKET_SECONDS, SCOPES, bucket_start, build_timeline
+from services.versions import competition_stamp
 
 api_bp = Blueprint('api', __name__)
 
 
+def _conditional_stamp(competition_id, kind, refresh_seconds=None):
+    """Return ``(version, etag, last_modified, not_modified_response)`` from the competition version stamp.
+
+    ``not_modified_response`` is a ready 304 when the client's copy is current,
+    so callers can skip the scoring queries entirely. With ``refresh_seconds``
+    the stamp also changes once per period, for data the version does not
+    track (the submission count).
+    """
+    stamp = competition_stamp(competition_id)
+    if stamp is None:
+        abort(404)
+    version, last_modified, status = stamp
+    etag = f'{kind}-{competition_id}-{version}-{status}'
+    if refresh_seconds:
+        period = int(time.time() // refresh_seconds)
+        etag = f'{etag}-{period}'
+        last_modified = max(last_modified, datetime.utcfromtimestamp(period * refresh_seconds))
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+        _set_validators(response, etag, last_modified)
+        return version, etag, last_modified, response
+    return version, etag, last_modified, None
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Browsers revalidate on every poll; unchanged data costs a 304.
+    response.cache_control.no_cache = True
+    return response
+
+
 @api_bp.route('/leaderboard/<int:competition_id>')
 def leaderboard_api(competition_id):
     """API endpoint for real-time leaderboard"""
+    version, etag, last_modified, not_modified = _conditional_stamp(competition_id, 'leaderboard')
+    if not_modified:
+        return not_modified
     competition = Competition.query.get_or_404(competition_id)
     
-    # Calculate scores - only count highest score per user per challenge
-    # Subquery to get max score per user per challenge
-    max_scores_subquery = db.session.query(
-        Submission.user_id,
-        Submission.challenge_id,
-        func.max(Submission.points_awarded).label('max_points')
-    ).join(Challenge).filter(
-        Challenge.competition_id == competition_id,
-        Submission.status == 'approved'
-    ).group_by(
-        Submission.user_id,
-        Submission.challenge_id
-    ).subquery()
-    
-    # Sum the max scores per user
-    scores = db.session.query(
-        max_scores_subquery.c.user_id,
-        func.sum(max_scores_subquery.c.max_points).label('total_points')
-    ).group_by(
-        max_scores_subquery.c.user_id
-    ).subquery()
-    
-    # Get last solve time for each user
-    last_solve_subquery = db.session.query(
-        Submission.user_id,
-        func.max(Submission.reviewed_at).label('last_solve_time')
-    ).join(Challenge).filter(
-        Challenge.competition_id == competition_id,
-        Submission.status == 'approved'
-    ).group_by(Submission.user_id).subquery()
-    
-    # Join to get final leaderboard with ranking
-    results = db.session.query(
-        scores.c.user_id,
-        scores.c.total_points,
-        last_solve_subquery.c.last_solve_time
-    ).join(
-        last_solve_subquery,
-        scores.c.user_id == last_solve_subquery.c.user_id
-    ).order_by(
-        scores.c.total_points.desc(),
-        last_solve_subquery.c.last_solve_time.asc()
-    ).all()
-    
-    from models import User
-
-    # Map user_id → team membership so individual leaderboard can hide team members.
-    user_to_team_id = {m.user_id: m.team_id for m in TeamMember.query.all()}
-
-    leaderboard_data = []
-    rank = 1
-    for (user_id, total_points, last_solve_time) in results:
-        if user_id in user_to_team_id:
-            continue
-        user = User.query.get(user_id)
-        leaderboard_data.append({
-            'rank': rank,
-            'username': user.username,
-            'total_points': int(total_points or 0),
-            'last_solve_time': last_solve_time.isoformat() if last_solve_time else None
-        })
-        rank += 1
-
-    # ── Team leaderboard (mirrors routes/frontend.py:leaderboard) ───────────
-    team_challenge_rows = db.session.query(
-        TeamMember.team_id,
-        Submission.challenge_id,
-        func.max(Submission.points_awarded).label('max_points'),
-        func.max(Submission.reviewed_at).label('last_solve')
-    ).join(
-        Submission, Submission.user_id == TeamMember.user_id
-    ).join(
-        Challenge, Challenge.id == Submission.challenge_id
-    ).filter(
-        Challenge.competition_id == competition_id,
-        Submission.status == 'approved'
-    ).group_by(
-        TeamMember.team_id,
-        Submission.challenge_id
-    ).all()
-
-    team_totals = defaultdict(int)
-    team_last_solve = defaultdict(lambda: None)
-    for row in team_challenge_rows:
-        team_totals[row.team_id] += row.max_points
-        if team_last_solve[row.team_id] is None or (
-            row.last_solve and row.last_solve > team_last_solve[row.team_id]
-        ):
-            team_last_solve[row.team_id] = row.last_solve
-
-    team_leaderboard = []
-    for t_rank, (team_id, total_points) in enumerate(sorted(
-        team_totals.items(),
-        key=lambda x: (-x[1], team_last_solve[x[0]] or datetime.min)
-    ), 1):
-        team = Team.query.get(team_id)
-        if not team:
-            continue
-        team_leaderboard.append({
-            'rank': t_rank,
-            'team_id': team.id,
-            'team_name': team.name,
-            'total_points': int(total_points or 0),
-            'member_count': team.members.count(),
-            'last_solve_time': team_last_solve[team_id].isoformat() if team_last_solve[team_id] else None
-        })
-
-    return jsonify({
+    board = get_leaderboard(competition_id, version)
+
+    return _set_validators(jsonify({
         'competition': {
             'id': competition.id,
             'name': competition.name,
             'is_running': competition.is_running()
         },
-        'leaderboard': leaderboard_data,
-        'team_leaderboard': team_leaderboard
+        'leaderboard': [entry.to_json() for entry in board.individual],
+        'team_leaderboard': [entry.to_json() for entry in board.teams]
+    }), etag, last_modified)
+
+
+@api_bp.route('/leaderboard/<int:competition_id>/timeline')
+def leaderboard_timeline(competition_id):
+    """Cumulative score over time for the current top entries"""
+    scope = request.args.get('scope', 'users')
+    bucket_seconds = request.args.get('bucket', 300, type=int)
+    top = request.args.get('top', 10, type=int)
+    if scope not in SCOPES or bucket_seconds not in BUCKET_SECONDS or not 1 <= top <= 50:
+        abort(400)
+    version, etag, last_modified, not_modified = _conditional_stamp(
+        competition_id, f'timeline-{scope}-{bucket_seconds}-{top}'
+    )
+    if not_modified:
+        return not_modified
+    Competition.query.get_or_404(competition_id)
+
+    board = get_leaderboard(competition_id, version)
+    if scope == 'teams':
+        entries = [(entry.rank, entry.team_id, entry.team_name, entry.total_points) for entry in board.teams[:top]]
+    else:
+        entries = [(entry.rank, entry.user_id, entry.username, entry.total_points) for entry in board.individual[:top]]
+    series = build_timeline(competition_id, scope, bucket_seconds, [entry[1] for entry in entries])
+
+    return _set_validators(jsonify({
+        'competition_id': competition_id,
+        'scope': scope,
+        'bucket_seconds': bucket_seconds,
+        'series': [{
+            'rank': rank,
+            'id': entity_id,
+            'name': name,
+            'total_points': total_points,
+            'points': [[bucket_start(bucket).isoformat(), points] for bucket, points in series[entity_id]]
+        } for rank, entity_id, name, total_points in entries]
+    }), etag, last_modified)
+
+
+# Streams open in this worker process; each one holds a worker thread.
+_stream_lock = threading.Lock()
+_open_streams = 0
+
+
+def _acquire_stream_slot():
+    global _open_streams
+    with _stream_lock:
+        if _open_streams >= current_app.config['LEADERBOARD_STREAM_MAX_PER_WORKER']:
+            return False
+        _open_streams += 1
+        return True
+
+
+def _release_stream_slot():
+    global _open_streams
+    with _stream_lock:
+        _open_streams -= 1
+
+
+@api_bp.route('/leaderboard/<int:competition_id>/stream')
+def leaderboard_stream(competition_id):
+    """Server-Sent Events stream of leaderboard rank deltas"""
+    Competition.query.get_or_404(competition_id)
+    client = get_redis()
+    if client is None:
+        abort(503)
+    # Past the cap the page falls back to polling instead of taking the threads plain requests need.
+    if not _acquire_stream_slot():
+        abort(503)
+    try:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(channel_name(competition_id))
+    except redis.RedisError:
+        _release_stream_slot()
+        abort(503)
+    hello = json.dumps({'seq': current_seq(competition_id) or 0})
+    max_seconds = current_app.config['LEADERBOARD_STREAM_MAX_SECONDS']
+    heartbeat_seconds = current_app.config['LEADERBOARD_STREAM_HEARTBEAT_SECONDS']
+
+    def generate():
+        # The stream ends after max_seconds; EventSource reconnects on its own,
+        # which keeps long-lived connections from pinning a worker thread forever.
+        deadline = time.monotonic() + max_seconds
+        last_sent = time.monotonic()
+        try:
+            yield f'retry: 3000\nevent: hello\ndata: {hello}\n\n'
+            while time.monotonic() < deadline:
+                message = pubsub.get_message(timeout=1.0)
+                if message:
+                    yield f"event: delta\ndata: {message['data']}\n\n"
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= heartbeat_seconds:
+                    yield ': keep-alive\n\n'
+                    last_sent = time.monotonic()
+        except redis.RedisError:
+            pass
+        finally:
+            pubsub.close()
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
     })
+    # Runs even when the client goes away before the generator starts.
+    response.call_on_close(_release_stream_slot)
+    return response
 
 
 @api_bp.route('/competitions/<int:competition_id>/stats')
 def competition_stats(competition_id):
     """API endpoint for competition statistics"""
+    # New submissions do not bump the version; their count refreshes every STATS_REFRESH_SECONDS.
+    _, etag, last_modified, not_modified = _conditional_stamp(
+        competition_id, 'stats', current_app.config['STATS_REFRESH_SECONDS']
+    )
+    if not_modified:
+        return not_modified
     competition = Competition.query.get_or_404(competition_id)
     
     challenges_count = Challenge.query.filter_by(competition_id=competition_id, is_active=True).count()
@@ -141,9 +191,9 @@ def competition_stats(competition_id):
         Challenge.competition_id == competition_id
     ).scalar()
     
-    return jsonify({
+    return _set_validators(jsonify({
         'competition_id': competition.id,
         'challenges_count': challenges_count,
         'submissions_count': submissions_count,
         'is_running': competition.is_running()
-    })
+    }), etag, last_modified)
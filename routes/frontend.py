@@ -1,10 +1,16 @@
 import os
 from datetime import datetime
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort, jsonify
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from models import db, Challenge, Competition, Submission, SubmissionFile, CompetitionAccess, Team, TeamMember
 from forms import SubmissionForm
+from services.dify_review import LOG_STREAMING
+from services.identity import invalidate as invalidate_identity
+from services.leaderboard_cache import get_leaderboard
+from services.review_cache import file_digest
+from services.review_scheduler import enqueue_review
+from services.submissions import latest_submissions, submission_history
 
 frontend_bp = Blueprint('frontend', __name__)
 
@@ -15,14 +21,6 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
 
-def has_pin_access(user_id, competition_id):
-    """Return True if the user has already unlocked this competition via PIN."""
-    return CompetitionAccess.query.filter_by(
-        user_id=user_id,
-        competition_id=competition_id
-    ).first() is not None
-
-
 @frontend_bp.route('/')
 def index():
     """Homepage - show running and paused competitions"""
@@ -43,19 +41,12 @@ def competition_detail(competition_id):
         flash('This competition is currently paused.', 'warning')
         return redirect(url_for('frontend.index'))
     # Check PIN access (skip for admins)
-    if not current_user.is_admin and not has_pin_access(current_user.id, competition_id):
+    if not current_user.is_admin and not current_user.has_competition_access(competition_id):
         return redirect(url_for('frontend.pin_entry', competition_id=competition_id))
     challenges = Challenge.query.filter_by(competition_id=competition_id, is_active=True).order_by(Challenge.order_index.asc(), Challenge.id.asc()).all()
     
-    # Get user's submissions for this competition
-    user_submissions = {}
-    for challenge in challenges:
-        submission = Submission.query.filter_by(
-            user_id=current_user.id,
-            challenge_id=challenge.id
-        ).order_by(Submission.submitted_at.desc()).first()
-        if submission:
-            user_submissions[challenge.id] = submission
+    # Get user's latest submission per challenge for this competition
+    user_submissions = latest_submissions(current_user.id, [challenge.id for challenge in challenges])
     
     return render_template('frontend/competition.html', 
                          competition=competition, 
@@ -75,7 +66,7 @@ def challenge_detail(challenge_id):
         flash('This competition is not currently active.', 'warning')
         return redirect(url_for('frontend.competition_detail', competition_id=competition.id))
     # Check PIN access (skip for admins)
-    if not current_user.is_admin and not has_pin_access(current_user.id, competition.id):
+    if not current_user.is_admin and not current_user.has_competition_access(competition.id):
         return redirect(url_for('frontend.pin_entry', competition_id=competition.id))
 
     # Check if countdown has expired
@@ -117,7 +108,8 @@ def challenge_detail(challenge_id):
                 submission_file = SubmissionFile(
                     submission_id=submission.id,
                     filename=filename,
-                    filepath=unique_filename
+                    filepath=unique_filename,
+                    content_hash=file_digest(filepath)
                 )
                 db.session.add(submission_file)
         
@@ -126,17 +118,13 @@ def challenge_detail(challenge_id):
         # Trigger external hook if enabled globally or for this challenge.
         has_challenge_dify = bool(challenge.dify_config and challenge.dify_config.enabled)
         if current_app.config['EXTERNAL_HOOK_ENABLED'] or has_challenge_dify:
-            from tasks import trigger_external_hook
-            trigger_external_hook.delay(submission.id)
+            enqueue_review(submission.id)
         
         flash('Your submission has been received and is pending review.', 'success')
         return redirect(url_for('frontend.challenge_detail', challenge_id=challenge_id))
     
     # Get user's previous submissions
-    submissions = Submission.query.filter_by(
-        user_id=current_user.id,
-        challenge_id=challenge_id
-    ).order_by(Submission.submitted_at.desc()).all()
+    submissions = submission_history(current_user.id, challenge_id)
     
     return render_template('frontend/challenge.html', 
                          challenge=challenge, 
@@ -156,7 +144,7 @@ def pin_entry(competition_id):
         return redirect(url_for('frontend.index'))
 
     # Already has access – skip PIN page
-    if current_user.is_admin or has_pin_access(current_user.id, competition_id):
+    if current_user.is_admin or current_user.has_competition_access(competition_id):
         return redirect(url_for('frontend.competition_detail', competition_id=competition_id))
 
     if request.method == 'POST':
@@ -168,6 +156,7 @@ def pin_entry(competition_id):
             )
             db.session.add(access)
             db.session.commit()
+            invalidate_identity(current_user.id)
             flash('Access granted! Welcome to the competition.', 'success')
             return redirect(url_for('frontend.competition_detail', competition_id=competition_id))
         else:
@@ -181,119 +170,12 @@ def leaderboard(competition_id):
     """Competition leaderboard — individual and team views."""
     competition = Competition.query.get_or_404(competition_id)
 
-    # ── Individual leaderboard ──────────────────────────────────────────────
-    from sqlalchemy import func
-    from collections import defaultdict
-
-    max_scores_subquery = db.session.query(
-        Submission.user_id,
-        Submission.challenge_id,
-        func.max(Submission.points_awarded).label('max_points')
-    ).join(Challenge).filter(
-        Challenge.competition_id == competition_id,
-        Submission.status == 'approved'
-    ).group_by(
-        Submission.user_id,
-        Submission.challenge_id
-    ).subquery()
-
-    scores = db.session.query(
-        max_scores_subquery.c.user_id,
-        func.sum(max_scores_subquery.c.max_points).label('total_points')
-    ).group_by(
-        max_scores_subquery.c.user_id
-    ).subquery()
-
-    last_solve_subquery = db.session.query(
-        Submission.user_id,
-        func.max(Submission.reviewed_at).label('last_solve_time')
-    ).join(Challenge).filter(
-        Challenge.competition_id == competition_id,
-        Submission.status == 'approved'
-    ).group_by(Submission.user_id).subquery()
-
-    results = db.session.query(
-        scores.c.user_id,
-        scores.c.total_points,
-        last_solve_subquery.c.last_solve_time
-    ).join(
-        last_solve_subquery,
-        scores.c.user_id == last_solve_subquery.c.user_id
-    ).order_by(
-        scores.c.total_points.desc(),
-        last_solve_subquery.c.last_solve_time.asc()
-    ).all()
-
-    from models import User
-    # Build a map: user_id → team
-    all_memberships = TeamMember.query.all()
-    user_to_team = {m.user_id: m.team for m in all_memberships}
-    team_user_ids = set(user_to_team.keys())
-
-    leaderboard_data = []
-    rank = 1
-    for (user_id, total_points, last_solve_time) in results:
-        if user_id in team_user_ids:
-            continue  # skip users who are in a team
-        user = User.query.get(user_id)
-        leaderboard_data.append({
-            'rank': rank,
-            'user': user,
-            'total_points': int(total_points or 0),
-            'last_solve_time': last_solve_time,
-            'team': None,
-        })
-        rank += 1
-
-    # ── Team leaderboard ────────────────────────────────────────────────────
-    # Per team per challenge: take the best score from any member (deduplication).
-    team_challenge_rows = db.session.query(
-        TeamMember.team_id,
-        Submission.challenge_id,
-        func.max(Submission.points_awarded).label('max_points'),
-        func.max(Submission.reviewed_at).label('last_solve')
-    ).join(
-        Submission, Submission.user_id == TeamMember.user_id
-    ).join(
-        Challenge, Challenge.id == Submission.challenge_id
-    ).filter(
-        Challenge.competition_id == competition_id,
-        Submission.status == 'approved'
-    ).group_by(
-        TeamMember.team_id,
-        Submission.challenge_id
-    ).all()
-
-    team_totals = defaultdict(int)
-    team_last_solve = defaultdict(lambda: None)
-    for row in team_challenge_rows:
-        team_totals[row.team_id] += row.max_points
-        if team_last_solve[row.team_id] is None or (
-            row.last_solve and row.last_solve > team_last_solve[row.team_id]
-        ):
-            team_last_solve[row.team_id] = row.last_solve
-
-    team_leaderboard = []
-    for team_id, total_points in sorted(
-        team_totals.items(),
-        key=lambda x: (-x[1], team_last_solve[x[0]] or datetime.min)
-    ):
-        team = Team.query.get(team_id)
-        if team:
-            team_leaderboard.append({
-                'team': team,
-                'total_points': total_points,
-                'last_solve_time': team_last_solve[team_id],
-                'member_count': team.members.count(),
-            })
-
-    for i, entry in enumerate(team_leaderboard, 1):
-        entry['rank'] = i
+    board = get_leaderboard(competition_id)
 
     return render_template('frontend/leaderboard.html',
                            competition=competition,
-                           leaderboard=leaderboard_data,
-                           team_leaderboard=team_leaderboard)
+                           leaderboard=board.individual,
+                           team_leaderboard=board.teams)
 
 
 @frontend_bp.route('/leaderboard/<int:competition_id>/team/<int:team_id>')
@@ -366,9 +248,7 @@ def team_leaderboard_detail(competition_id, team_id):
 @login_required
 def my_submissions():
     """User's submission history"""
-    submissions = Submission.query.filter_by(user_id=current_user.id).order_by(
-        Submission.submitted_at.desc()
-    ).all()
+    submissions = submission_history(current_user.id)
     
     return render_template('frontend/my_submissions.html', submissions=submissions)
 
@@ -380,4 +260,30 @@ def my_submission_detail(submission_id):
     submission = Submission.query.get_or_404(submission_id)
     if submission.user_id != current_user.id:
         abort(403)
-    return render_template('frontend/my_submission_detail.html', submission=submission)
+    return render_template('frontend/my_submission_detail.html', submission=submission,
+                           ai_review_running=_ai_review_running(submission))
+
+
+@frontend_bp.route('/my-submissions/<int:submission_id>/progress')
+@login_required
+def my_submission_progress(submission_id):
+    """Review progress of the user's submission, polled while the AI review runs"""
+    submission = Submission.query.get_or_404(submission_id)
+    if submission.user_id != current_user.id:
+        abort(403)
+    dify_log = submission.dify_log
+    return jsonify({
+        'status': submission.status,
+        'review_status': dify_log.status if dify_log else None,
+        'answer_chars': (dify_log.answer_chars or 0) if dify_log else 0
+    })
+
+
+def _ai_review_running(submission):
+    """Whether a Dify review of this pending submission is queued or still streaming."""
+    if submission.status != 'pending':
+        return False
+    if submission.dify_log is not None:
+        return submission.dify_log.status == LOG_STREAMING
+    challenge_cfg = submission.challenge.dify_config
+    return current_app.config['EXTERNAL_HOOK_ENABLED'] or bool(challenge_cfg and challenge_cfg.enabled)
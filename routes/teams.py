@@ -2,7 +2,11 @@ import random
 import string
 from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
 from flask_login import login_required, current_user
-from models import db, Team, TeamMember
+from models import db, Team, TeamMember, TeamScore
+from services.identity import invalidate as invalidate_identity
+from services.leaderboard_events import notify_leaderboard_changed
+from services.scoring import refresh_team
+from services.versions import bump_competition_version
 
 teams_bp = Blueprint('teams', __name__)
 
@@ -21,15 +25,14 @@ def _unique_invite_code():
 def teams_list():
     """Browse all teams."""
     teams = Team.query.order_by(Team.created_at.desc()).all()
-    my_membership = current_user.team_membership
-    return render_template('teams/teams.html', teams=teams, my_membership=my_membership)
+    return render_template('teams/teams.html', teams=teams, my_team_id=current_user.team_id)
 
 
 @teams_bp.route('/teams/create', methods=['GET', 'POST'])
 @login_required
 def create_team():
     """Create a new team."""
-    if current_user.team_membership:
+    if current_user.team_id:
         flash('You are already in a team. Leave your current team first.', 'warning')
         return redirect(url_for('teams.my_team'))
 
@@ -60,7 +63,11 @@ def create_team():
 
         member = TeamMember(team_id=team.id, user_id=current_user.id)
         db.session.add(member)
+        changed = refresh_team(team.id)
         db.session.commit()
+        invalidate_identity(current_user.id)
+        for competition_id in changed:
+            notify_leaderboard_changed(competition_id)
 
         flash(f'Team "{name}" created successfully!', 'success')
         return redirect(url_for('teams.my_team'))
@@ -72,11 +79,10 @@ def create_team():
 @login_required
 def my_team():
     """View my current team."""
-    membership = current_user.team_membership
-    if not membership:
+    team = db.session.get(Team, current_user.team_id) if current_user.team_id else None
+    if not team:
         return redirect(url_for('teams.create_team'))
 
-    team = membership.team
     members = TeamMember.query.filter_by(team_id=team.id).order_by(TeamMember.joined_at).all()
     return render_template('teams/my_team.html', team=team, members=members)
 
@@ -85,7 +91,7 @@ def my_team():
 @login_required
 def join_team():
     """Join a team by invite code."""
-    if current_user.team_membership:
+    if current_user.team_id:
         flash('You are already in a team.', 'warning')
         return redirect(url_for('teams.my_team'))
 
@@ -101,7 +107,11 @@ def join_team():
 
     member = TeamMember(team_id=team.id, user_id=current_user.id)
     db.session.add(member)
+    changed = refresh_team(team.id)
     db.session.commit()
+    invalidate_identity(current_user.id)
+    for competition_id in changed:
+        notify_leaderboard_changed(competition_id)
 
     flash(f'Joined team "{team.name}" successfully!', 'success')
     return redirect(url_for('teams.my_team'))
@@ -111,12 +121,13 @@ def join_team():
 @login_required
 def leave_team():
     """Leave current team. Disbands if captain leaves as last member."""
-    membership = current_user.team_membership
+    team_id = current_user.team_id
+    membership = TeamMember.query.filter_by(team_id=team_id, user_id=current_user.id).first() if team_id else None
     if not membership:
         flash('You are not in a team.', 'warning')
         return redirect(url_for('teams.teams_list'))
 
-    team = membership.team
+    team = db.session.get(Team, membership.team_id)
     team_name = team.name
 
     if team.captain_id == current_user.id:
@@ -129,13 +140,23 @@ def leave_team():
             team.captain_id = other.user_id
         else:
             # Last member — disband
+            changed = [cid for (cid,) in team.scores.with_entities(TeamScore.competition_id)]
+            for competition_id in changed:
+                bump_competition_version(competition_id)
             db.session.delete(team)
             db.session.commit()
+            invalidate_identity(current_user.id)
+            for competition_id in changed:
+                notify_leaderboard_changed(competition_id)
             flash(f'Team "{team_name}" disbanded (you were the last member).', 'info')
             return redirect(url_for('teams.teams_list'))
 
     db.session.delete(membership)
+    changed = refresh_team(team.id)
     db.session.commit()
+    invalidate_identity(current_user.id)
+    for competition_id in changed:
+        notify_leaderboard_changed(competition_id)
     flash(f'You have left team "{team_name}".', 'info')
     return redirect(url_for('teams.teams_list'))
 
@@ -153,6 +174,10 @@ def kick_member(team_id, user_id):
 
     member = TeamMember.query.filter_by(team_id=team_id, user_id=user_id).first_or_404()
     db.session.delete(member)
+    changed = refresh_team(team_id)
     db.session.commit()
+    invalidate_identity(user_id)
+    for competition_id in changed:
+        notify_leaderboard_changed(competition_id)
     flash('Member removed from the team.', 'success')
     return redirect(url_for('teams.my_team'))
@@ -0,0 +1,78 @@
+"""Set-based archiving of a competition's submissions (competition reset).
+
+Submissions are moved to ``submission_history`` / ``submission_file_history``
+with ``INSERT ... SELECT`` and ``DELETE`` statements, one id-range chunk at a
+time and one commit per chunk, so a reset of tens of thousands of submissions
+never holds a single huge transaction and can report progress between chunks.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, delete, func, insert, literal, select
+
+from models import (db, Challenge, Submission, SubmissionDifyLog, SubmissionFile, SubmissionFileHistory,
+                    SubmissionHistory)
+
+
+def _competition_submissions(competition_id):
+    return Submission.challenge_id.in_(select(Challenge.id).where(Challenge.competition_id == competition_id))
+
+
+def archive_submissions(competition_id, chunk_size=1000, progress=None):
+    """Archive every current submission of a competition; returns the number archived.
+
+    Only submissions that exist when the call starts are archived. ``progress``
+    is called as ``progress(archived, total)`` after each committed chunk.
+    """
+    in_competition = _competition_submissions(competition_id)
+    total, max_id = db.session.query(func.count(Submission.id), func.max(Submission.id)).filter(in_competition).one()
+    archived, last_id = 0, 0
+    if progress:
+        progress(0, total)
+    while total:
+        ids = select(Submission.id).where(in_competition, Submission.id > last_id, Submission.id <= max_id).order_by(
+            Submission.id
+        ).limit(chunk_size)
+        upper = db.session.query(func.max(ids.subquery().c.id)).scalar()
+        if upper is None:
+            break
+        chunk = and_(in_competition, Submission.id > last_id, Submission.id <= upper)
+        archived += _archive_chunk(competition_id, chunk, last_id, upper)
+        db.session.commit()
+        last_id = upper
+        if progress:
+            progress(archived, total)
+    return archived
+
+
+def _archive_chunk(competition_id, chunk, lower_id, upper_id):
+    now = datetime.utcnow()
+    # History ids above this belong to the rows inserted for this chunk; it
+    # tells them apart from older archives of a reused submission id.
+    history_floor = db.session.query(func.coalesce(func.max(SubmissionHistory.id), 0)).scalar()
+
+    archived = db.session.execute(insert(SubmissionHistory).from_select(
+        ['original_submission_id', 'answer_text', 'status', 'points_awarded', 'submitted_at', 'reviewed_at',
+         'archived_at', 'user_id', 'challenge_id', 'competition_id', 'reviewed_by_id'],
+        select(Submission.id, Submission.answer_text, Submission.status, Submission.points_awarded,
+               Submission.submitted_at, Submission.reviewed_at, literal(now), Submission.user_id,
+               Submission.challenge_id, literal(competition_id), Submission.reviewed_by_id).where(chunk)
+    )).rowcount
+
+    db.session.execute(insert(SubmissionFileHistory).from_select(
+        ['original_file_id', 'filename', 'filepath', 'content_hash', 'uploaded_at', 'archived_at',
+         'submission_history_id'],
+        select(SubmissionFile.id, SubmissionFile.filename, SubmissionFile.filepath, SubmissionFile.content_hash,
+               SubmissionFile.uploaded_at, literal(now), SubmissionHistory.id).join(
+            SubmissionHistory, and_(
+                SubmissionHistory.original_submission_id == SubmissionFile.submission_id,
+                SubmissionHistory.competition_id == competition_id,
+                SubmissionHistory.id > history_floor
+            )
+        ).where(SubmissionFile.submission_id > lower_id, SubmissionFile.submission_id <= upper_id)
+    ))
+
+    chunk_ids = select(Submission.id).where(chunk)
+    db.session.execute(delete(SubmissionDifyLog).where(SubmissionDifyLog.submission_id.in_(chunk_ids)))
+    db.session.execute(delete(SubmissionFile).where(SubmissionFile.submission_id.in_(chunk_ids)))
+    db.session.execute(delete(Submission).where(chunk))
+    return archived
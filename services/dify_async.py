@@ -0,0 +1,249 @@
+"""Asyncio Dify review executor: many in-flight LLM reviews from one process.
+
+A prefork Celery slot sits idle for the whole Dify latency. ``AsyncReviewer``
+instead keeps up to ``DIFY_ASYNC_MAX_IN_FLIGHT`` requests outstanding (at most
+``DIFY_ASYNC_MAX_PER_HOST`` per hook host) over one pooled ``httpx.AsyncClient``,
+so throughput scales with outstanding requests rather than worker processes.
+
+Request building and result handling are the shared ``services.dify_review``
+functions. Database and Redis work happens in short app contexts on either
+side of the HTTP await (and, in streaming mode, between reads), so no DB
+connection is held while waiting on the model. That work runs on a small
+thread pool (``DIFY_ASYNC_DB_THREADS``) instead of the event loop: a commit,
+or ``apply_review`` rebuilding and publishing the leaderboard, never stalls
+the other in-flight streams.
+
+Run with ``flask dify-worker``; submissions reach it through the Redis list
+filled by ``review_scheduler.enqueue_review`` when ``DIFY_EXECUTOR=async``.
+Batch re-reviews (``services.rereview``) subclass ``AsyncReviewer`` and
+override how a verdict is settled.
+"""
+import asyncio
+import functools
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from models import db, Submission
+from services import dify_breaker
+from services.dify_client import host_key, record_call
+from services.dify_review import (REQUEST_TIMEOUT_SECONDS, AnswerStream, apply_review, build_review_request,
+                                  cached_review, dead_letter, fail_review, finish_stream, is_transient,
+                                  no_hook_result, record_progress, retry_delay)
+from services.redis_client import get_redis
+from services.review_scheduler import REVIEW_QUEUE_KEY, pump, release
+
+
+class AsyncReviewer:
+    """Review submissions concurrently under a global and a per-host in-flight limit."""
+
+    def __init__(self, app, max_in_flight=None, max_per_host=None, max_per_minute=None):
+        self.app = app
+        self.max_in_flight = max_in_flight or app.config['DIFY_ASYNC_MAX_IN_FLIGHT']
+        self.max_per_host = max_per_host or app.config['DIFY_ASYNC_MAX_PER_HOST']
+        # Optional cap on calls started per minute, spaced evenly.
+        self._interval = 60 / max_per_minute if max_per_minute else 0
+        self._next_start = 0.0
+        self._global = asyncio.Semaphore(self.max_in_flight)
+        self._hosts = defaultdict(lambda: asyncio.Semaphore(self.max_per_host))
+        self._client = None
+        self._db_threads = app.config['DIFY_ASYNC_DB_THREADS']
+        self._executor = None
+
+    async def __aenter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self._db_threads, thread_name_prefix='dify-db')
+        self._client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=self.max_in_flight,
+            max_keepalive_connections=self.max_in_flight
+        ))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._executor.shutdown(wait=True)
+
+    async def review(self, submission_id):
+        """Review one submission; returns the same result dict as ``tasks.trigger_external_hook``.
+
+        Transient failures are retried in place with ``retry_delay`` backoff;
+        the backoff sleep holds no concurrency slot. Identical resubmissions
+        reuse a cached verdict without calling Dify.
+        """
+        review, cache_key, result = await self._off_loop(self._prepare, submission_id)
+        if result is not None:
+            return result
+
+        max_retries = self.app.config['DIFY_RETRY_MAX']
+        for attempt in range(max_retries + 1):
+            result, error, wait = await self._attempt(submission_id, review, cache_key, attempts=attempt + 1)
+            if result is not None:
+                return result
+            if attempt < max_retries:
+                await self._with_submission(submission_id, fail_review, error)
+                await asyncio.sleep(retry_delay(attempt, self.app.config, wait))
+        return await self._with_submission(submission_id, self.give_up, error, max_retries + 1)
+
+    def _prepare(self, submission_id):
+        """``(review, cache_key, result)``; a result settles the review without calling Dify."""
+        with self.app.app_context():
+            submission = db.session.get(Submission, submission_id)
+            if not submission:
+                return None, None, {'error': 'Submission not found'}
+            review = self.build_request(submission)
+            if review is None:
+                return None, None, no_hook_result()
+            try:
+                cache_key, result = self.check_cache(submission, review)
+            except Exception as e:
+                db.session.rollback()
+                return None, None, {'success': False, 'error': f'Unexpected error: {str(e)}'}
+            return review, cache_key, result
+
+    def build_request(self, submission):
+        """The Dify call for a submission, or None without a hook URL."""
+        return build_review_request(submission, self.app.config)
+
+    def check_cache(self, submission, review):
+        """``(cache_key, result)`` before calling Dify; a result settles the review without a call."""
+        return cached_review(submission, review)
+
+    def settle(self, submission, dify_response, cache_key):
+        """Write back a blocking-mode answer; returns the review result."""
+        return apply_review(submission, dify_response, cache_key=cache_key)
+
+    def give_up(self, submission, error, attempts):
+        """Settle a review that produced no verdict."""
+        return dead_letter(submission, error, attempts)
+
+    async def _throttle(self):
+        if not self._interval:
+            return
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _attempt(self, submission_id, review, cache_key, attempts):
+        """One call to Dify: ``(result, None, 0)`` once settled, ``(None, error, wait)`` when worth retrying."""
+        wait = await self._in_app(dify_breaker.seconds_until_closed, review.url, REQUEST_TIMEOUT_SECONDS)
+        if wait:
+            return None, f'Circuit open for {review.url}', wait
+        await self._throttle()
+
+        host = host_key(review.url)
+        # Host slot first, so requests queued behind a saturated host do not hold global slots.
+        async with self._hosts[host], self._global:
+            start = time.monotonic()
+            try:
+                if review.streaming:
+                    stream = await self._stream(submission_id, review)
+                else:
+                    response = await self._client.post(review.url, json=review.payload, headers=review.headers,
+                                                        timeout=REQUEST_TIMEOUT_SECONDS)
+                    response.raise_for_status()
+                    dify_response = response.json()
+            except httpx.HTTPError as e:
+                await self._in_app(record_call, host, time.monotonic() - start, 0, True)
+                error = f'Request failed: {str(e)}'
+                if not is_transient(e):
+                    return await self._with_submission(submission_id, self.give_up, error, attempts), None, 0
+                await self._in_app(dify_breaker.record_failure, review.url)
+                return None, error, 0
+            except ValueError as e:
+                # A 200 whose body is not JSON: retrying would get the same answer.
+                await self._in_app(record_call, host, time.monotonic() - start, 0, True)
+                error = f'Invalid Dify response: {str(e)}'
+                return await self._with_submission(submission_id, self.give_up, error, attempts), None, 0
+            # httpx does not expose connection opens; the connection counter is left to the sync client.
+            await self._in_app(record_call, host, time.monotonic() - start, 0)
+
+        await self._in_app(dify_breaker.record_success, review.url)
+        if review.streaming:
+            result = await self._with_submission(submission_id, finish_stream, stream, cache_key)
+        else:
+            result = await self._with_submission(submission_id, self.settle, dify_response, cache_key)
+        if not result['success']:
+            result = await self._with_submission(submission_id, self.give_up, result['error'], attempts)
+        return result, None, 0
+
+    async def _stream(self, submission_id, review):
+        """Read a streaming answer, persisting progress between reads; returns the ``AnswerStream``."""
+        stream = AnswerStream()
+        flush_seconds = self.app.config['DIFY_STREAM_FLUSH_SECONDS']
+        last_flush = time.monotonic()
+        async with self._client.stream('POST', review.url, json=review.payload, headers=review.headers,
+                                       timeout=REQUEST_TIMEOUT_SECONDS) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if stream.feed(line) and time.monotonic() - last_flush >= flush_seconds:
+                    await self._with_submission(submission_id, record_progress, stream.answer)
+                    last_flush = time.monotonic()
+                if stream.done:
+                    break
+        return stream
+
+    async def _with_submission(self, submission_id, handler, *args):
+        """Run ``handler(submission, *args)`` off the event loop, in a short app context of its own."""
+        return await self._off_loop(self._call_with_submission, submission_id, handler, *args)
+
+    def _call_with_submission(self, submission_id, handler, *args):
+        with self.app.app_context():
+            try:
+                return handler(db.session.get(Submission, submission_id), *args)
+            except Exception as e:
+                db.session.rollback()
+                return {'success': False, 'error': f'Unexpected error: {str(e)}'}
+
+    async def _in_app(self, function, *args):
+        """Run ``function(*args)`` off the event loop, inside an app context."""
+        return await self._off_loop(self._call_in_app, function, *args)
+
+    def _call_in_app(self, function, *args):
+        with self.app.app_context():
+            return function(*args)
+
+    async def _off_loop(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(function, *args))
+
+    async def review_many(self, submission_ids):
+        """Review a batch concurrently; results are in input order."""
+        return await asyncio.gather(*(self.review(submission_id) for submission_id in submission_ids))
+
+    async def run(self, stop=None, poll_seconds=1):
+        """Consume the Redis review queue until ``stop`` is set, keeping the in-flight cap."""
+        with self.app.app_context():
+            client = get_redis()
+        if client is None:
+            raise RuntimeError('The async Dify executor needs REDIS_URL for its review queue.')
+        stop = stop or asyncio.Event()
+        in_flight = set()
+        while not stop.is_set():
+            if len(in_flight) >= self.max_in_flight:
+                _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            item = await asyncio.to_thread(client.blpop, REVIEW_QUEUE_KEY, poll_seconds)
+            if item:
+                in_flight.add(asyncio.create_task(self._review_queued(int(item[1]))))
+            else:
+                # Idle: pick up anything the fair queue could not dispatch earlier.
+                await self._in_app(pump)
+            in_flight = {task for task in in_flight if not task.done()}
+        if in_flight:
+            await asyncio.wait(in_flight)
+
+    async def _review_queued(self, submission_id):
+        try:
+            return await self.review(submission_id)
+        finally:
+            await self._in_app(release, submission_id)
+
+
+def review_submissions(app, submission_ids, **limits):
+    """Synchronous entry point: review a batch of submissions concurrently."""
+    async def _run():
+        async with AsyncReviewer(app, **limits) as reviewer:
+            return await reviewer.review_many(submission_ids)
+    return asyncio.run(_run())
@@ -0,0 +1,152 @@
+"""Per-hook-URL circuit breaker for Dify calls, shared across workers through Redis.
+
+After ``DIFY_BREAKER_THRESHOLD`` consecutive transient failures (connection
+errors, timeouts, 429 / 5xx) a hook URL is *open* for
+``DIFY_BREAKER_COOLDOWN_SECONDS``: reviews for it are rescheduled without
+calling it, instead of each one spending a worker on a 30 s timeout. Once the
+cool-down passes the breaker is *half-open* and exactly one caller probes the
+URL; success closes it, another failure opens it for a new cool-down.
+
+State lives in the Redis hash ``dify:breaker:{url}``; without Redis each
+process keeps its own copy, which still protects that process.
+"""
+import threading
+import time
+
+import redis
+from flask import current_app
+
+from services.redis_client import get_redis
+
+BREAKER_KEY_PREFIX = 'dify:breaker:'
+BREAKER_URLS_KEY = 'dify:breaker:urls'
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def _key(url):
+    return f'{BREAKER_KEY_PREFIX}{url}'
+
+
+def _settings():
+    config = current_app.config
+    return config['DIFY_BREAKER_THRESHOLD'], config['DIFY_BREAKER_COOLDOWN_SECONDS']
+
+
+def _redis_call(action):
+    """Run ``action(client)`` against Redis; None when Redis is not configured or fails."""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return action(client)
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Dify circuit breaker falling back to process-local state: {e}')
+        return None
+
+
+def _state(url):
+    """``(failures, open_until)`` for a hook URL."""
+    stored = _redis_call(lambda client: client.hmget(_key(url), 'failures', 'open_until'))
+    if stored is None:
+        with _local_lock:
+            state = _local.get(url, {})
+            return state.get('failures', 0), state.get('open_until', 0.0)
+    failures, open_until = stored
+    return int(failures or 0), float(open_until or 0)
+
+
+def _claim_probe(url, hold_seconds):
+    # SET NX answers None when the probe is already taken; keep that apart from "no Redis".
+    claimed = _redis_call(
+        lambda client: bool(client.set(f'{_key(url)}:probe', 1, nx=True, ex=max(1, int(hold_seconds))))
+    )
+    if claimed is not None:
+        return claimed
+    with _local_lock:
+        state = _local.setdefault(url, {})
+        if state.get('probe_until', 0.0) > time.time():
+            return False
+        state['probe_until'] = time.time() + hold_seconds
+        return True
+
+
+def seconds_until_closed(url, probe_seconds):
+    """0 when a call to ``url`` may go ahead, otherwise how long to wait before trying again.
+
+    In the half-open state the caller that gets 0 is the probe; others wait
+    ``probe_seconds`` (the request timeout) for its outcome.
+    """
+    threshold, _ = _settings()
+    failures, open_until = _state(url)
+    if failures < threshold:
+        return 0.0
+    remaining = open_until - time.time()
+    if remaining > 0:
+        return remaining
+    return 0.0 if _claim_probe(url, probe_seconds) else float(probe_seconds)
+
+
+def record_failure(url):
+    """Count a transient failure; opens the breaker once the threshold is reached."""
+    threshold, cooldown = _settings()
+    open_until = time.time() + cooldown
+
+    def _record(client):
+        key = _key(url)
+        failures = client.hincrby(key, 'failures', 1)
+        pipe = client.pipeline()
+        if failures >= threshold:
+            pipe.hset(key, 'open_until', open_until)
+            pipe.delete(f'{key}:probe')
+        # Forget a URL that has been quiet for a while rather than keeping it half-open forever.
+        pipe.expire(key, int(cooldown * 10) + 60)
+        pipe.sadd(BREAKER_URLS_KEY, url)
+        pipe.execute()
+        return failures
+
+    if _redis_call(_record) is not None:
+        return
+    with _local_lock:
+        state = _local.setdefault(url, {})
+        state['failures'] = state.get('failures', 0) + 1
+        if state['failures'] >= threshold:
+            state['open_until'] = open_until
+            state.pop('probe_until', None)
+
+
+def record_success(url):
+    """A successful call closes the breaker."""
+    def _reset(client):
+        pipe = client.pipeline()
+        pipe.delete(_key(url), f'{_key(url)}:probe')
+        pipe.srem(BREAKER_URLS_KEY, url)
+        pipe.execute()
+        return True
+
+    if _redis_call(_reset) is None:
+        with _local_lock:
+            _local.pop(url, None)
+
+
+def breaker_states():
+    """``{url: {'failures', 'state'}}`` for every URL with recent failures."""
+    threshold, _ = _settings()
+    urls = _redis_call(lambda client: client.smembers(BREAKER_URLS_KEY))
+    if urls is None:
+        with _local_lock:
+            urls = set(_local)
+
+    states = {}
+    now = time.time()
+    for url in sorted(urls):
+        failures, open_until = _state(url)
+        if not failures:
+            continue
+        if failures < threshold:
+            state = 'closed'
+        else:
+            state = 'open' if open_until > now else 'half-open'
+        states[url] = {'failures': failures, 'state': state}
+    return states
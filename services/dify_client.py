@@ -0,0 +1,137 @@
+"""Pooled HTTP client for Dify hook calls.
+
+One ``requests.Session`` per hook host (scheme + host + port, so per-challenge
+``ChallengeDifyConfig.base_url`` overrides get their own pool) is kept for the
+life of the worker process. Connections are reused with keep-alive instead of
+paying a TCP + TLS handshake per submission. Pool sizes come from
+``DIFY_POOL_MAXSIZE`` with per-host overrides in ``DIFY_POOL_MAXSIZE_BY_HOST``.
+
+Per-host request, error, new-connection and latency counters are recorded in
+process and, when Redis is configured, aggregated across workers in a Redis
+hash so the web app can expose them (``admin.dify_metrics``).
+"""
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import redis
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from services.redis_client import get_redis
+
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+METRICS_KEY_PREFIX = 'dify:metrics:'
+METRICS_HOSTS_KEY = 'dify:metrics:hosts'
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_local_metrics = defaultdict(lambda: defaultdict(int))
+
+
+def host_key(url):
+    """``scheme://host[:port]`` of a hook URL; the unit of pooling and metrics."""
+    parts = urlsplit(url)
+    return f'{parts.scheme.lower()}://{parts.netloc.lower()}'
+
+
+def _pool_maxsize(host):
+    overrides = current_app.config.get('DIFY_POOL_MAXSIZE_BY_HOST') or {}
+    netloc = host.split('://', 1)[-1]
+    return overrides.get(netloc) or overrides.get(host) or current_app.config.get('DIFY_POOL_MAXSIZE', 10)
+
+
+def session_for(url):
+    """The keep-alive session for a hook URL's host, created on first use."""
+    host = host_key(url)
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_pool_maxsize(host))
+                session.mount(f'{host}/', adapter)
+                _sessions[host] = session
+    return session
+
+
+def _pool(session, url):
+    adapter = session.get_adapter(url)
+    return adapter.poolmanager.connection_from_url(url)
+
+
+def post(url, **kwargs):
+    """POST through the host's pooled session, recording per-host metrics."""
+    session = session_for(url)
+    pool = _pool(session, url)
+    opened_before = pool.num_connections
+    start = time.monotonic()
+    try:
+        response = session.post(url, **kwargs)
+    except requests.exceptions.RequestException:
+        record_call(host_key(url), time.monotonic() - start, pool.num_connections - opened_before, error=True)
+        raise
+    record_call(host_key(url), time.monotonic() - start, pool.num_connections - opened_before,
+            error=response.status_code >= 500)
+    return response
+
+
+def record_call(host, elapsed, connections_opened, error=False):
+    """Add one call to the per-host counters (used by the sync and async clients)."""
+    latency_ms = int(elapsed * 1000)
+    bucket = next((f'le_{limit}' for limit in LATENCY_BUCKETS_MS if latency_ms <= limit), 'le_inf')
+    counters = {
+        'requests': 1,
+        'errors': int(error),
+        'connections_opened': connections_opened,
+        'latency_ms_total': latency_ms,
+        bucket: 1,
+    }
+    local = _local_metrics[host]
+    for field, amount in counters.items():
+        local[field] += amount
+
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.sadd(METRICS_HOSTS_KEY, host)
+        for field, amount in counters.items():
+            if amount:
+                pipe.hincrby(METRICS_KEY_PREFIX + host, field, amount)
+        pipe.execute()
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Dify metrics for {host} not recorded: {e}')
+
+
+def _summarize(counters):
+    counters = {field: int(value) for field, value in counters.items()}
+    requests_count = counters.get('requests', 0)
+    return {
+        'requests': requests_count,
+        'errors': counters.get('errors', 0),
+        'connections_opened': counters.get('connections_opened', 0),
+        # Share of requests served on an already-open keep-alive connection.
+        'connection_reuse_ratio': round(1 - counters.get('connections_opened', 0) / requests_count, 3)
+        if requests_count else None,
+        'latency_ms_avg': round(counters.get('latency_ms_total', 0) / requests_count, 1) if requests_count else None,
+        'latency_ms_buckets': {
+            f'le_{limit}': counters.get(f'le_{limit}', 0) for limit in (*LATENCY_BUCKETS_MS, 'inf')
+        },
+    }
+
+
+def host_metrics():
+    """Per-host metrics: aggregated over all workers via Redis, else this process only."""
+    client = get_redis()
+    if client is not None:
+        try:
+            hosts = sorted(client.smembers(METRICS_HOSTS_KEY))
+            return {host: _summarize(client.hgetall(METRICS_KEY_PREFIX + host)) for host in hosts}
+        except redis.RedisError as e:
+            current_app.logger.warning(f'Dify metrics unavailable: {e}')
+    return {host: _summarize(counters) for host, counters in sorted(_local_metrics.items())}
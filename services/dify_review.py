@@ -0,0 +1,426 @@
+"""Dify auto-review: request building and result handling shared by every executor.
+
+``tasks.trigger_external_hook`` (one blocking call per Celery task) and
+``services.dify_async`` (many concurrent calls from one process) only differ
+in how the HTTP request is sent; both build it with ``build_review_request``
+and write the outcome back with ``apply_review``.
+
+With ``DIFY_RESPONSE_MODE=streaming`` Dify answers with Server-Sent Events;
+``AnswerStream`` assembles the answer as it arrives and ``record_progress``
+persists the partial feedback every ``DIFY_STREAM_FLUSH_SECONDS`` so review
+pages can show progress before the verdict lands.
+
+Transient failures (connection errors, timeouts, 429 / 5xx) are retried by
+the executor with ``retry_delay`` backoff; reviews that still fail, or fail
+for good, are parked with ``dead_letter`` until an admin calls ``redrive``.
+
+Before calling Dify, executors ask ``cached_review`` whether identical content
+was already judged (``services.review_cache``); a fresh verdict is cached by
+``apply_review`` when it is given the request's cache key.
+"""
+import json
+import random
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import redis
+from flask import current_app
+
+from models import db, Submission, SubmissionDifyLog
+from dify_secrets import reveal_api_key
+from services import review_cache
+from services.leaderboard_events import notify_leaderboard_changed
+from services.redis_client import get_redis
+from services.review_scheduler import enqueue_review
+from services.scoring import refresh_submission_score
+
+REQUEST_TIMEOUT_SECONDS = 30
+DEAD_LETTER_KEY = 'dify:review:dead'
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# SubmissionDifyLog.status values
+LOG_STREAMING = 'streaming'
+LOG_COMPLETED = 'completed'
+LOG_FAILED = 'failed'
+
+_FEEDBACK_START = re.compile(r'"feedback"\s*:\s*"')
+
+
+@dataclass(frozen=True)
+class ReviewRequest:
+    url: str
+    headers: dict
+    payload: dict
+
+    @property
+    def streaming(self):
+        return self.payload['response_mode'] == 'streaming'
+
+
+class AnswerStream:
+    """Incremental parser for a streaming (SSE) Dify chat-messages response."""
+
+    def __init__(self):
+        self.answer = ''
+        self.finished = False
+        self.error = None
+        self._end_event = {}
+
+    def feed(self, line):
+        """Consume one SSE line; returns True when the answer text changed."""
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if not line.startswith('data:'):
+            return False
+        try:
+            event = json.loads(line[5:])
+        except json.JSONDecodeError:
+            return False
+
+        kind = event.get('event')
+        if kind in ('message', 'agent_message'):
+            chunk = event.get('answer') or ''
+            self.answer += chunk
+            return bool(chunk)
+        if kind == 'message_replace':
+            self.answer = event.get('answer') or ''
+            return True
+        if kind == 'message_end':
+            self.finished = True
+            self._end_event = event
+        elif kind == 'error':
+            self.error = event.get('message') or event.get('code') or 'unknown error'
+        return False
+
+    @property
+    def done(self):
+        return self.finished or self.error is not None
+
+    def response(self):
+        """The finished stream in the shape of a blocking-mode response."""
+        return {**self._end_event, 'answer': self.answer}
+
+
+def hook_url(challenge, config):
+    """Return challenge-specific hook URL if enabled, otherwise global hook URL."""
+    challenge_cfg = getattr(challenge, 'dify_config', None)
+    if challenge_cfg and challenge_cfg.enabled and (challenge_cfg.base_url or '').strip():
+        return challenge_cfg.base_url.strip()
+
+    return (config.get('EXTERNAL_HOOK_URL') or '').strip()
+
+
+def api_key(challenge, config):
+    """Resolve API key with challenge-level override and global fallback."""
+    global_api_key = config.get('DIFY_API_KEY', '')
+    challenge_cfg = getattr(challenge, 'dify_config', None)
+    challenge_credential = getattr(challenge, 'dify_credential', None)
+
+    if challenge_cfg and challenge_cfg.enabled and challenge_credential and (challenge_credential.api_key_token or '').strip():
+        revealed = reveal_api_key(challenge_credential.api_key_token, config.get('SECRET_KEY', ''))
+        if revealed:
+            return revealed
+
+    return global_api_key
+
+
+def build_review_request(submission, config):
+    """The Dify call for a submission, or None when no hook URL is configured."""
+    challenge = submission.challenge
+    url = hook_url(challenge, config)
+    if not url:
+        return None
+
+    # Prepare files list for Dify
+    files = []
+    upload_url_prefix = config.get('UPLOAD_URL_PREFIX', 'http://localhost:5000/uploads')
+    for file in submission.files:
+        # Determine file type based on extension
+        file_ext = file.filename.lower().split('.')[-1] if '.' in file.filename else ''
+        file_type = 'image' if file_ext in ['png', 'jpg', 'jpeg', 'gif'] else 'file'
+        files.append({
+            'type': file_type,
+            'transfer_method': 'remote_url',
+            'url': f"{upload_url_prefix}/{file.filepath}"
+        })
+
+    return ReviewRequest(
+        url=url,
+        headers={
+            # No trailing space when no key is configured: httpx rejects it as an illegal header value.
+            'Authorization': f'Bearer {api_key(challenge, config)}'.rstrip(),
+            'Content-Type': 'application/json'
+        },
+        payload={
+            'inputs': {},
+            'query': submission.answer_text or '评分',
+            'response_mode': config.get('DIFY_RESPONSE_MODE', 'blocking'),
+            'conversation_id': '',
+            'user': f"user-{submission.user_id}",
+            'files': files
+        }
+    )
+
+
+def no_hook_result():
+    return {
+        'success': False,
+        'error': 'No Dify hook URL configured (neither challenge-specific nor global).'
+    }
+
+
+def parse_answer(answer_text):
+    """Parse the JSON verdict in a Dify answer; raises ``json.JSONDecodeError``."""
+    # Strip markdown code fences if Dify wraps the response in ```json ... ```
+    stripped = answer_text.strip()
+    if stripped.startswith('```'):
+        # Remove opening fence (```json or ```)
+        stripped = stripped.split('\n', 1)[1] if '\n' in stripped else stripped[3:]
+        # Remove closing fence
+        if stripped.rstrip().endswith('```'):
+            stripped = stripped.rstrip()[:-3].rstrip()
+        answer_text = stripped
+    return json.loads(answer_text)
+
+
+def verdict_outcome(answer_data):
+    """``(status, points)`` a parsed verdict decides, or ``(None, 0)`` when it leaves the call to a human."""
+    if not answer_data.get('auto_approved'):
+        return None, 0
+    if answer_data.get('success'):
+        return 'approved', answer_data.get('score', 0)
+    return 'rejected', 0
+
+
+def partial_feedback(answer_text):
+    """The ``feedback`` value of a possibly unterminated JSON verdict, as far as it has arrived."""
+    match = _FEEDBACK_START.search(answer_text)
+    if not match:
+        return ''
+    chars = []
+    escaped = False
+    for char in answer_text[match.end():]:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '"':
+            break
+        chars.append(char)
+    if escaped:
+        chars.pop()
+    raw = ''.join(chars)
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError:
+        # A \u escape cut mid-way; show it undecoded until the rest arrives.
+        return raw
+
+
+def _dify_log(submission):
+    dify_log = submission.dify_log
+    if not dify_log:
+        dify_log = SubmissionDifyLog(submission_id=submission.id)
+        db.session.add(dify_log)
+    return dify_log
+
+
+def record_progress(submission, answer_text):
+    """Persist the partial feedback of a streaming answer. Commits."""
+    dify_log = _dify_log(submission)
+    dify_log.status = LOG_STREAMING
+    dify_log.feedback = partial_feedback(answer_text)
+    dify_log.answer_chars = len(answer_text)
+    db.session.commit()
+
+
+def fail_review(submission, error):
+    """Result for a review that produced no verdict; an in-progress log is marked failed. Commits."""
+    dify_log = submission.dify_log
+    if dify_log is not None and dify_log.status == LOG_STREAMING:
+        dify_log.status = LOG_FAILED
+        db.session.commit()
+    return {'success': False, 'error': error}
+
+
+def finish_stream(submission, stream, cache_key=None):
+    """Apply the verdict of an ended stream, or fail the review if it never completed."""
+    if stream.error is not None:
+        return fail_review(submission, f'Dify stream error: {stream.error}')
+    if not stream.finished:
+        return fail_review(submission, 'Dify stream ended before message_end')
+    return apply_review(submission, stream.response(), cache_key=cache_key)
+
+
+def stream_review(submission, lines, flush_seconds, cache_key=None):
+    """Review from an iterable of SSE lines, persisting progress at most every ``flush_seconds``."""
+    stream = AnswerStream()
+    last_flush = time.monotonic()
+    for line in lines:
+        if stream.feed(line) and time.monotonic() - last_flush >= flush_seconds:
+            record_progress(submission, stream.answer)
+            last_flush = time.monotonic()
+        if stream.done:
+            break
+    return finish_stream(submission, stream, cache_key=cache_key)
+
+
+def cached_review(submission, review):
+    """``(cache_key, result)``: the review applied from a cached verdict, or result None on a miss.
+
+    Pass the key on to ``apply_review`` so the miss is recorded and its verdict cached.
+    """
+    key, answer_text = review_cache.lookup(submission, review)
+    if answer_text is None:
+        return key, None
+    return key, apply_review(submission, {'answer': answer_text, 'cached': True}, cache_key=key, cache_hit=True)
+
+
+def is_transient(error):
+    """Whether a failed Dify call (``requests`` or ``httpx`` error) is worth retrying."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        # No response at all: refused connection, timeout, dropped stream.
+        return True
+    return response.status_code in RETRYABLE_STATUS_CODES
+
+
+def retry_delay(attempt, config, minimum=0):
+    """Seconds before retry number ``attempt + 1``: exponential backoff with full jitter."""
+    ceiling = min(config['DIFY_RETRY_BACKOFF_MAX_SECONDS'], config['DIFY_RETRY_BACKOFF_SECONDS'] * 2 ** attempt)
+    return minimum + random.uniform(0, ceiling)
+
+
+def dead_letter(submission, error, attempts):
+    """Give up on a review: the submission stays pending and is listed for admins to re-drive. Commits."""
+    result = fail_review(submission, error)
+    entry = json.dumps({'error': error, 'attempts': attempts, 'failed_at': datetime.utcnow().isoformat()})
+    current_app.logger.warning(f'Dify review of submission {submission.id} failed after {attempts} attempt(s): {error}')
+    client = get_redis()
+    if client is not None:
+        try:
+            client.hset(DEAD_LETTER_KEY, submission.id, entry)
+        except redis.RedisError as e:
+            current_app.logger.warning(f'Could not dead-letter the review of submission {submission.id}: {e}')
+    return {**result, 'dead_lettered': True}
+
+
+def dead_letters():
+    """Dead-lettered reviews, newest first. Raises ``redis.RedisError`` when Redis is unavailable."""
+    client = get_redis()
+    if client is None:
+        return []
+    entries = [
+        {'submission_id': int(submission_id), **json.loads(entry)}
+        for submission_id, entry in client.hgetall(DEAD_LETTER_KEY).items()
+    ]
+    return sorted(entries, key=lambda entry: entry['failed_at'], reverse=True)
+
+
+def redrive(submission_ids=None):
+    """Re-queue dead-lettered reviews, all of them when ``submission_ids`` is None.
+
+    Returns ``(redriven, skipped)`` id lists. Submissions reviewed by hand in the
+    meantime are dropped from the dead-letter list without being re-queued.
+    Raises ``redis.RedisError`` when Redis is unavailable.
+    """
+    client = get_redis()
+    if client is None:
+        return [], []
+    parked = {int(submission_id) for submission_id in client.hkeys(DEAD_LETTER_KEY)}
+    wanted = parked if submission_ids is None else parked & {int(i) for i in submission_ids}
+    if not wanted:
+        return [], []
+    pending = {
+        submission_id for (submission_id,) in db.session.query(Submission.id)
+        .filter(Submission.id.in_(wanted), Submission.status == 'pending')
+    }
+    client.hdel(DEAD_LETTER_KEY, *wanted)
+    for submission_id in sorted(pending):
+        enqueue_review(submission_id)
+    return sorted(pending), sorted(wanted - pending)
+
+
+def record_verdict(submission, answer_text, answer_data, cache_key=None, cache_hit=False):
+    """Write a parsed verdict onto the Dify log and, when it decides, the submission. Does not commit.
+
+    Returns ``(status, was_approved)``: the new status (None keeps the
+    submission pending) and whether it was approved before. Scores are left
+    to the caller.
+    """
+    # Persist feedback/score for admin secondary review reference.
+    dify_log = _dify_log(submission)
+    dify_log.status = LOG_COMPLETED
+    dify_log.answer_chars = len(answer_text)
+    dify_log.feedback = answer_data.get('feedback', '')
+    score_value = answer_data.get('score')
+    try:
+        dify_log.score = int(score_value) if score_value is not None else None
+    except (TypeError, ValueError):
+        dify_log.score = None
+    dify_log.cache_key = cache_key
+    dify_log.cache_hit = cache_hit if cache_key else None
+    if cache_key and not cache_hit:
+        review_cache.store(cache_key, answer_text)
+
+    # Update submission based on Dify response
+    # Auto-approve/reject if auto_approved is True
+    status, points = verdict_outcome(answer_data)
+    if status is None:
+        return None, False
+
+    was_approved = submission.status == 'approved'
+    submission.status = status
+    submission.points_awarded = points
+
+    submission.reviewed_at = datetime.utcnow()
+    submission.reviewed_by_name = 'AI'  # Mark as AI-reviewed
+    # Note: reviewed_by_id remains None to indicate auto-approval
+    return status, was_approved
+
+
+def apply_review(submission, dify_response, cache_key=None, cache_hit=False):
+    """Persist a Dify verdict: feedback log, auto-approval status and scores. Commits.
+
+    With a ``cache_key`` the log records whether the verdict came from the
+    cache, and a fresh verdict is cached for identical resubmissions.
+    """
+    # Extract answer field and parse it as JSON
+    answer_text = dify_response.get('answer', '')
+    try:
+        answer_data = parse_answer(answer_text)
+    except json.JSONDecodeError as e:
+        # If answer is not valid JSON, log and keep pending
+        fail_review(submission, 'Failed to parse Dify answer as JSON')
+        return {
+            'success': False,
+            'error': 'Failed to parse Dify answer as JSON',
+            'answer_text': answer_text,
+            'parse_error': str(e)
+        }
+
+    status, was_approved = record_verdict(submission, answer_text, answer_data, cache_key, cache_hit)
+    if status is None:
+        # Keep as pending for manual review
+        db.session.commit()
+        return {
+            'success': True,
+            'auto_approved': False,
+            'feedback': answer_data.get('feedback', ''),
+            'dify_response': dify_response
+        }
+
+    refresh_submission_score(submission)
+    db.session.commit()
+    notify_leaderboard_changed(submission.challenge.competition_id, append_only=not was_approved)
+
+    return {
+        'success': True,
+        'auto_approved': True,
+        'auto_status': submission.status,
+        'score': submission.points_awarded,
+        'feedback': answer_data.get('feedback', ''),
+        'dify_response': dify_response
+    }
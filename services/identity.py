@@ -0,0 +1,171 @@
+"""The logged-in user as a compact identity snapshot, cached in Redis.
+
+``login_manager.user_loader`` returns an ``Identity`` instead of the ``User``
+row. It carries what most requests check: id, username, the admin and
+disabled flags, the team id and the competitions unlocked by PIN. With Redis
+the snapshot is stored under ``identity:{user_id}`` for
+``IDENTITY_CACHE_SECONDS``, so a player's request authenticates and passes
+the PIN / admin checks without touching the database.
+
+Every change to those fields must call ``invalidate`` (or ``invalidate_many``)
+after its commit: admin / disable toggles, deleting the user, joining or
+leaving a team, unlocking a competition, deleting a competition. It bumps the
+per-user counter ``identity:version:{user_id}``; a snapshot is only served
+while its version matches, so a snapshot built concurrently with a change is
+never served afterwards.
+
+Without Redis (or on a miss) the fields come from the database: the user row
+by primary key, team and unlocked competitions only when first asked for.
+Anything else (``email``, ``team_membership``, ``set_password``, ...) is read
+from the ``User`` row, loaded on first use.
+"""
+import json
+
+import redis
+from flask import current_app, has_request_context
+from flask_login import UserMixin, current_user
+
+from models import db, CompetitionAccess, TeamMember, User
+from services.redis_client import get_redis
+
+IDENTITY_KEY = 'identity:{user_id}'
+VERSION_KEY = 'identity:version:{user_id}'
+FIELDS = ('id', 'username', 'is_admin', 'is_disabled')
+
+
+class Identity(UserMixin):
+    """What requests need to know about the logged-in user, without loading the row."""
+
+    def __init__(self, snapshot, user=None):
+        self._snapshot = snapshot
+        self._user = user
+
+    @classmethod
+    def from_user(cls, user):
+        return cls({field: getattr(user, field) for field in FIELDS}, user)
+
+    @property
+    def id(self):
+        return self._snapshot['id']
+
+    @property
+    def username(self):
+        return self._snapshot['username']
+
+    @property
+    def is_admin(self):
+        return bool(self._snapshot['is_admin'])
+
+    @property
+    def is_disabled(self):
+        return bool(self._snapshot['is_disabled'])
+
+    @property
+    def team_id(self):
+        if 'team_id' not in self._snapshot:
+            self._snapshot['team_id'] = db.session.query(TeamMember.team_id).filter_by(user_id=self.id).scalar()
+        return self._snapshot['team_id']
+
+    @property
+    def competition_ids(self):
+        """Ids of the competitions this user unlocked with their PIN."""
+        if 'competition_ids' not in self._snapshot:
+            self._snapshot['competition_ids'] = sorted(
+                competition_id for (competition_id,) in
+                db.session.query(CompetitionAccess.competition_id).filter_by(user_id=self.id)
+            )
+        return frozenset(self._snapshot['competition_ids'])
+
+    def has_competition_access(self, competition_id):
+        return competition_id in self.competition_ids
+
+    def forget(self):
+        """Re-read the team and unlocked competitions on next use."""
+        self._snapshot.pop('team_id', None)
+        self._snapshot.pop('competition_ids', None)
+
+    @property
+    def user(self):
+        """The ``User`` row, loaded on first use."""
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __repr__(self):
+        return f'<Identity {self.username}>'
+
+
+def _dump(identity, version):
+    return json.dumps({
+        'version': version,
+        **{field: getattr(identity, field) for field in FIELDS},
+        'team_id': identity.team_id,
+        'competition_ids': sorted(identity.competition_ids),
+    })
+
+
+def _load(raw, version):
+    """The cached snapshot, or None when it is missing or from before the last invalidation."""
+    if raw is None:
+        return None
+    snapshot = json.loads(raw)
+    if snapshot.pop('version', None) != version:
+        return None
+    return snapshot
+
+
+def load_identity(user_id):
+    """``user_loader``: the cached identity of ``user_id``, or None when the user no longer exists."""
+    client = get_redis()
+    cache_key, version_key = IDENTITY_KEY.format(user_id=user_id), VERSION_KEY.format(user_id=user_id)
+    version = None
+    if client is not None:
+        try:
+            raw, version = client.mget(cache_key, version_key)
+            version = version or '0'
+            snapshot = _load(raw, version)
+            if snapshot is not None:
+                return Identity(snapshot)
+        except (redis.RedisError, ValueError) as e:
+            current_app.logger.warning(f'Identity cache unavailable: {e}')
+            version = None
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    identity = Identity.from_user(user)
+    if version is not None:
+        try:
+            client.set(cache_key, _dump(identity, version), ex=current_app.config['IDENTITY_CACHE_SECONDS'])
+        except redis.RedisError as e:
+            current_app.logger.warning(f'Could not cache identity of user {user_id}: {e}')
+    return identity
+
+
+def invalidate_many(user_ids):
+    """Stop serving the cached identities of ``user_ids``. Call after committing the change."""
+    user_ids = set(user_ids)
+    if has_request_context() and current_user.is_authenticated and current_user.id in user_ids:
+        # The rest of this request sees the change too.
+        current_user.forget()
+    client = get_redis()
+    if client is None or not user_ids:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for user_id in user_ids:
+            # Never expires: a counter restarting from 0 could match an old snapshot again.
+            pipe.incr(VERSION_KEY.format(user_id=user_id))
+            pipe.delete(IDENTITY_KEY.format(user_id=user_id))
+        pipe.execute()
+    except redis.RedisError as e:
+        current_app.logger.error(f'Could not invalidate cached identities {sorted(user_ids)}: {e}')
+
+
+def invalidate(user_id):
+    invalidate_many([user_id])
@@ -0,0 +1,111 @@
+"""Leaderboard engine shared by ``frontend.leaderboard`` and ``api.leaderboard_api``.
+
+Reads the materialized scores maintained by ``services.scoring`` and resolves
+usernames, team names and member counts in bulk, so rendering a leaderboard
+costs a constant number of queries regardless of how many rows it has.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func
+from models import db, Team, TeamMember, TeamScore, User, UserScore
+
+
+@dataclass(frozen=True)
+class IndividualEntry:
+    rank: int
+    user_id: int
+    username: str
+    total_points: int
+    last_solve_time: Optional[datetime]
+
+    def to_json(self):
+        return {
+            'rank': self.rank,
+            'username': self.username,
+            'total_points': self.total_points,
+            'last_solve_time': self.last_solve_time.isoformat() if self.last_solve_time else None
+        }
+
+
+@dataclass(frozen=True)
+class TeamEntry:
+    rank: int
+    team_id: int
+    team_name: str
+    member_count: int
+    total_points: int
+    last_solve_time: Optional[datetime]
+
+    def to_json(self):
+        return {
+            'rank': self.rank,
+            'team_id': self.team_id,
+            'team_name': self.team_name,
+            'total_points': self.total_points,
+            'member_count': self.member_count,
+            'last_solve_time': self.last_solve_time.isoformat() if self.last_solve_time else None
+        }
+
+
+@dataclass(frozen=True)
+class Leaderboard:
+    competition_id: int
+    individual: List[IndividualEntry] = field(default_factory=list)
+    teams: List[TeamEntry] = field(default_factory=list)
+
+
+def build_leaderboard(competition_id):
+    """Return the individual and team leaderboard of a competition (2 queries)."""
+    # Users who belong to a team are ranked on the team board only.
+    individual_rows = db.session.query(
+        UserScore.user_id,
+        User.username,
+        UserScore.total_points,
+        UserScore.last_solve_time
+    ).join(
+        User, User.id == UserScore.user_id
+    ).outerjoin(
+        TeamMember, TeamMember.user_id == UserScore.user_id
+    ).filter(
+        UserScore.competition_id == competition_id,
+        TeamMember.id.is_(None)
+    ).order_by(
+        UserScore.total_points.desc(),
+        UserScore.last_solve_time.asc()
+    ).all()
+
+    member_counts = db.session.query(
+        TeamMember.team_id,
+        func.count(TeamMember.id).label('member_count')
+    ).group_by(TeamMember.team_id).subquery()
+
+    team_rows = db.session.query(
+        TeamScore.team_id,
+        Team.name,
+        func.coalesce(member_counts.c.member_count, 0),
+        TeamScore.total_points,
+        TeamScore.last_solve_time
+    ).join(
+        Team, Team.id == TeamScore.team_id
+    ).outerjoin(
+        member_counts, member_counts.c.team_id == TeamScore.team_id
+    ).filter(
+        TeamScore.competition_id == competition_id
+    ).order_by(
+        TeamScore.total_points.desc(),
+        TeamScore.last_solve_time.asc()
+    ).all()
+
+    return Leaderboard(
+        competition_id=competition_id,
+        individual=[
+            IndividualEntry(rank, user_id, username, int(total_points or 0), last_solve_time)
+            for rank, (user_id, username, total_points, last_solve_time) in enumerate(individual_rows, 1)
+        ],
+        teams=[
+            TeamEntry(rank, team_id, name, int(member_count or 0), int(total_points or 0), last_solve_time)
+            for rank, (team_id, name, member_count, total_points, last_solve_time) in enumerate(team_rows, 1)
+        ],
+    )
@@ -0,0 +1,119 @@
+"""Shared Redis cache for built leaderboards.
+
+Every gunicorn worker in every pod used to rebuild the same leaderboard. The
+built ``Leaderboard`` is now cached in Redis per competition, tagged with the
+competition version stamp so a stale write can never be served for a newer
+version. On a miss, a single-flight lock lets one worker rebuild while the
+others wait for its result. Scoring events invalidate the entry through
+``services.leaderboard_events.notify_leaderboard_changed``.
+"""
+import json
+import time
+import uuid
+from dataclasses import asdict
+from datetime import datetime
+
+import redis
+from flask import current_app
+
+from services.leaderboard import IndividualEntry, Leaderboard, TeamEntry, build_leaderboard
+from services.redis_client import get_redis
+from services.versions import competition_stamp
+
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _cache_key(competition_id):
+    return f'leaderboard:{competition_id}:board'
+
+
+def _lock_key(competition_id):
+    return f'leaderboard:{competition_id}:lock'
+
+
+def _dump(board, version):
+    def encode(entry):
+        data = asdict(entry)
+        data['last_solve_time'] = entry.last_solve_time.isoformat() if entry.last_solve_time else None
+        return data
+    return json.dumps({
+        'version': version,
+        'individual': [encode(e) for e in board.individual],
+        'teams': [encode(e) for e in board.teams],
+    })
+
+
+def _load(raw, competition_id, version):
+    data = json.loads(raw)
+    if data.get('version') != version:
+        return None
+
+    def decode(cls, item):
+        item['last_solve_time'] = datetime.fromisoformat(item['last_solve_time']) if item['last_solve_time'] else None
+        return cls(**item)
+    return Leaderboard(
+        competition_id=competition_id,
+        individual=[decode(IndividualEntry, item) for item in data['individual']],
+        teams=[decode(TeamEntry, item) for item in data['teams']],
+    )
+
+
+def get_leaderboard(competition_id, version=None):
+    """Return the competition's leaderboard from the shared cache, building it on a miss.
+
+    ``version`` is the competition version stamp the caller already looked up
+    (``services.versions.competition_stamp``); it is fetched when omitted.
+    Without Redis this is just ``build_leaderboard``.
+    """
+    client = get_redis()
+    if client is None:
+        return build_leaderboard(competition_id)
+    if version is None:
+        stamp = competition_stamp(competition_id)
+        version = stamp[0] if stamp else 0
+
+    ttl = current_app.config['LEADERBOARD_CACHE_TTL']
+    lock_seconds = current_app.config['LEADERBOARD_CACHE_LOCK_SECONDS']
+    key = _cache_key(competition_id)
+    try:
+        raw = client.get(key)
+        board = _load(raw, competition_id, version) if raw else None
+        if board:
+            return board
+
+        token = uuid.uuid4().hex
+        if client.set(_lock_key(competition_id), token, nx=True, ex=lock_seconds):
+            try:
+                board = build_leaderboard(competition_id)
+                client.set(key, _dump(board, version), ex=ttl)
+                return board
+            finally:
+                client.eval(_RELEASE_LOCK, 1, _lock_key(competition_id), token)
+
+        # Another worker is rebuilding: wait for its result instead of piling on.
+        deadline = time.monotonic() + lock_seconds
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            raw = client.get(key)
+            board = _load(raw, competition_id, version) if raw else None
+            if board:
+                return board
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Leaderboard cache unavailable for competition {competition_id}: {e}')
+    return build_leaderboard(competition_id)
+
+
+def invalidate_leaderboard(competition_id):
+    """Drop the cached leaderboard of a competition (best-effort)."""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.delete(_cache_key(competition_id))
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Leaderboard cache for competition {competition_id} not invalidated: {e}')
@@ -0,0 +1,134 @@
+"""Live leaderboard updates over Redis pub/sub.
+
+After a scoring change is committed, ``notify_leaderboard_changed`` rebuilds
+the (cheap, materialized) leaderboard once, diffs it against the last snapshot
+kept in Redis and publishes only the changed rows. ``api.leaderboard_stream``
+relays these deltas to browsers as Server-Sent Events, so spectator traffic
+scales with the number of score changes instead of viewers × poll rate.
+
+Several processes notify concurrently (Celery reviews, bulk review, admin
+actions). The snapshot is therefore tagged with the competition version it
+was built for, and one Lua script swaps it, takes the next sequence number
+and publishes only if the stored snapshot is still the one the delta was
+computed against and the new version is newer. A slower notifier holding an
+older board publishes nothing, and deltas are numbered in version order.
+"""
+import json
+
+import redis
+from flask import current_app
+
+from models import db
+from services.leaderboard_cache import get_leaderboard, invalidate_leaderboard
+from services.redis_client import get_redis
+from services.timeline import invalidate_timeline
+from services.versions import competition_stamp
+
+PUBLISH_ATTEMPTS = 3
+
+# KEYS: snapshot, snapshot version, seq. ARGV: expected stored version, new version, snapshot, delta ('' if
+# nothing changed), channel. Returns -1 when another notifier stored a snapshot meanwhile, else the seq (0: none).
+_PUBLISH = """
+local stored = tonumber(redis.call('get', KEYS[2]) or '-1')
+if stored ~= tonumber(ARGV[1]) then
+    return -1
+end
+if tonumber(ARGV[2]) <= stored then
+    return 0
+end
+redis.call('set', KEYS[1], ARGV[3])
+redis.call('set', KEYS[2], ARGV[2])
+if ARGV[4] == '' then
+    return 0
+end
+local seq = redis.call('incr', KEYS[3])
+redis.call('publish', ARGV[5], '{"seq": ' .. seq .. ', ' .. string.sub(ARGV[4], 2))
+return seq
+"""
+
+
+def channel_name(competition_id):
+    return f'leaderboard:{competition_id}:events'
+
+
+def _snapshot_key(competition_id):
+    return f'leaderboard:{competition_id}:snapshot'
+
+
+def _snapshot_version_key(competition_id):
+    return f'leaderboard:{competition_id}:snapshot-version'
+
+
+def _seq_key(competition_id):
+    return f'leaderboard:{competition_id}:seq'
+
+
+def snapshot(board):
+    """Serializable view of a leaderboard keyed the way deltas are applied client-side."""
+    return {
+        'leaderboard': {entry.username: entry.to_json() for entry in board.individual},
+        'team_leaderboard': {str(entry.team_id): entry.to_json() for entry in board.teams},
+    }
+
+
+def diff_snapshots(old, new):
+    """Return the rows that were added/changed and the keys that disappeared, per board."""
+    delta = {}
+    for board_name in ('leaderboard', 'team_leaderboard'):
+        old_rows = old.get(board_name, {})
+        new_rows = new.get(board_name, {})
+        delta[board_name] = {
+            'upsert': [row for key, row in new_rows.items() if old_rows.get(key) != row],
+            'remove': [key for key in old_rows if key not in new_rows],
+        }
+    return delta
+
+
+def notify_leaderboard_changed(competition_id, append_only=False):
+    """Invalidate the cached leaderboard and publish rank deltas for a competition.
+
+    Call after the scoring change is committed. The rebuild done here goes
+    through the shared cache, so it also re-warms it for the next readers.
+    Pass ``append_only=True`` when the change only adds new approvals, so the
+    cached score timeline can be extended instead of replayed.
+    """
+    client = get_redis()
+    if client is None:
+        return
+    invalidate_leaderboard(competition_id)
+    if not append_only:
+        invalidate_timeline(competition_id)
+    keys = (_snapshot_key(competition_id), _snapshot_version_key(competition_id), _seq_key(competition_id))
+    try:
+        for _ in range(PUBLISH_ATTEMPTS):
+            stamp = competition_stamp(competition_id)
+            if stamp is None:
+                return
+            version = stamp[0]
+            previous, stored_version = client.mget(keys[0], keys[1])
+            stored_version = int(stored_version) if stored_version is not None else -1
+            if version <= stored_version:
+                return  # Another notifier already published this version or a newer one.
+            new = snapshot(get_leaderboard(competition_id, version))
+            delta = diff_snapshots(json.loads(previous) if previous else {}, new)
+            changed = any(part['upsert'] or part['remove'] for part in delta.values())
+            if client.eval(_PUBLISH, 3, *keys, stored_version, version, json.dumps(new),
+                           json.dumps(delta) if changed else '', channel_name(competition_id)) != -1:
+                return
+            # Lost the race to a concurrent notifier: diff against its snapshot instead.
+            db.session.rollback()
+        current_app.logger.warning(f'Leaderboard update for competition {competition_id} gave up after '
+                                   f'{PUBLISH_ATTEMPTS} concurrent notifiers')
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Leaderboard update for competition {competition_id} not published: {e}')
+
+
+def current_seq(competition_id):
+    """Sequence number of the last published delta (0 if none), or None without Redis."""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return int(client.get(_seq_key(competition_id)) or 0)
+    except redis.RedisError:
+        return None
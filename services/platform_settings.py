@@ -0,0 +1,69 @@
+"""Per-process cache of the platform settings injected into every template.
+
+``template_settings`` serves the name, logo and footer from memory, loading
+all ``platform_settings`` rows in one query when the cache is older than
+``PLATFORM_SETTINGS_CACHE_SECONDS``. ``admin.settings`` calls ``invalidate``
+after saving: this process reloads right away and the Redis counter
+``platform:settings:version`` makes every other worker reload on its next
+render. Without Redis other workers pick the change up once their TTL runs out.
+"""
+import time
+
+import redis
+from flask import current_app, g
+
+from models import PlatformSettings
+from services.redis_client import get_redis
+
+SETTINGS_VERSION_KEY = 'platform:settings:version'
+DEFAULT_PLATFORM_NAME = 'CTF Platform'
+DEFAULT_FOOTER_TEXT = '100% Written by AI · Made with ♥ by Matt'
+
+
+def load_settings():
+    """``{key: value}`` of every platform setting, in one query."""
+    return dict(PlatformSettings.query.with_entities(PlatformSettings.key, PlatformSettings.value))
+
+
+def _version():
+    """The shared settings version, read once per request; None without Redis."""
+    if 'platform_settings_version' not in g:
+        client = get_redis()
+        version = None
+        if client is not None:
+            try:
+                version = client.get(SETTINGS_VERSION_KEY) or '0'
+            except redis.RedisError as e:
+                current_app.logger.warning(f'Platform settings version unavailable: {e}')
+        g.platform_settings_version = version
+    return g.platform_settings_version
+
+
+def template_settings():
+    """``PLATFORM_NAME``, ``PLATFORM_LOGO`` and ``FOOTER_TEXT`` for templates, from the process cache."""
+    cache = current_app.extensions.setdefault('platform_settings', {'loaded_at': float('-inf')})
+    version = _version()
+    now = time.monotonic()
+    expired = now - cache['loaded_at'] >= current_app.config['PLATFORM_SETTINGS_CACHE_SECONDS']
+    if expired or (version is not None and version != cache.get('version')):
+        values = load_settings()
+        cache['settings'] = {
+            'PLATFORM_NAME': values.get('platform_name', DEFAULT_PLATFORM_NAME),
+            'PLATFORM_LOGO': values.get('platform_logo'),
+            'FOOTER_TEXT': values.get('footer_text', DEFAULT_FOOTER_TEXT),
+        }
+        cache['version'], cache['loaded_at'] = version, now
+    return dict(cache['settings'])
+
+
+def invalidate():
+    """Make every worker reload the settings on its next render (after the change is committed)."""
+    current_app.extensions.pop('platform_settings', None)
+    g.pop('platform_settings_version', None)
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.incr(SETTINGS_VERSION_KEY)
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Other workers will see the new platform settings after their cache TTL: {e}')
@@ -0,0 +1,27 @@
+"""Process-wide Redis client shared by the leaderboard, caches and queues."""
+import redis
+from flask import current_app
+
+_clients = {}
+
+
+def get_redis():
+    """Return the shared Redis client for ``REDIS_URL``, or None when Redis is not configured.
+
+    Callers must treat Redis as best-effort: catch ``redis.RedisError`` and fall
+    back to the database path, never fail the request because Redis is down.
+    """
+    url = current_app.config.get('REDIS_URL')
+    if not url:
+        return None
+    client = _clients.get(url)
+    if client is None:
+        client = redis.Redis.from_url(
+            url,
+            decode_responses=True,
+            socket_connect_timeout=2,
+            socket_timeout=5,
+            health_check_interval=30,
+        )
+        _clients[url] = client
+    return client
@@ -0,0 +1,218 @@
+"""Batch re-review of a challenge's submissions after its Dify workflow changed.
+
+``create_run`` freezes the selection as one ``ReReviewResult`` row per
+submission, holding its current status and points. ``run_rereview`` (the
+``tasks.rereview_challenge`` Celery task) then sends every queued row to Dify
+through ``ReReviewer``, an ``AsyncReviewer`` limited to the run's concurrency
+and calls per minute. It bypasses the fair queue and the verdict cache: the
+point is a fresh verdict from the changed workflow. Starting a run also bumps
+the challenge's verdict generation, so normal reviews stop reusing verdicts
+the old workflow gave.
+
+* Dry run: the new verdict is only stored on the result row, next to the old
+  status; submissions, Dify logs and scores are untouched. ``apply_run``
+  applies the stored verdicts later without calling Dify again, in one
+  transaction with one score refresh and one leaderboard notification.
+* Otherwise each verdict is applied as it arrives, like a normal review.
+
+Progress is the share of rows that are no longer queued.
+"""
+import asyncio
+import dataclasses
+import json
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, insert
+
+from models import db, ReReviewResult, ReReviewRun, Submission
+from services.dify_async import AsyncReviewer
+from services.dify_review import apply_review, parse_answer, record_verdict, verdict_outcome
+from services.leaderboard_events import notify_leaderboard_changed
+from services.review_cache import bump_generation
+from services.scoring import refresh_challenge_scores
+
+RESULT_QUEUED = 'queued'
+RESULT_DONE = 'done'
+RESULT_FAILED = 'failed'
+STATUSES = ('pending', 'approved', 'rejected')
+
+
+class ReReviewer(AsyncReviewer):
+    """Review the rows of one run and record each verdict on its result row."""
+
+    def __init__(self, app, run):
+        super().__init__(app, max_in_flight=run.concurrency, max_per_host=run.concurrency,
+                         max_per_minute=run.rate_per_minute)
+        self.run_id = run.id
+        self.dry_run = run.dry_run
+
+    def build_request(self, submission):
+        review = super().build_request(submission)
+        if review is None:
+            return None
+        # Whole answers only: streaming progress would overwrite the Dify log of a dry run.
+        return dataclasses.replace(review, payload={**review.payload, 'response_mode': 'blocking'})
+
+    def check_cache(self, submission, review):
+        return None, None
+
+    def settle(self, submission, dify_response, cache_key):
+        answer_text = dify_response.get('answer', '')
+        try:
+            answer_data = parse_answer(answer_text)
+        except json.JSONDecodeError:
+            return {'success': False, 'error': 'Failed to parse Dify answer as JSON'}
+        if not self.dry_run:
+            result = apply_review(submission, dify_response)
+            if not result['success']:
+                return result
+
+        row = _result_row(self.run_id, submission.id)
+        row.new_status, row.new_points = verdict_outcome(answer_data)
+        score = answer_data.get('score')
+        try:
+            row.score = int(score) if score is not None else None
+        except (TypeError, ValueError):
+            row.score = None
+        row.feedback = answer_data.get('feedback', '')
+        row.answer_text = answer_text
+        row.state = RESULT_DONE
+        row.reviewed_at = datetime.utcnow()
+        db.session.commit()
+        return {'success': True, 'new_status': row.new_status, 'new_points': row.new_points}
+
+    def give_up(self, submission, error, attempts):
+        _fail_row(_result_row(self.run_id, submission.id), error)
+        db.session.commit()
+        return {'success': False, 'error': error}
+
+
+def _result_row(run_id, submission_id):
+    return ReReviewResult.query.filter_by(run_id=run_id, submission_id=submission_id).one()
+
+
+def _fail_row(row, error):
+    row.state = RESULT_FAILED
+    row.error = error
+    row.reviewed_at = datetime.utcnow()
+
+
+def create_run(challenge, statuses, dry_run, concurrency, rate_per_minute, created_by_id=None):
+    """Select the challenge's submissions in ``statuses`` for re-review. Commits."""
+    run = ReReviewRun(
+        challenge_id=challenge.id,
+        dry_run=dry_run,
+        statuses=','.join(statuses),
+        concurrency=concurrency,
+        rate_per_minute=rate_per_minute,
+        created_by_id=created_by_id,
+    )
+    db.session.add(run)
+    db.session.flush()
+    rows = [
+        {'run_id': run.id, 'submission_id': submission_id, 'state': RESULT_QUEUED,
+         'old_status': status, 'old_points': points}
+        for submission_id, status, points in db.session.query(
+            Submission.id, Submission.status, Submission.points_awarded
+        ).filter(Submission.challenge_id == challenge.id, Submission.status.in_(statuses)).order_by(Submission.id)
+    ]
+    if rows:
+        db.session.execute(insert(ReReviewResult), rows)
+    db.session.commit()
+    return run
+
+
+def run_rereview(app, run_id):
+    """Re-review the queued rows of a run; rows without a verdict end up failed."""
+    with app.app_context():
+        run = db.session.get(ReReviewRun, run_id)
+        if run is None or run.status in ('completed', 'failed'):
+            return
+        run.status = 'running'
+        db.session.commit()
+        bump_generation(run.challenge_id)
+        submission_ids = [
+            submission_id for (submission_id,) in db.session.query(ReReviewResult.submission_id)
+            .filter_by(run_id=run_id, state=RESULT_QUEUED).order_by(ReReviewResult.submission_id)
+        ]
+        reviewer = ReReviewer(app, run)
+
+    async def _run():
+        async with reviewer:
+            return await reviewer.review_many(submission_ids)
+
+    try:
+        results = asyncio.run(_run())
+    except Exception as e:
+        with app.app_context():
+            current_app.logger.error(f'Re-review run {run_id} failed: {e}')
+            run = db.session.get(ReReviewRun, run_id)
+            run.status, run.error, run.finished_at = 'failed', str(e), datetime.utcnow()
+            db.session.commit()
+        raise
+
+    with app.app_context():
+        # Submissions archived meanwhile, no hook URL, unexpected errors.
+        errors = dict(zip(submission_ids, (result.get('error') for result in results)))
+        for row in ReReviewResult.query.filter_by(run_id=run_id, state=RESULT_QUEUED):
+            _fail_row(row, errors.get(row.submission_id) or 'Not reviewed')
+        run = db.session.get(ReReviewRun, run_id)
+        run.status, run.finished_at = 'completed', datetime.utcnow()
+        db.session.commit()
+
+
+def run_progress(run):
+    """Counts per result state, plus how many verdicts differ from the old status."""
+    counts = dict(
+        db.session.query(ReReviewResult.state, func.count())
+        .filter(ReReviewResult.run_id == run.id).group_by(ReReviewResult.state)
+    )
+    changed = ReReviewResult.query.filter(
+        ReReviewResult.run_id == run.id,
+        ReReviewResult.new_status.isnot(None),
+        ReReviewResult.new_status != ReReviewResult.old_status,
+    ).count()
+    return {
+        'id': run.id,
+        'status': run.status,
+        'dry_run': run.dry_run,
+        'total': sum(counts.values()),
+        'queued': counts.get(RESULT_QUEUED, 0),
+        'done': counts.get(RESULT_DONE, 0),
+        'failed': counts.get(RESULT_FAILED, 0),
+        'changed': changed,
+        'applied': run.applied_at is not None,
+    }
+
+
+def apply_run(run):
+    """Apply the stored verdicts of a completed dry run; returns ``(applied, skipped)`` submission ids.
+
+    Submissions archived, or reviewed again since the run selected them, are skipped.
+    """
+    applied, skipped = [], []
+    competition_id = run.challenge.competition_id
+    score_keys, append_only = set(), True
+    rows = ReReviewResult.query.filter_by(run_id=run.id, state=RESULT_DONE).order_by(ReReviewResult.submission_id)
+    for row in rows.all():
+        submission = db.session.get(Submission, row.submission_id)
+        if submission is None or (submission.status, submission.points_awarded) != (row.old_status, row.old_points):
+            skipped.append(row.submission_id)
+            continue
+        try:
+            answer_data = parse_answer(row.answer_text)
+        except json.JSONDecodeError:
+            skipped.append(row.submission_id)
+            continue
+        status, was_approved = record_verdict(submission, row.answer_text, answer_data)
+        if status is not None:
+            score_keys.add((competition_id, submission.user_id, submission.challenge_id))
+            append_only = append_only and not was_approved
+        applied.append(row.submission_id)
+    refresh_challenge_scores(score_keys)
+    run.applied_at = datetime.utcnow()
+    db.session.commit()
+    if score_keys:
+        notify_leaderboard_changed(competition_id, append_only=append_only)
+    return applied, skipped
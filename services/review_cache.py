@@ -0,0 +1,136 @@
+"""Content-addressed cache of Dify verdicts for identical resubmissions.
+
+Players often resubmit the same answer and screenshots to the same challenge.
+``lookup`` finds a verdict Dify already gave for identical content, so the
+review is applied without another LLM call; ``store`` records fresh verdicts
+for ``DIFY_DEDUP_TTL_SECONDS`` (0 disables the cache).
+
+The key covers the challenge, the hook URL and API key (a different Dify app
+may judge differently), the answer text with whitespace and Unicode form
+normalized, the SHA-256 of every uploaded file, and the challenge's verdict
+generation. A changed Dify workflow keeps its URL and API key, so starting a
+batch re-review calls ``bump_generation``: verdicts cached for the old workflow
+are never served again and expire with their TTL. Entries live in Redis under
+``dify:verdict:{key}``; without Redis every review calls Dify.
+"""
+import hashlib
+import os
+import unicodedata
+
+import redis
+from flask import current_app
+from sqlalchemy import func
+
+from models import db, SubmissionDifyLog
+from services.redis_client import get_redis
+
+VERDICT_KEY_PREFIX = 'dify:verdict:'
+GENERATION_KEY = 'dify:verdict-generation:{challenge_id}'
+_CHUNK_SIZE = 64 * 1024
+
+
+def file_digest(path):
+    """SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_answer(answer_text):
+    """Answer text with Unicode form, surrounding and repeated whitespace normalized."""
+    return ' '.join(unicodedata.normalize('NFC', answer_text or '').split())
+
+
+def _file_hashes(submission):
+    """Content hashes of the submission's files, or None when one of them is gone."""
+    hashes = []
+    for file in submission.files:
+        if file.content_hash:
+            hashes.append(file.content_hash)
+            continue
+        # Uploaded before hashes were stored.
+        try:
+            hashes.append(file_digest(os.path.join(current_app.config['UPLOAD_FOLDER'], file.filepath)))
+        except OSError:
+            return None
+    return sorted(hashes)
+
+
+def cache_key(submission, review, generation='0'):
+    """Cache key of a review request, or None when its content cannot be addressed."""
+    hashes = _file_hashes(submission)
+    if hashes is None:
+        return None
+    digest = hashlib.sha256()
+    for part in (str(submission.challenge_id), generation, review.url, review.headers.get('Authorization', ''),
+                 normalize_answer(submission.answer_text), *hashes):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _cache_client():
+    """The Redis client when the cache is on, otherwise None."""
+    if current_app.config['DIFY_DEDUP_TTL_SECONDS'] <= 0:
+        return None
+    return get_redis()
+
+
+def lookup(submission, review):
+    """``(key, answer)`` for a review: the cached answer text on a hit, None on a miss.
+
+    The key is None when the cache is off, unavailable or the content unknown;
+    such reviews record neither a hit nor a miss.
+    """
+    client = _cache_client()
+    if client is None:
+        return None, None
+    try:
+        generation = client.get(GENERATION_KEY.format(challenge_id=submission.challenge_id)) or '0'
+        key = cache_key(submission, review, generation)
+        if key is None:
+            return None, None
+        return key, client.get(f'{VERDICT_KEY_PREFIX}{key}')
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Dify verdict cache unavailable: {e}')
+        return None, None
+
+
+def store(key, answer_text):
+    """Remember the answer Dify gave for ``key`` (best-effort)."""
+    client = _cache_client()
+    if client is None:
+        return
+    try:
+        client.set(f'{VERDICT_KEY_PREFIX}{key}', answer_text, ex=int(current_app.config['DIFY_DEDUP_TTL_SECONDS']))
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Dify verdict not cached: {e}')
+
+
+def bump_generation(challenge_id):
+    """Stop serving the verdicts cached for a challenge, e.g. once its workflow changed (best-effort)."""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        # Never expires: a counter restarting from 0 could match old verdicts again.
+        client.incr(GENERATION_KEY.format(challenge_id=challenge_id))
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Dify verdicts of challenge {challenge_id} not invalidated: {e}')
+
+
+def cache_stats():
+    """Hits and misses recorded on Dify logs."""
+    counts = dict(
+        db.session.query(SubmissionDifyLog.cache_hit, func.count())
+        .filter(SubmissionDifyLog.cache_hit.isnot(None))
+        .group_by(SubmissionDifyLog.cache_hit)
+    )
+    hits, misses = counts.get(True, 0), counts.get(False, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+    }
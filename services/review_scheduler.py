@@ -0,0 +1,278 @@
+"""Fair scheduling of Dify reviews across competitions and players.
+
+Without it every review goes straight to the executor in FIFO order, so one
+player submitting 200 times delays everybody else's auto-review. With Redis
+configured, ``enqueue_review`` instead parks each review in a per-player queue
+and ``pump`` hands reviews to the executor:
+
+* a priority lane for a player's first submission to a challenge, served first;
+* otherwise round-robin across competitions with waiting reviews, then across
+  the players of that competition, one review per turn;
+* at most ``DIFY_FAIR_MAX_IN_FLIGHT_PER_USER`` reviews of one player in flight;
+* at most ``DIFY_FAIR_MAX_IN_FLIGHT`` in flight overall, so the executor's own
+  FIFO never holds a backlog that fairness can no longer reorder.
+
+Queue updates are Lua scripts, so web workers submitting and executors
+dispatching never see a half-updated ring. Executors call ``release`` once a
+review settles (retries keep the slot), which frees the slot and pumps again;
+slots lost with a crashed worker are reclaimed after
+``DIFY_FAIR_INFLIGHT_TIMEOUT_SECONDS``.
+"""
+import time
+
+import redis
+from flask import current_app
+
+from models import db, Challenge, Submission
+from services.redis_client import get_redis
+
+REVIEW_QUEUE_KEY = 'dify:review:queue'  # Executor queue of ``flask dify-worker``
+KEY_PREFIX = 'dify:fair:'
+INFLIGHT_KEY = f'{KEY_PREFIX}inflight'
+PRIORITY_SCAN = 100
+WAIT_SAMPLES = 100
+
+# Ring invariants: a player is in ``users:{cid}`` iff their queue is non-empty,
+# a competition is in ``competitions`` iff its player ring is non-empty.
+_SUBMIT = """
+local p, sid, cid, uid, now = ARGV[1], ARGV[2], ARGV[3], ARGV[4], ARGV[5]
+if redis.call('hexists', p .. 'owners', sid) == 1 or redis.call('sadd', p .. 'queued', sid) == 0 then
+    return 0
+end
+if ARGV[6] == '1' then
+    redis.call('rpush', p .. 'priority', sid .. ':' .. cid .. ':' .. uid .. ':' .. now)
+elseif redis.call('rpush', p .. 'queue:' .. cid .. ':' .. uid, sid .. ':' .. now) == 1 then
+    if redis.call('rpush', p .. 'users:' .. cid, uid) == 1 then
+        redis.call('rpush', p .. 'competitions', cid)
+    end
+end
+redis.call('hincrby', p .. 'depth', cid, 1)
+redis.call('sadd', p .. 'known', cid)
+return 1
+"""
+
+_NEXT = """
+local p, now = ARGV[1], tonumber(ARGV[2])
+local user_cap, scan = tonumber(ARGV[4]), tonumber(ARGV[5])
+if redis.call('zcard', p .. 'inflight') >= tonumber(ARGV[3]) then
+    return false
+end
+
+local function has_room(uid)
+    return tonumber(redis.call('hget', p .. 'inflight-users', uid) or '0') < user_cap
+end
+
+local function take(sid, cid, uid, enqueued)
+    redis.call('srem', p .. 'queued', sid)
+    redis.call('zadd', p .. 'inflight', now, sid)
+    redis.call('hset', p .. 'owners', sid, cid .. ':' .. uid)
+    redis.call('hincrby', p .. 'inflight-users', uid, 1)
+    redis.call('hincrby', p .. 'inflight-competitions', cid, 1)
+    redis.call('hincrby', p .. 'depth', cid, -1)
+    redis.call('lpush', p .. 'waits:' .. cid, math.floor((now - tonumber(enqueued)) * 1000))
+    redis.call('ltrim', p .. 'waits:' .. cid, 0, tonumber(ARGV[6]) - 1)
+    return sid
+end
+
+for _, item in ipairs(redis.call('lrange', p .. 'priority', 0, scan - 1)) do
+    local sid, cid, uid, enqueued = string.match(item, '^(%d+):(%d+):(%d+):(.+)$')
+    if has_room(uid) then
+        redis.call('lrem', p .. 'priority', 1, item)
+        return take(sid, cid, uid, enqueued)
+    end
+end
+
+local competitions = p .. 'competitions'
+for _ = 1, redis.call('llen', competitions) do
+    local cid = redis.call('lpop', competitions)
+    redis.call('rpush', competitions, cid)
+    local users = p .. 'users:' .. cid
+    for _ = 1, redis.call('llen', users) do
+        local uid = redis.call('lpop', users)
+        local queue = p .. 'queue:' .. cid .. ':' .. uid
+        if has_room(uid) then
+            local sid, enqueued = string.match(redis.call('lpop', queue), '^(%d+):(.+)$')
+            if redis.call('llen', queue) > 0 then
+                redis.call('rpush', users, uid)
+            elseif redis.call('llen', users) == 0 then
+                redis.call('lrem', competitions, 1, cid)
+            end
+            return take(sid, cid, uid, enqueued)
+        end
+        redis.call('rpush', users, uid)
+    end
+end
+return false
+"""
+
+_RELEASE = """
+local p, sid = ARGV[1], ARGV[2]
+local owner = redis.call('hget', p .. 'owners', sid)
+if not owner then
+    return 0
+end
+local cid, uid = string.match(owner, '^(%d+):(%d+)$')
+redis.call('hdel', p .. 'owners', sid)
+redis.call('zrem', p .. 'inflight', sid)
+if redis.call('hincrby', p .. 'inflight-users', uid, -1) <= 0 then
+    redis.call('hdel', p .. 'inflight-users', uid)
+end
+if redis.call('hincrby', p .. 'inflight-competitions', cid, -1) <= 0 then
+    redis.call('hdel', p .. 'inflight-competitions', cid)
+end
+return 1
+"""
+
+
+def _fair_client():
+    """The Redis client when fair queueing is on, otherwise None."""
+    if not current_app.config['DIFY_FAIR_QUEUE']:
+        return None
+    return get_redis()
+
+
+def _dispatch(submission_id):
+    """Hand a review to the configured executor right away."""
+    if current_app.config['DIFY_EXECUTOR'] == 'async':
+        client = get_redis()
+        if client is not None:
+            try:
+                client.rpush(REVIEW_QUEUE_KEY, submission_id)
+                return
+            except redis.RedisError as e:
+                current_app.logger.warning(f'Async review queue unavailable, using Celery: {e}')
+    from tasks import trigger_external_hook
+    trigger_external_hook.delay(submission_id)
+
+
+def is_first_attempt(user_id, challenge_id, submission_id):
+    """Whether this is the player's only submission to the challenge (the priority lane)."""
+    return not db.session.query(
+        Submission.query.filter(
+            Submission.user_id == user_id,
+            Submission.challenge_id == challenge_id,
+            Submission.id != submission_id,
+        ).exists()
+    ).scalar()
+
+
+def _submit(client, submission_id):
+    """Park a review in the fair queue; False when it is unknown, already queued or in flight."""
+    row = (
+        db.session.query(Submission.user_id, Submission.challenge_id, Challenge.competition_id)
+        .join(Submission.challenge)
+        .filter(Submission.id == submission_id)
+        .one_or_none()
+    )
+    if row is None:
+        return False
+    user_id, challenge_id, competition_id = row
+    priority = is_first_attempt(user_id, challenge_id, submission_id)
+    return bool(client.eval(_SUBMIT, 0, KEY_PREFIX, submission_id, competition_id, user_id, time.time(),
+                            int(priority)))
+
+
+def _pump(client):
+    config = current_app.config
+    now = time.time()
+    stale = client.zrangebyscore(INFLIGHT_KEY, '-inf', now - config['DIFY_FAIR_INFLIGHT_TIMEOUT_SECONDS'])
+    for submission_id in stale:
+        current_app.logger.warning(f'Reclaiming the review slot of submission {submission_id}')
+        client.eval(_RELEASE, 0, KEY_PREFIX, submission_id)
+
+    dispatched = 0
+    while True:
+        submission_id = client.eval(_NEXT, 0, KEY_PREFIX, now, config['DIFY_FAIR_MAX_IN_FLIGHT'],
+                                    config['DIFY_FAIR_MAX_IN_FLIGHT_PER_USER'], PRIORITY_SCAN, WAIT_SAMPLES)
+        if not submission_id:
+            return dispatched
+        try:
+            _dispatch(int(submission_id))
+        except Exception as e:
+            # Broker down: give the slot back and keep the review queued for the next pump.
+            current_app.logger.error(f'Could not dispatch the review of submission {submission_id}: {e}')
+            client.eval(_RELEASE, 0, KEY_PREFIX, submission_id)
+            _submit(client, int(submission_id))
+            return dispatched
+        dispatched += 1
+
+
+def enqueue_review(submission_id):
+    """Hand a new or re-driven submission to the review executor.
+
+    With Redis and ``DIFY_FAIR_QUEUE`` it waits in the fair queue until a slot
+    frees up; otherwise (or if Redis fails) it is dispatched right away.
+    """
+    client = _fair_client()
+    if client is not None:
+        try:
+            if _submit(client, submission_id):
+                _pump(client)
+            return
+        except redis.RedisError as e:
+            current_app.logger.warning(f'Fair review queue unavailable, dispatching directly: {e}')
+    _dispatch(submission_id)
+
+
+def pump():
+    """Dispatch waiting reviews while there is room; returns how many were dispatched."""
+    client = _fair_client()
+    if client is None:
+        return 0
+    try:
+        return _pump(client)
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Fair review queue unavailable: {e}')
+        return 0
+
+
+def release(submission_id):
+    """Free the slot of a settled review and dispatch the next ones (best-effort)."""
+    client = _fair_client()
+    if client is None:
+        return
+    try:
+        if client.eval(_RELEASE, 0, KEY_PREFIX, submission_id):
+            _pump(client)
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Review slot of submission {submission_id} not released: {e}')
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def queue_metrics():
+    """Per-competition queue depth, reviews in flight and wait times (seconds) of recent dispatches."""
+    client = _fair_client()
+    if client is None:
+        return {}
+    try:
+        depth = client.hgetall(f'{KEY_PREFIX}depth')
+        in_flight = client.hgetall(f'{KEY_PREFIX}inflight-competitions')
+        oldest = {}
+        for item in client.lrange(f'{KEY_PREFIX}priority', 0, -1):
+            _, competition_id, _, enqueued = item.split(':', 3)
+            oldest[competition_id] = min(float(enqueued), oldest.get(competition_id, float('inf')))
+
+        metrics = {}
+        now = time.time()
+        for competition_id in sorted(client.smembers(f'{KEY_PREFIX}known'), key=int):
+            for user_id in client.lrange(f'{KEY_PREFIX}users:{competition_id}', 0, -1):
+                head = client.lindex(f'{KEY_PREFIX}queue:{competition_id}:{user_id}', 0)
+                if head:
+                    enqueued = float(head.split(':', 1)[1])
+                    oldest[competition_id] = min(enqueued, oldest.get(competition_id, float('inf')))
+            waits = sorted(int(ms) / 1000 for ms in client.lrange(f'{KEY_PREFIX}waits:{competition_id}', 0, -1))
+            metrics[int(competition_id)] = {
+                'depth': int(depth.get(competition_id, 0)),
+                'in_flight': int(in_flight.get(competition_id, 0)),
+                'oldest_wait_seconds': round(now - oldest[competition_id], 3) if competition_id in oldest else 0,
+                'wait_seconds_p50': _percentile(waits, 0.5) if waits else None,
+                'wait_seconds_p95': _percentile(waits, 0.95) if waits else None,
+                'wait_seconds_max': waits[-1] if waits else None,
+            }
+        return metrics
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Review queue metrics unavailable: {e}')
+        return {}
@@ -0,0 +1,231 @@
+"""Materialized leaderboard scores.
+
+The leaderboard used to be recomputed from the full ``submissions`` table on
+every request. Instead, the best approved score per (competition, user,
+challenge) is kept in ``challenge_scores`` and rolled up into ``user_scores``
+and ``team_scores`` whenever a submission's status changes. Scoring rules are
+unchanged: each user only earns the HIGHEST approved score per challenge, and
+a team earns the best score of any member per challenge.
+
+All functions work inside the caller's transaction — they add/delete rows on
+``db.session`` but never commit.
+"""
+from collections import defaultdict
+from sqlalchemy import func
+from models import db, Challenge, ChallengeScore, Competition, Submission, TeamMember, TeamScore, UserScore
+from services.versions import bump_competition_version
+
+
+def refresh_submission_score(submission):
+    """Recompute every materialized score touched by one submission's review."""
+    challenge = submission.challenge or Challenge.query.get(submission.challenge_id)
+    refresh_challenge_score(challenge.competition_id, submission.user_id, challenge.id)
+
+
+def refresh_challenge_score(competition_id, user_id, challenge_id):
+    """Recompute the best score of one user on one challenge, then roll it up."""
+    _refresh_challenge_row(competition_id, user_id, challenge_id)
+    refresh_user_score(competition_id, user_id)
+    membership = TeamMember.query.filter_by(user_id=user_id).first()
+    if membership:
+        refresh_team_score(competition_id, membership.team_id)
+    bump_competition_version(competition_id)
+
+
+def refresh_challenge_scores(keys):
+    """Batch form of ``refresh_challenge_score`` for ``(competition_id, user_id, challenge_id)`` keys.
+
+    Each user and team total is rolled up once and each competition version is
+    bumped once, however many of its challenges changed.
+    """
+    keys = set(keys)
+    for competition_id, user_id, challenge_id in keys:
+        _refresh_challenge_row(competition_id, user_id, challenge_id)
+    user_keys = {(competition_id, user_id) for competition_id, user_id, _ in keys}
+    for competition_id, user_id in user_keys:
+        refresh_user_score(competition_id, user_id)
+    team_of = dict(db.session.query(TeamMember.user_id, TeamMember.team_id).filter(
+        TeamMember.user_id.in_({user_id for _, user_id in user_keys})
+    ).all())
+    for competition_id, team_id in {(cid, team_of[uid]) for cid, uid in user_keys if uid in team_of}:
+        refresh_team_score(competition_id, team_id)
+    for competition_id in {competition_id for competition_id, _ in user_keys}:
+        bump_competition_version(competition_id)
+
+
+def _refresh_challenge_row(competition_id, user_id, challenge_id):
+    approved_count, max_points, last_solve = db.session.query(
+        func.count(Submission.id),
+        func.max(Submission.points_awarded),
+        func.max(Submission.reviewed_at)
+    ).filter(
+        Submission.user_id == user_id,
+        Submission.challenge_id == challenge_id,
+        Submission.status == 'approved'
+    ).one()
+
+    row = ChallengeScore.query.filter_by(user_id=user_id, challenge_id=challenge_id).first()
+    if not approved_count:
+        if row:
+            db.session.delete(row)
+    else:
+        if not row:
+            row = ChallengeScore(competition_id=competition_id, user_id=user_id, challenge_id=challenge_id)
+            db.session.add(row)
+        row.points = int(max_points or 0)
+        row.last_solve_time = last_solve
+
+
+def refresh_user_score(competition_id, user_id):
+    """Recompute a user's competition total from their challenge scores."""
+    solved_count, total_points, last_solve = db.session.query(
+        func.count(ChallengeScore.id),
+        func.sum(ChallengeScore.points),
+        func.max(ChallengeScore.last_solve_time)
+    ).filter(
+        ChallengeScore.competition_id == competition_id,
+        ChallengeScore.user_id == user_id
+    ).one()
+
+    row = UserScore.query.filter_by(competition_id=competition_id, user_id=user_id).first()
+    if not solved_count:
+        if row:
+            db.session.delete(row)
+        return
+    if not row:
+        row = UserScore(competition_id=competition_id, user_id=user_id)
+        db.session.add(row)
+    row.total_points = int(total_points or 0)
+    row.last_solve_time = last_solve
+
+
+def refresh_team_score(competition_id, team_id):
+    """Recompute a team's competition total: best member score per challenge, summed."""
+    per_challenge = db.session.query(
+        ChallengeScore.challenge_id,
+        func.max(ChallengeScore.points).label('max_points'),
+        func.max(ChallengeScore.last_solve_time).label('last_solve')
+    ).join(
+        TeamMember, TeamMember.user_id == ChallengeScore.user_id
+    ).filter(
+        TeamMember.team_id == team_id,
+        ChallengeScore.competition_id == competition_id
+    ).group_by(ChallengeScore.challenge_id).all()
+
+    row = TeamScore.query.filter_by(competition_id=competition_id, team_id=team_id).first()
+    if not per_challenge:
+        if row:
+            db.session.delete(row)
+        return
+    if not row:
+        row = TeamScore(competition_id=competition_id, team_id=team_id)
+        db.session.add(row)
+    row.total_points = sum(r.max_points or 0 for r in per_challenge)
+    row.last_solve_time = max((r.last_solve for r in per_challenge if r.last_solve), default=None)
+
+
+def refresh_team(team_id):
+    """Recompute a team's totals in every competition after its membership changed.
+
+    Returns the ids of the competitions whose team leaderboard may have changed.
+    """
+    competition_ids = {cid for (cid,) in db.session.query(ChallengeScore.competition_id).join(
+        TeamMember, TeamMember.user_id == ChallengeScore.user_id
+    ).filter(TeamMember.team_id == team_id).distinct()}
+    # Competitions the team already has a total in — a leaving member may empty them.
+    competition_ids.update(cid for (cid,) in db.session.query(TeamScore.competition_id).filter(
+        TeamScore.team_id == team_id
+    ))
+    for competition_id in competition_ids:
+        refresh_team_score(competition_id, team_id)
+        bump_competition_version(competition_id)
+    return competition_ids
+
+
+def clear_competition(competition_id):
+    """Drop all materialized scores of a competition (e.g. after a reset)."""
+    ChallengeScore.query.filter_by(competition_id=competition_id).delete()
+    UserScore.query.filter_by(competition_id=competition_id).delete()
+    TeamScore.query.filter_by(competition_id=competition_id).delete()
+    bump_competition_version(competition_id)
+
+
+def rebuild_competition(competition_id):
+    """Rebuild a competition's materialized scores from the submissions table."""
+    clear_competition(competition_id)
+
+    best_rows = db.session.query(
+        Submission.user_id,
+        Submission.challenge_id,
+        func.max(Submission.points_awarded).label('max_points'),
+        func.max(Submission.reviewed_at).label('last_solve')
+    ).join(Challenge).filter(
+        Challenge.competition_id == competition_id,
+        Submission.status == 'approved'
+    ).group_by(
+        Submission.user_id,
+        Submission.challenge_id
+    ).all()
+
+    db.session.add_all([
+        ChallengeScore(
+            competition_id=competition_id,
+            user_id=row.user_id,
+            challenge_id=row.challenge_id,
+            points=int(row.max_points or 0),
+            last_solve_time=row.last_solve
+        ) for row in best_rows
+    ])
+    db.session.flush()
+
+    user_totals = db.session.query(
+        ChallengeScore.user_id,
+        func.sum(ChallengeScore.points).label('total_points'),
+        func.max(ChallengeScore.last_solve_time).label('last_solve')
+    ).filter(
+        ChallengeScore.competition_id == competition_id
+    ).group_by(ChallengeScore.user_id).all()
+    db.session.add_all([
+        UserScore(
+            competition_id=competition_id,
+            user_id=row.user_id,
+            total_points=int(row.total_points or 0),
+            last_solve_time=row.last_solve
+        ) for row in user_totals
+    ])
+
+    team_challenge_rows = db.session.query(
+        TeamMember.team_id,
+        func.max(ChallengeScore.points).label('max_points'),
+        func.max(ChallengeScore.last_solve_time).label('last_solve')
+    ).join(
+        ChallengeScore, ChallengeScore.user_id == TeamMember.user_id
+    ).filter(
+        ChallengeScore.competition_id == competition_id
+    ).group_by(
+        TeamMember.team_id,
+        ChallengeScore.challenge_id
+    ).all()
+    team_totals = defaultdict(int)
+    team_last_solve = {}
+    for row in team_challenge_rows:
+        team_totals[row.team_id] += row.max_points or 0
+        if row.last_solve and (team_last_solve.get(row.team_id) is None or row.last_solve > team_last_solve[row.team_id]):
+            team_last_solve[row.team_id] = row.last_solve
+    db.session.add_all([
+        TeamScore(
+            competition_id=competition_id,
+            team_id=team_id,
+            total_points=total_points,
+            last_solve_time=team_last_solve.get(team_id)
+        ) for team_id, total_points in team_totals.items()
+    ])
+    return len(best_rows)
+
+
+def rebuild_all():
+    """Rebuild materialized scores for every competition. Returns the number of competitions."""
+    competition_ids = [cid for (cid,) in db.session.query(Competition.id)]
+    for competition_id in competition_ids:
+        rebuild_competition(competition_id)
+    return len(competition_ids)
@@ -0,0 +1,89 @@
+"""Read helpers for submission lists (a player's own submissions, the admin review queue).
+
+Each helper is a fixed number of queries regardless of how many challenges or
+submissions are involved, so pages built on them do not grow with competition size.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import aliased, joinedload
+
+from models import db, Challenge, Submission
+
+
+def latest_submissions(user_id, challenge_ids):
+    """Return ``{challenge_id: Submission}`` with the user's most recent submission per challenge.
+
+    One query: ``DISTINCT ON`` on PostgreSQL, a ``row_number()`` window elsewhere
+    (SQLite in tests). Ties on ``submitted_at`` go to the higher id.
+    """
+    challenge_ids = list(challenge_ids)
+    if not challenge_ids:
+        return {}
+    filters = (Submission.user_id == user_id, Submission.challenge_id.in_(challenge_ids))
+    if db.engine.dialect.name == 'postgresql':
+        statement = select(Submission).filter(*filters).distinct(Submission.challenge_id).order_by(
+            Submission.challenge_id, Submission.submitted_at.desc(), Submission.id.desc()
+        )
+    else:
+        ranked = select(
+            Submission,
+            func.row_number().over(
+                partition_by=Submission.challenge_id,
+                order_by=(Submission.submitted_at.desc(), Submission.id.desc())
+            ).label('recency')
+        ).filter(*filters).subquery()
+        latest = aliased(Submission, ranked)
+        statement = select(latest).filter(ranked.c.recency == 1)
+    return {submission.challenge_id: submission for submission in db.session.scalars(statement)}
+
+
+def submission_history(user_id, challenge_id=None):
+    """The user's submissions, newest first, with challenge and competition loaded for display."""
+    query = Submission.query.options(
+        joinedload(Submission.challenge).joinedload(Challenge.competition)
+    ).filter(Submission.user_id == user_id)
+    if challenge_id is not None:
+        query = query.filter(Submission.challenge_id == challenge_id)
+    return query.order_by(Submission.submitted_at.desc(), Submission.id.desc()).all()
+
+
+def encode_cursor(submission):
+    """Opaque keyset cursor pointing just past ``submission`` in the review queue."""
+    return f'{submission.submitted_at.isoformat()}~{submission.id}'
+
+
+def decode_cursor(cursor):
+    """Inverse of ``encode_cursor``; raises ``ValueError`` on malformed input."""
+    submitted_at, _, submission_id = cursor.rpartition('~')
+    return datetime.fromisoformat(submitted_at), int(submission_id)
+
+
+def review_queue(status=None, competition_id=None, challenge_id=None, reviewer=None, before=None, limit=50):
+    """One page of the admin review queue, newest first.
+
+    Keyset pagination on ``(submitted_at, id)``: ``before`` is the cursor of the
+    previous page, so every page costs the same whatever its depth. Returns
+    ``(submissions, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    query = Submission.query.options(joinedload(Submission.user), joinedload(Submission.challenge))
+    if status:
+        query = query.filter(Submission.status == status)
+    if challenge_id:
+        query = query.filter(Submission.challenge_id == challenge_id)
+    elif competition_id:
+        query = query.filter(Submission.challenge_id.in_(
+            select(Challenge.id).where(Challenge.competition_id == competition_id)
+        ))
+    if reviewer:
+        query = query.filter(Submission.reviewed_by_name == reviewer)
+    if before:
+        submitted_at, submission_id = decode_cursor(before)
+        query = query.filter(or_(
+            Submission.submitted_at < submitted_at,
+            and_(Submission.submitted_at == submitted_at, Submission.id < submission_id)
+        ))
+    rows = query.order_by(Submission.submitted_at.desc(), Submission.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
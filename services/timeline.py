@@ -0,0 +1,163 @@
+"""Time-bucketed cumulative score timeline ("score over time" charts).
+
+One pass over the competition's approved submissions ordered by
+``reviewed_at`` replays the leaderboard rules (best score per entity per
+challenge) and records each entity's cumulative total at the end of every
+time bucket in which it changed. The replay state is cached in Redis per
+(competition, scope, bucket size) and extended incrementally with approvals
+newer than its cursor; any change that is not a plain new approval (rejection
+of an approved answer, reset, team changes, challenge deletion) drops it via
+``invalidate_timeline``.
+
+``reviewed_at`` is set before the review commits, so an approval can become
+visible after a later-reviewed one has already moved the cursor past it. Each
+extension therefore re-reads the last ``LATE_COMMIT_WINDOW`` behind the
+cursor and skips the ids it already replayed (kept in the state); an unseen
+row behind the cursor makes the state replay from scratch, since a late row
+changes the cumulative totals of every later bucket.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+import redis
+from flask import current_app
+
+from models import db, Challenge, Submission, TeamMember
+from services.redis_client import get_redis
+
+SCOPES = ('users', 'teams')
+BUCKET_SECONDS = (60, 300, 900, 3600)
+STATE_TTL_SECONDS = 24 * 3600
+LATE_COMMIT_WINDOW = timedelta(minutes=10)
+
+
+def _generation_key(competition_id):
+    return f'leaderboard:{competition_id}:timeline-gen'
+
+
+def _state_key(competition_id, generation, scope, bucket_seconds):
+    return f'leaderboard:{competition_id}:timeline:{generation}:{scope}:{bucket_seconds}'
+
+
+def _empty_state():
+    return {'cursor': None, 'recent': [], 'best': {}, 'totals': {}, 'series': {}}
+
+
+def _apply(state, rows, entity_of, bucket_seconds):
+    """Replay approved submissions (ordered by reviewed_at, id) onto the state."""
+    best, totals, series = state['best'], state['totals'], state['series']
+    recent = state.setdefault('recent', [])
+    for submission_id, user_id, challenge_id, points, reviewed_at in rows:
+        state['cursor'] = [reviewed_at.isoformat(), submission_id]
+        recent.append([reviewed_at.isoformat(), submission_id])
+        entity = entity_of(user_id)
+        if entity is None:
+            continue
+        # String keys, as they come back from JSON.
+        entity = str(entity)
+        key = f'{entity}:{challenge_id}'
+        points = points or 0
+        if key in best and points <= best[key]:
+            continue
+        totals[entity] = totals.get(entity, 0) + points - best.get(key, 0)
+        best[key] = points
+        # reviewed_at is naive UTC (datetime.utcnow()).
+        bucket = int(reviewed_at.replace(tzinfo=timezone.utc).timestamp()) // bucket_seconds * bucket_seconds
+        points_list = series.setdefault(entity, [])
+        if points_list and points_list[-1][0] == bucket:
+            points_list[-1][1] = totals[entity]
+        else:
+            points_list.append([bucket, totals[entity]])
+    if state['cursor']:
+        # Only ids inside the window are ever re-read.
+        window_start = datetime.fromisoformat(state['cursor'][0]) - LATE_COMMIT_WINDOW
+        state['recent'] = [item for item in recent if datetime.fromisoformat(item[0]) >= window_start]
+
+
+def _approved_rows(competition_id, since=None):
+    query = db.session.query(
+        Submission.id,
+        Submission.user_id,
+        Submission.challenge_id,
+        Submission.points_awarded,
+        Submission.reviewed_at
+    ).join(Challenge).filter(
+        Challenge.competition_id == competition_id,
+        Submission.status == 'approved',
+        Submission.reviewed_at.isnot(None)
+    )
+    if since is not None:
+        query = query.filter(Submission.reviewed_at >= since)
+    return query.order_by(Submission.reviewed_at.asc(), Submission.id.asc()).all()
+
+
+def _unreplayed_rows(competition_id, state):
+    """Approvals not yet replayed onto ``state``, or None when one committed behind its cursor."""
+    if state['cursor'] is None:
+        return _approved_rows(competition_id)
+    cursor = (datetime.fromisoformat(state['cursor'][0]), state['cursor'][1])
+    seen = {submission_id for _, submission_id in state.get('recent', [])}
+    rows = [row for row in _approved_rows(competition_id, cursor[0] - LATE_COMMIT_WINDOW) if row.id not in seen]
+    if rows and (rows[0].reviewed_at, rows[0].id) < cursor:
+        return None
+    return rows
+
+
+def _entity_resolver(scope):
+    user_to_team = dict(db.session.query(TeamMember.user_id, TeamMember.team_id).all())
+    if scope == 'teams':
+        return lambda user_id: user_to_team.get(user_id)
+    # Team members are ranked on the team board only, as on the leaderboard.
+    return lambda user_id: None if user_id in user_to_team else user_id
+
+
+def _load_state(competition_id, scope, bucket_seconds):
+    """Return ``(state, save)``: the cached replay state and a callback to store it back."""
+    client = get_redis()
+    if client is None:
+        return _empty_state(), lambda state: None
+    try:
+        generation = client.get(_generation_key(competition_id)) or 0
+        key = _state_key(competition_id, generation, scope, bucket_seconds)
+        raw = client.get(key)
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Timeline cache unavailable for competition {competition_id}: {e}')
+        return _empty_state(), lambda state: None
+
+    def save(state):
+        try:
+            client.set(key, json.dumps(state), ex=STATE_TTL_SECONDS)
+        except redis.RedisError as e:
+            current_app.logger.warning(f'Timeline cache for competition {competition_id} not saved: {e}')
+    return (json.loads(raw) if raw else _empty_state()), save
+
+
+def build_timeline(competition_id, scope, bucket_seconds, top_ids):
+    """Return ``{entity_id: [[bucket_epoch, cumulative_points], ...]}`` for ``top_ids``."""
+    state, save = _load_state(competition_id, scope, bucket_seconds)
+    rows = _unreplayed_rows(competition_id, state)
+    if rows is None:
+        # A late approval changes every later bucket: replay from scratch.
+        state, rows = _empty_state(), _approved_rows(competition_id)
+    if rows:
+        _apply(state, rows, _entity_resolver(scope), bucket_seconds)
+        save(state)
+    elif state['cursor'] is None:
+        save(state)
+    return {entity_id: state['series'].get(str(entity_id), []) for entity_id in top_ids}
+
+
+def bucket_start(epoch_seconds):
+    """Naive UTC datetime of a bucket, matching the other API timestamps."""
+    return datetime.fromtimestamp(epoch_seconds, timezone.utc).replace(tzinfo=None)
+
+
+def invalidate_timeline(competition_id):
+    """Force the next timeline request of a competition to replay from scratch."""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.incr(_generation_key(competition_id))
+    except redis.RedisError as e:
+        current_app.logger.warning(f'Timeline cache for competition {competition_id} not invalidated: {e}')
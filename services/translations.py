@@ -0,0 +1,69 @@
+"""Process-wide translation catalog compiled from ``translations.json``.
+
+The file maps ``text -> {locale: translation}``; ``gettext`` looks texts up in
+flat per-locale dicts built from it once, instead of reading and parsing the
+file per call. The file's mtime is checked at most every
+``RELOAD_CHECK_SECONDS``, and the catalog is rebuilt only when it changed, so
+edited translations still show up without a restart.
+
+Duplicate keys in the file resolve as ``json.load`` resolves them: the last
+one wins.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'translations.json')
+RELOAD_CHECK_SECONDS = 1.0
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_catalog = {}
+_mtime = None
+_checked_at = float('-inf')
+
+
+def compile_catalog(translations):
+    """``{locale: {text: translation}}`` from the ``{text: {locale: translation}}`` file layout."""
+    catalog = {}
+    for text, by_locale in translations.items():
+        if not isinstance(by_locale, dict):
+            continue
+        for locale, translated in by_locale.items():
+            catalog.setdefault(locale, {})[text] = translated
+    return catalog
+
+
+def _reload_if_changed():
+    global _catalog, _mtime, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < RELOAD_CHECK_SECONDS:
+        return
+    with _lock:
+        if now - _checked_at < RELOAD_CHECK_SECONDS:
+            return
+        _checked_at = now
+        try:
+            mtime = os.stat(CATALOG_PATH).st_mtime_ns
+            if mtime == _mtime:
+                return
+            with open(CATALOG_PATH, 'r', encoding='utf-8') as f:
+                _catalog = compile_catalog(json.load(f))
+            _mtime = mtime
+        except (OSError, ValueError) as e:
+            # Keep serving the last good catalog (or the untranslated texts).
+            logger.warning(f'Could not load translations.json: {e}')
+
+
+def catalog(locale):
+    """The flat ``{text: translation}`` dict of a locale (empty when unknown)."""
+    _reload_if_changed()
+    return _catalog.get(locale, {})
+
+
+def gettext(text, locale):
+    """``text`` translated to ``locale``, or unchanged when there is no translation."""
+    return catalog(locale).get(text, text)
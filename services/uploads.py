@@ -0,0 +1,120 @@
+"""Uploaded and static files behind content-hashed, immutable URLs.
+
+``url_for('uploaded_file', ...)`` and ``url_for('static', ...)`` gain
+``?v=<first 16 hex digits of the file's SHA-256>`` (``version_url_defaults``),
+so templates and the admin's Markdown image links change URL whenever the
+file does. A request carrying the current version is cached for
+``UPLOAD_CACHE_MAX_AGE`` as ``immutable``; anything else (unversioned links,
+``UPLOAD_URL_PREFIX`` URLs fetched by Dify, stale versions) is ``no-cache``
+and revalidated against the strong ETag, the full SHA-256.
+
+Files are hashed once per (path, mtime, size) per process, so rendering a URL
+costs a ``stat``.
+
+``UPLOAD_SERVE_MODE`` decides who sends the bytes of an upload:
+
+* ``app``: werkzeug's ``send_file``, with conditional and Range requests.
+* ``x-accel``: an empty response with ``X-Accel-Redirect`` to
+  ``UPLOAD_ACCEL_PREFIX``; NGINX serves the file and its ranges from an
+  ``internal`` location (see ``nginx.conf.example``).
+* ``x-sendfile``: the same with ``X-Sendfile`` and the absolute path
+  (Apache mod_xsendfile, lighttpd).
+
+The app still resolves the path, answers ``If-None-Match`` and sets the cache
+headers in every mode.
+"""
+import functools
+import mimetypes
+import os
+import stat
+from urllib.parse import quote
+
+from flask import Response, abort, current_app, request, send_file
+from werkzeug.http import is_resource_modified
+from werkzeug.security import safe_join
+
+from services.review_cache import file_digest
+
+VERSION_LENGTH = 16
+VERSIONED_ENDPOINTS = ('uploaded_file', 'static')
+
+
+@functools.lru_cache(maxsize=4096)
+def _digest(path, mtime_ns, size):
+    return file_digest(path)
+
+
+def _locate(folder, filename):
+    """``(path, stat)`` of a regular file below ``folder``, or ``(None, None)``."""
+    path = safe_join(folder, filename) if isinstance(filename, str) else None
+    if path is None:
+        return None, None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    if not stat.S_ISREG(st.st_mode):
+        return None, None
+    return path, st
+
+
+def content_digest(folder, filename):
+    """SHA-256 of ``filename`` below ``folder``, or None when there is no such file."""
+    path, st = _locate(folder, filename)
+    if path is None:
+        return None
+    return _digest(path, st.st_mtime_ns, st.st_size)
+
+
+def _folder(endpoint):
+    if endpoint == 'uploaded_file':
+        return current_app.config['UPLOAD_FOLDER']
+    return current_app.static_folder
+
+
+def version_url_defaults(endpoint, values):
+    """``url_defaults`` hook: add the content version to upload and static URLs."""
+    if endpoint not in VERSIONED_ENDPOINTS or 'v' in values:
+        return
+    digest = content_digest(_folder(endpoint), values.get('filename'))
+    if digest:
+        values['v'] = digest[:VERSION_LENGTH]
+
+
+def _cache_control(digest):
+    if request.args.get('v') == digest[:VERSION_LENGTH]:
+        return f"public, max-age={current_app.config['UPLOAD_CACHE_MAX_AGE']}, immutable"
+    return 'no-cache'
+
+
+def serve_upload(filename):
+    """Response for ``/uploads/<filename>`` in the configured ``UPLOAD_SERVE_MODE``."""
+    path, st = _locate(current_app.config['UPLOAD_FOLDER'], filename)
+    if path is None:
+        abort(404)
+    digest = _digest(path, st.st_mtime_ns, st.st_size)
+    mode = current_app.config['UPLOAD_SERVE_MODE']
+
+    if mode not in ('x-accel', 'x-sendfile'):
+        response = send_file(path, etag=digest, conditional=True)
+    elif not is_resource_modified(request.environ, etag=digest):
+        response = Response(status=304)
+        response.set_etag(digest)
+    else:
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.set_etag(digest)
+        if mode == 'x-accel':
+            response.headers['X-Accel-Redirect'] = f"{current_app.config['UPLOAD_ACCEL_PREFIX'].rstrip('/')}/{quote(filename)}"
+        else:
+            response.headers['X-Sendfile'] = path
+    response.headers['Cache-Control'] = _cache_control(digest)
+    return response
+
+
+def static_cache_headers(response):
+    """``after_request`` hook: versioned static files are immutable too."""
+    if request.endpoint == 'static' and response.status_code in (200, 206, 304):
+        digest = content_digest(current_app.static_folder, (request.view_args or {}).get('filename'))
+        if digest:
+            response.headers['Cache-Control'] = _cache_control(digest)
+    return response
@@ -0,0 +1,41 @@
+"""Cheap per-competition version stamps for HTTP conditional requests.
+
+Every change that can alter a competition's leaderboard (scoring refreshes,
+challenge and competition edits) bumps ``competition_versions.version``. New
+pending submissions do not: they change no score, and bumping would
+invalidate every client's copy and the cached board on each submit. The stats
+submission count is refreshed on a fixed period instead. ``api.leaderboard_api`` and
+``api.competition_stats`` derive their ETag / Last-Modified from it and answer
+``304 Not Modified`` after a single primary-key lookup.
+"""
+from datetime import datetime
+
+from models import db, Competition, CompetitionVersion
+
+
+def bump_competition_version(competition_id):
+    """Increment a competition's version inside the caller's transaction."""
+    now = datetime.utcnow()
+    updated = CompetitionVersion.query.filter_by(competition_id=competition_id).update(
+        {CompetitionVersion.version: CompetitionVersion.version + 1,
+         CompetitionVersion.updated_at: now},
+        synchronize_session=False
+    )
+    if not updated:
+        db.session.add(CompetitionVersion(competition_id=competition_id, version=1, updated_at=now))
+
+
+def competition_stamp(competition_id):
+    """Return ``(version, updated_at, status)`` of a competition, or None if it does not exist."""
+    row = db.session.query(
+        CompetitionVersion.version,
+        CompetitionVersion.updated_at,
+        Competition.status,
+        Competition.created_at
+    ).select_from(Competition).outerjoin(
+        CompetitionVersion, CompetitionVersion.competition_id == Competition.id
+    ).filter(Competition.id == competition_id).first()
+    if row is None:
+        return None
+    version, updated_at, status, created_at = row
+    return version or 0, updated_at or created_at, status
@@ -1,10 +1,8 @@
 import os
 import sys
-import json
 import requests
 from celery import Celery
-from datetime import datetime
-from dify_secrets import reveal_api_key
+from celery.signals import worker_process_init
 
 # Add current directory to Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -26,170 +24,143 @@ celery.conf.update(
 )
 
 
-def _build_hook_url(challenge, app):
-    """Return challenge-specific hook URL if enabled, otherwise global hook URL."""
-    challenge_cfg = getattr(challenge, 'dify_config', None)
-    if challenge_cfg and challenge_cfg.enabled and (challenge_cfg.base_url or '').strip():
-        return challenge_cfg.base_url.strip()
+_flask_app = None
 
-    return (app.config.get('EXTERNAL_HOOK_URL') or '').strip()
 
+def get_flask_app():
+    """Flask app (and its engine / connection pool) shared by every task of this worker process."""
+    global _flask_app
+    if _flask_app is None:
+        from app import create_app
+        _flask_app = create_app()
+    return _flask_app
 
-def _resolve_api_key(challenge, app):
-    """Resolve API key with challenge-level override and global fallback."""
-    global_api_key = app.config.get('DIFY_API_KEY', '')
-    challenge_cfg = getattr(challenge, 'dify_config', None)
-    challenge_credential = getattr(challenge, 'dify_credential', None)
 
-    if challenge_cfg and challenge_cfg.enabled and challenge_credential and (challenge_credential.api_key_token or '').strip():
-        revealed = reveal_api_key(challenge_credential.api_key_token, app.config.get('SECRET_KEY', ''))
-        if revealed:
-            return revealed
+@worker_process_init.connect
+def _init_worker_app(**kwargs):
+    """Build the app once per prefork child instead of once per task."""
+    # Never reuse a pool inherited from the parent across a fork.
+    if _flask_app is not None:
+        from models import db
+        with _flask_app.app_context():
+            db.engine.dispose(close=False)
+    get_flask_app()
 
-    return global_api_key
 
-
-@celery.task
-def trigger_external_hook(submission_id):
+# Retries are counted against DIFY_RETRY_MAX by the task itself, not by Celery.
+@celery.task(bind=True, max_retries=None)
+def trigger_external_hook(self, submission_id):
     """Trigger Dify workflow for automated submission review and scoring"""
-    from app import create_app
-    from models import Submission, Challenge, User, SubmissionFile, SubmissionDifyLog, db
+    from celery.exceptions import Retry
+    from services.review_scheduler import release
     
-    app = create_app()
+    app = get_flask_app()
     with app.app_context():
-        submission = Submission.query.get(submission_id)
-        if not submission:
-            return {'error': 'Submission not found'}
-        
-        challenge = Challenge.query.get(submission.challenge_id)
-        user = User.query.get(submission.user_id)
-        
-        # Prepare files list for Dify
-        files = []
-        upload_url_prefix = app.config.get('UPLOAD_URL_PREFIX', 'http://localhost:5000/uploads')
-        
-        for file in submission.files:
-            # Determine file type based on extension
-            file_ext = file.filename.lower().split('.')[-1] if '.' in file.filename else ''
-            file_type = 'image' if file_ext in ['png', 'jpg', 'jpeg', 'gif'] else 'file'
-            
-            files.append({
-                'type': file_type,
-                'transfer_method': 'remote_url',
-                'url': f"{upload_url_prefix}/{file.filepath}"
-            })
-        
-        # Prepare Dify API payload
-        payload = {
-            'inputs': {},
-            'query': submission.answer_text or '评分',
-            'response_mode': 'blocking',
-            'conversation_id': '',
-            'user': f"user-{user.id}",
-            'files': files
-        }
-        
-        # Send POST request to Dify API
+        retrying = False
         try:
-            hook_url = _build_hook_url(challenge, app)
-            api_key = _resolve_api_key(challenge, app)
-
-            if not hook_url:
-                return {
-                    'success': False,
-                    'error': 'No Dify hook URL configured (neither challenge-specific nor global).'
-                }
-            
-            headers = {
-                'Authorization': f'Bearer {api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(hook_url, json=payload, headers=headers, timeout=30)
+            return _review_submission(self, app, submission_id)
+        except Retry:
+            # A pending retry keeps its fair-queue slot until the review settles.
+            retrying = True
+            raise
+        finally:
+            if not retrying:
+                release(submission_id)
+
+
+def _review_submission(task, app, submission_id):
+    """One review attempt; raises ``Retry`` to try again later."""
+    from models import Submission, db
+    from services import dify_breaker, dify_client
+    from services.dify_review import (REQUEST_TIMEOUT_SECONDS, apply_review, build_review_request, cached_review,
+                                      dead_letter, is_transient, no_hook_result, stream_review)
+    
+    submission = db.session.get(Submission, submission_id)
+    if not submission:
+        return {'error': 'Submission not found'}
+    
+    review = build_review_request(submission, app.config)
+    if review is None:
+        return no_hook_result()
+    attempts = task.request.retries + 1
+    
+    # An identical resubmission reuses the verdict Dify already gave.
+    cache_key, result = cached_review(submission, review)
+    if result is not None:
+        return result
+    
+    # Don't spend a worker on a timeout against a hook that is known to be down.
+    wait = dify_breaker.seconds_until_closed(review.url, REQUEST_TIMEOUT_SECONDS)
+    if wait:
+        return _retry_or_dead_letter(task, submission, f'Circuit open for {review.url}', wait)
+    
+    # Send POST request to Dify API
+    try:
+        # In streaming mode the timeout bounds each read, not the whole answer.
+        with dify_client.post(review.url, json=review.payload, headers=review.headers,
+                              timeout=REQUEST_TIMEOUT_SECONDS, stream=review.streaming) as response:
             response.raise_for_status()
-            
-            # Parse Dify response
-            dify_response = response.json()
-            
-            # Extract answer field and parse it as JSON
-            answer_text = dify_response.get('answer', '')
-            
-            try:
-                # Strip markdown code fences if Dify wraps the response in ```json ... ```
-                stripped = answer_text.strip()
-                if stripped.startswith('```'):
-                    # Remove opening fence (```json or ```)
-                    stripped = stripped.split('\n', 1)[1] if '\n' in stripped else stripped[3:]
-                    # Remove closing fence
-                    if stripped.rstrip().endswith('```'):
-                        stripped = stripped.rstrip()[:-3].rstrip()
-                    answer_text = stripped
-
-                # Parse the answer JSON string
-                answer_data = json.loads(answer_text)
-
-                # Persist feedback/score for admin secondary review reference.
-                dify_log = submission.dify_log
-                if not dify_log:
-                    dify_log = SubmissionDifyLog(submission_id=submission.id)
-                    db.session.add(dify_log)
-                dify_log.feedback = answer_data.get('feedback', '')
-                score_value = answer_data.get('score')
-                try:
-                    dify_log.score = int(score_value) if score_value is not None else None
-                except (TypeError, ValueError):
-                    dify_log.score = None
-                
-                # Update submission based on Dify response
-                # Auto-approve/reject if auto_approved is True
-                if answer_data.get('auto_approved'):
-                    # Determine status based on success flag
-                    if answer_data.get('success'):
-                        submission.status = 'approved'
-                        submission.points_awarded = answer_data.get('score', 0)
-                    else:
-                        submission.status = 'rejected'
-                        submission.points_awarded = 0
-                    
-                    submission.reviewed_at = datetime.utcnow()
-                    submission.reviewed_by_name = 'AI'  # Mark as AI-reviewed
-                    # Note: reviewed_by_id remains None to indicate auto-approval
-                    
-                    db.session.commit()
-                    
-                    return {
-                        'success': True,
-                        'auto_approved': True,
-                        'auto_status': submission.status,
-                        'score': submission.points_awarded,
-                        'feedback': answer_data.get('feedback', ''),
-                        'dify_response': dify_response
-                    }
-                else:
-                    # Keep as pending for manual review
-                    return {
-                        'success': True,
-                        'auto_approved': False,
-                        'feedback': answer_data.get('feedback', ''),
-                        'dify_response': dify_response
-                    }
-                    
-            except json.JSONDecodeError as e:
-                # If answer is not valid JSON, log and keep pending
-                return {
-                    'success': False,
-                    'error': 'Failed to parse Dify answer as JSON',
-                    'answer_text': answer_text,
-                    'parse_error': str(e)
-                }
-                
-        except requests.exceptions.RequestException as e:
-            return {
-                'success': False,
-                'error': f'Request failed: {str(e)}'
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'Unexpected error: {str(e)}'
-            }
+            if review.streaming:
+                result = stream_review(submission, response.iter_lines(), app.config['DIFY_STREAM_FLUSH_SECONDS'],
+                                       cache_key=cache_key)
+            else:
+                result = apply_review(submission, response.json(), cache_key=cache_key)
+    except requests.exceptions.RequestException as e:
+        db.session.rollback()
+        error = f'Request failed: {str(e)}'
+        if not is_transient(e):
+            return dead_letter(submission, error, attempts)
+        dify_breaker.record_failure(review.url)
+        return _retry_or_dead_letter(task, submission, error)
+    except Exception as e:
+        db.session.rollback()
+        return dead_letter(submission, f'Unexpected error: {str(e)}', attempts)
+    
+    dify_breaker.record_success(review.url)
+    if not result['success']:
+        return dead_letter(submission, result['error'], attempts)
+    return result
+
+
+def _retry_or_dead_letter(task, submission, error, wait=0):
+    """Retry after a jittered exponential backoff, or dead-letter once DIFY_RETRY_MAX is used up."""
+    from flask import current_app
+    from services.dify_review import dead_letter, fail_review, retry_delay
+
+    attempt = task.request.retries
+    if attempt >= current_app.config['DIFY_RETRY_MAX']:
+        return dead_letter(submission, error, attempt + 1)
+    fail_review(submission, error)
+    raise task.retry(countdown=retry_delay(attempt, current_app.config, wait))
+
+
+@celery.task
+def rereview_challenge(run_id):
+    """Re-review the submissions selected by a batch re-review run"""
+    from services.rereview import run_rereview
+
+    run_rereview(get_flask_app(), run_id)
+
+
+@celery.task(bind=True)
+def reset_competition(self, competition_id):
+    """Archive a competition's submissions in chunks, reporting progress as task state"""
+    from models import db
+    from services.archive import archive_submissions
+    from services.leaderboard_events import notify_leaderboard_changed
+    from services.scoring import clear_competition
+
+    app = get_flask_app()
+
+    with app.app_context():
+        def progress(archived, total):
+            self.update_state(state='PROGRESS', meta={'archived': archived, 'total': total})
+
+        archived = archive_submissions(
+            competition_id, chunk_size=app.config['COMPETITION_RESET_CHUNK_SIZE'], progress=progress
+        )
+        # Reviews that landed while archiving may have re-created score rows.
+        clear_competition(competition_id)
+        db.session.commit()
+        notify_leaderboard_changed(competition_id)
+        return {'archived': archived, 'total': archived}
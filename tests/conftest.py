@@ -0,0 +1,119 @@
+"""Shared pytest fixtures — an isolated app on in-memory SQLite."""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app import create_app, create_default_settings
+from models import db as _db, User, Competition, Challenge, Submission, Team, TeamMember
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        _db.create_all()
+        create_default_settings(app)
+        yield app
+        _db.session.remove()
+        _db.drop_all()
+
+
+@pytest.fixture
+def redis_client(app, monkeypatch):
+    """An in-memory Redis (fakeredis, with Lua) served by ``get_redis`` for this test.
+
+    fakeredis comes from requirements-dev.txt; without it these tests fail instead of being skipped.
+    """
+    import fakeredis
+    from services import redis_client as shared
+    client = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    monkeypatch.setitem(app.config, 'REDIS_URL', 'redis://fake/0')
+    monkeypatch.setitem(shared._clients, 'redis://fake/0', client)
+    return client
+
+
+@pytest.fixture
+def db(app):
+    return _db
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+_PASSWORD_HASH = None
+
+
+@pytest.fixture
+def make_user(db):
+    def _make_user(username, is_admin=False):
+        # Hashing is deliberately slow; hash the shared test password once.
+        global _PASSWORD_HASH
+        user = User(username=username, email=f'{username}@example.com', is_admin=is_admin)
+        if _PASSWORD_HASH is None:
+            user.set_password('password123')
+            _PASSWORD_HASH = user.password_hash
+        user.password_hash = _PASSWORD_HASH
+        db.session.add(user)
+        db.session.flush()
+        return user
+    return _make_user
+
+
+@pytest.fixture
+def make_team(db):
+    def _make_team(name, captain, members=()):
+        team = Team(name=name, captain_id=captain.id)
+        db.session.add(team)
+        db.session.flush()
+        for user in (captain, *members):
+            db.session.add(TeamMember(team_id=team.id, user_id=user.id))
+        db.session.flush()
+        return team
+    return _make_team
+
+
+@pytest.fixture
+def competition(db):
+    competition = Competition(name='Test Competition', status='running')
+    db.session.add(competition)
+    db.session.flush()
+    return competition
+
+
+@pytest.fixture
+def make_challenge(db, competition):
+    def _make_challenge(title, points=100):
+        challenge = Challenge(title=title, description=title, points=points,
+                              competition_id=competition.id)
+        db.session.add(challenge)
+        db.session.flush()
+        return challenge
+    return _make_challenge
+
+
+@pytest.fixture
+def make_submission(db):
+    base_time = datetime(2026, 1, 1, 12, 0, 0)
+
+    def _make_submission(user, challenge, status='approved', points=None, minutes=0):
+        submission = Submission(
+            user_id=user.id,
+            challenge_id=challenge.id,
+            answer_text='answer',
+            status=status,
+            points_awarded=(challenge.points if points is None else points) if status == 'approved' else 0,
+            submitted_at=base_time + timedelta(minutes=minutes),
+            reviewed_at=base_time + timedelta(minutes=minutes) if status != 'pending' else None,
+        )
+        db.session.add(submission)
+        db.session.flush()
+        return submission
+    return _make_submission
@@ -0,0 +1,44 @@
+"""Building the app does no database I/O; ``flask init-db`` provisions the database."""
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+
+import config
+from app import create_app
+from models import db, PlatformSettings, User
+
+
+def test_create_app_runs_no_sql():
+    statements = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', _record)
+    try:
+        create_app('testing')
+    finally:
+        event.remove(Engine, 'before_cursor_execute', _record)
+    assert statements == []
+
+
+def test_init_db_command_is_idempotent(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "ctf.db"}')
+    app = create_app('testing')
+    runner = app.test_cli_runner()
+
+    outputs = []
+    for _ in range(2):
+        result = runner.invoke(args=['init-db'])
+        assert result.exit_code == 0, result.output
+        outputs.append(result.output)
+
+    # Only the run that created the score tables backfills them (a rebuild bumps every competition version).
+    assert 'Backfilled leaderboard scores' in outputs[0]
+    assert 'Backfilled leaderboard scores' not in outputs[1]
+
+    with app.app_context():
+        assert 'submissions' in inspect(db.engine).get_table_names()
+        assert User.query.filter_by(is_admin=True).count() == 1
+        assert PlatformSettings.query.filter_by(key='platform_name').count() == 1
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,75 @@
+"""Bulk review: one UPDATE statement, one commit, scores consistent with single reviews."""
+from models import Submission, TeamScore, UserScore
+from services.scoring import refresh_submission_score
+from tests.test_leaderboard_queries import count_statements
+
+
+def _login(client, user):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+
+
+def test_bulk_review_updates_statuses_and_scores(app, db, client, competition, make_user, make_team, make_challenge,
+                                                 make_submission):
+    admin = make_user('reviewer', is_admin=True)
+    alice, bob = make_user('alice'), make_user('bob')
+    red = make_team('red', alice, [bob])
+    web, pwn = make_challenge('web', 100), make_challenge('pwn', 200)
+    pending = [
+        make_submission(alice, web, status='pending'),
+        make_submission(alice, pwn, status='pending'),
+        make_submission(bob, web, status='pending'),
+    ]
+    db.session.commit()
+    ids = [submission.id for submission in pending]
+    _login(client, admin)
+
+    response = client.post('/admin/submissions/bulk-review', json={'items': [
+        {'id': ids[0], 'status': 'approved', 'points': 80},
+        {'id': ids[1], 'status': 'approved'},
+        {'id': ids[2], 'status': 'rejected', 'points': 50},
+        {'id': 999999, 'status': 'approved'},
+    ]})
+
+    assert response.get_json() == {'success': True, 'reviewed': 3, 'missing': [999999]}
+    db.session.expire_all()
+    assert [(s.status, s.points_awarded, s.reviewed_by_name) for s in map(db.session.get, [Submission] * 3, ids)] == [
+        ('approved', 80, 'reviewer'), ('approved', 200, 'reviewer'), ('rejected', 0, 'reviewer')
+    ]
+    assert UserScore.query.filter_by(user_id=alice.id).one().total_points == 280
+    assert TeamScore.query.filter_by(team_id=red.id).one().total_points == 280
+
+
+def test_bulk_review_issues_a_single_update(app, db, client, make_user, make_challenge, make_submission):
+    admin = make_user('reviewer', is_admin=True)
+    web = make_challenge('web')
+    ids = [make_submission(make_user(f'player{i}'), web, status='pending').id for i in range(20)]
+    db.session.commit()
+    _login(client, admin)
+
+    with count_statements(db.engine) as statements:
+        client.post('/admin/submissions/bulk-review', json={'items': [{'id': i, 'status': 'approved'} for i in ids]})
+
+    assert sum(1 for statement in statements if statement.startswith('UPDATE submissions')) == 1
+
+
+def test_bulk_review_rejecting_an_approval_matches_single_review(app, db, client, make_user, make_challenge,
+                                                                  make_submission):
+    admin = make_user('reviewer', is_admin=True)
+    alice = make_user('alice')
+    web = make_challenge('web')
+    approved = make_submission(alice, web, points=100)
+    refresh_submission_score(approved)
+    db.session.commit()
+    _login(client, admin)
+
+    client.post('/admin/submissions/bulk-review', json={'items': [{'id': approved.id, 'status': 'rejected'}]})
+
+    assert UserScore.query.filter_by(user_id=alice.id).first() is None
+
+
+def test_bulk_review_rejects_malformed_items(app, db, client, make_user):
+    _login(client, make_user('reviewer', is_admin=True))
+    assert client.post('/admin/submissions/bulk-review', json={'items': []}).status_code == 400
+    assert client.post('/admin/submissions/bulk-review',
+                       json={'items': [{'id': 1, 'status': 'maybe'}]}).status_code == 400
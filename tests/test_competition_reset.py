@@ -0,0 +1,60 @@
+"""Competition reset archives submissions set-wise, in chunks, with files mapped to their history rows."""
+from models import (Challenge, Competition, Submission, SubmissionDifyLog, SubmissionFile, SubmissionFileHistory,
+                    SubmissionHistory, UserScore)
+from services.archive import archive_submissions
+from services.scoring import refresh_submission_score
+
+
+def test_archive_moves_submissions_files_and_logs_in_chunks(db, competition, make_user, make_challenge,
+                                                             make_submission):
+    player = make_user('player')
+    web = make_challenge('web')
+    submissions = [make_submission(player, web, minutes=i) for i in range(5)]
+    for submission in submissions:
+        db.session.add(SubmissionFile(submission_id=submission.id, filename=f'{submission.id}.png',
+                                      filepath=f'stored-{submission.id}.png', content_hash='ab' * 32))
+    db.session.add(SubmissionDifyLog(submission_id=submissions[0].id, feedback='ok', score=100))
+    # An older archive row pointing at a reused submission id must not receive these files.
+    db.session.add(SubmissionHistory(original_submission_id=submissions[1].id, user_id=player.id,
+                                     challenge_id=web.id, competition_id=competition.id))
+    other = Competition(name='Other', status='running')
+    db.session.add(other)
+    db.session.flush()
+    elsewhere = Challenge(title='elsewhere', description='', competition_id=other.id)
+    db.session.add(elsewhere)
+    db.session.flush()
+    untouched = make_submission(player, elsewhere)
+    db.session.commit()
+    expected = {s.id: (s.status, s.points_awarded, s.submitted_at) for s in submissions}
+
+    calls = []
+    archived = archive_submissions(competition.id, chunk_size=2, progress=lambda done, total: calls.append((done, total)))
+
+    assert archived == 5
+    assert calls == [(0, 5), (2, 5), (4, 5), (5, 5)]
+    assert Submission.query.all() == [untouched]
+    assert SubmissionFile.query.count() == 0 and SubmissionDifyLog.query.count() == 0
+    history = SubmissionHistory.query.filter(SubmissionHistory.archived_at.isnot(None)).all()
+    archived_rows = {h.original_submission_id: h for h in history if h.files.count()}
+    assert {k: (h.status, h.points_awarded, h.submitted_at) for k, h in archived_rows.items()} == expected
+    for original_id, row in archived_rows.items():
+        assert [(f.filepath, f.content_hash) for f in row.files] == [(f'stored-{original_id}.png', 'ab' * 32)]
+    assert SubmissionFileHistory.query.count() == 5
+
+
+def test_reset_route_clears_scores_and_archives_inline(app, db, client, competition, make_user, make_challenge,
+                                                       make_submission):
+    admin = make_user('reviewer', is_admin=True)
+    player = make_user('player')
+    refresh_submission_score(make_submission(player, make_challenge('web')))
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin.id)
+
+    response = client.post(f'/admin/competitions/{competition.id}/reset')
+
+    assert response.status_code == 302
+    assert Submission.query.count() == 0
+    assert SubmissionHistory.query.count() == 1
+    assert UserScore.query.count() == 0
+    assert db.session.get(Competition, competition.id).status == 'draft'
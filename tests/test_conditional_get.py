@@ -0,0 +1,80 @@
+"""Leaderboard and stats APIs answer 304 until a scoring event bumps the version."""
+import routes.api
+from services.scoring import refresh_submission_score
+
+
+def test_scoring_event_changes_the_etag(db, client, competition, make_user, make_challenge, make_submission):
+    challenge = make_challenge('web')
+    db.session.commit()
+    url = f'/api/leaderboard/{competition.id}'
+
+    first = client.get(url)
+    etag = first.headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    refresh_submission_score(make_submission(make_user('alice'), challenge))
+    db.session.commit()
+
+    changed = client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['leaderboard'][0]['username'] == 'alice'
+
+
+def test_stats_honour_if_modified_since_and_status(db, client, competition):
+    db.session.commit()
+    url = f'/api/competitions/{competition.id}/stats'
+
+    first = client.get(url)
+    assert client.get(url, headers={'If-Modified-Since': first.headers['Last-Modified'],
+                                    'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    competition.status = 'paused'
+    db.session.commit()
+    assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+
+def test_unknown_competition_is_404(client):
+    assert client.get('/api/leaderboard/999').status_code == 404
+
+
+def test_deleting_a_scored_user_changes_the_board(db, client, competition, make_user, make_team, make_challenge,
+                                                  make_submission):
+    alice, bob, root = make_user('alice'), make_user('bob'), make_user('root', is_admin=True)
+    make_team('red', alice, members=[bob])
+    challenge = make_challenge('web')
+    refresh_submission_score(make_submission(alice, challenge, points=100))
+    refresh_submission_score(make_submission(bob, challenge, points=40))
+    db.session.commit()
+    url = f'/api/leaderboard/{competition.id}'
+    etag = client.get(url).headers['ETag']
+    with client.session_transaction() as session:
+        session['_user_id'] = str(root.id)
+
+    client.post(f'/admin/users/{alice.id}/delete')
+
+    changed = client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert [(row['team_name'], row['total_points'], row['member_count'])
+            for row in changed.get_json()['team_leaderboard']] == [('red', 40, 1)]
+
+
+def test_pending_submission_keeps_the_board_and_refreshes_stats_by_period(app, db, client, competition, make_user,
+                                                                         make_challenge, monkeypatch):
+    root, challenge = make_user('root', is_admin=True), make_challenge('web')
+    db.session.commit()
+    board, stats = f'/api/leaderboard/{competition.id}', f'/api/competitions/{competition.id}/stats'
+    now = 1_000_000.0
+    monkeypatch.setattr(routes.api.time, 'time', lambda: now)
+    board_etag, stats_etag = client.get(board).headers['ETag'], client.get(stats).headers['ETag']
+    with client.session_transaction() as session:
+        session['_user_id'] = str(root.id)
+
+    client.post(f'/challenge/{challenge.id}', data={'answer_text': 'flag{guess}'})
+
+    assert client.get(board, headers={'If-None-Match': board_etag}).status_code == 304
+    assert client.get(stats, headers={'If-None-Match': stats_etag}).status_code == 304
+    now += app.config['STATS_REFRESH_SECONDS']
+    refreshed = client.get(stats, headers={'If-None-Match': stats_etag})
+    assert refreshed.status_code == 200
+    assert refreshed.get_json()['submissions_count'] == 1
@@ -0,0 +1,143 @@
+"""The asyncio executor keeps many reviews in flight, within its limits, and applies verdicts like the Celery task."""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from models import Submission, UserScore
+from services.dify_async import AsyncReviewer, review_submissions
+from services.dify_review import dead_letters
+
+
+class _SlowDify(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.lock:
+            type(self).active += 1
+            type(self).peak = max(self.peak, self.active)
+        time.sleep(0.2)
+        with self.lock:
+            type(self).active -= 1
+        answer = json.dumps({'success': True, 'auto_approved': True, 'score': 50, 'feedback': 'good'})
+        body = json.dumps({'answer': answer}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _BrokenDify(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'<html>Bad gateway page served with 200</html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def slow_dify(app):
+    _SlowDify.active = _SlowDify.peak = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowDify)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.config['EXTERNAL_HOOK_URL'] = f'http://127.0.0.1:{server.server_address[1]}/v1/chat-messages'
+    yield _SlowDify
+    server.shutdown()
+
+
+@pytest.fixture
+def pending_ids(db, make_user, make_challenge, make_submission):
+    web = make_challenge('web')
+    ids = [make_submission(make_user(f'player{i}'), web, status='pending').id for i in range(8)]
+    db.session.commit()
+    return ids
+
+
+def test_reviews_run_concurrently_and_apply_verdicts(app, db, slow_dify, pending_ids):
+    start = time.monotonic()
+    results = review_submissions(app, pending_ids, max_in_flight=8, max_per_host=8)
+    elapsed = time.monotonic() - start
+
+    assert all(result['auto_status'] == 'approved' for result in results)
+    # Eight 200 ms calls overlap instead of taking 1.6 s back to back.
+    assert elapsed < 1.0
+    assert slow_dify.peak > 1
+    db.session.expire_all()
+    assert {s.status for s in Submission.query.filter(Submission.id.in_(pending_ids))} == {'approved'}
+    assert UserScore.query.count() == 8
+    assert all(s.dify_log.feedback == 'good' for s in Submission.query.all())
+
+
+def test_per_host_limit_caps_outstanding_requests(app, slow_dify, pending_ids):
+    review_submissions(app, pending_ids, max_in_flight=8, max_per_host=2)
+    assert slow_dify.peak == 2
+
+
+def test_unreachable_hook_reports_an_error(app, pending_ids):
+    app.config['EXTERNAL_HOOK_URL'] = 'http://127.0.0.1:9/v1/chat-messages'
+    results = review_submissions(app, pending_ids[:1])
+    assert results[0]['success'] is False and results[0]['error'].startswith('Request failed')
+
+
+def test_non_json_body_is_dead_lettered(app, db, redis_client, pending_ids):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _BrokenDify)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.config['EXTERNAL_HOOK_URL'] = f'http://127.0.0.1:{server.server_address[1]}/v1/chat-messages'
+    try:
+        result, = review_submissions(app, pending_ids[:1])
+    finally:
+        server.shutdown()
+
+    assert result['dead_lettered'] and result['error'].startswith('Invalid Dify response')
+    assert [entry['submission_id'] for entry in dead_letters()] == pending_ids[:1]
+    db.session.expire_all()
+    assert db.session.get(Submission, pending_ids[0]).status == 'pending'
+
+
+def test_settling_runs_off_the_event_loop(app, slow_dify, pending_ids, monkeypatch):
+    settle = AsyncReviewer.settle
+
+    def slow_settle(self, submission, dify_response, cache_key):
+        time.sleep(0.3)  # A slow commit / leaderboard publish
+        return settle(self, submission, dify_response, cache_key)
+    monkeypatch.setattr(AsyncReviewer, 'settle', slow_settle)
+
+    async def _run():
+        gaps = []
+
+        async def ticker():
+            while True:
+                before = time.monotonic()
+                await asyncio.sleep(0.01)
+                gaps.append(time.monotonic() - before)
+
+        ticking = asyncio.create_task(ticker())
+        async with AsyncReviewer(app) as reviewer:
+            result = await reviewer.review(pending_ids[0])
+        await asyncio.sleep(0.05)  # Let the ticker record the last gap
+        ticking.cancel()
+        return result, max(gaps)
+
+    result, longest_gap = asyncio.run(_run())
+
+    assert result['auto_status'] == 'approved'
+    assert longest_gap < 0.2
@@ -0,0 +1,71 @@
+"""Dify calls reuse one keep-alive pool per hook host and record per-host metrics."""
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services import dify_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({'answer': '{}'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/v1/chat-messages'
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(monkeypatch):
+    monkeypatch.setattr(dify_client, '_sessions', {})
+    monkeypatch.setattr(dify_client, '_local_metrics', defaultdict(lambda: defaultdict(int)))
+
+
+def test_requests_to_one_host_share_a_keep_alive_connection(app, stub_url):
+    with app.app_context():
+        for _ in range(5):
+            assert dify_client.post(stub_url, json={}, timeout=5).json() == {'answer': '{}'}
+        metrics = dify_client.host_metrics()[dify_client.host_key(stub_url)]
+
+    assert metrics['requests'] == 5
+    assert metrics['connections_opened'] == 1
+    assert metrics['errors'] == 0
+    assert sum(metrics['latency_ms_buckets'].values()) == 5
+
+
+def test_pool_size_and_session_are_per_host(app):
+    app.config['DIFY_POOL_MAXSIZE_BY_HOST'] = {'dify.example.com': 32}
+    with app.app_context():
+        default = dify_client.session_for('https://api.dify.ai/v1/chat-messages')
+        override = dify_client.session_for('https://dify.example.com/v1/chat-messages')
+        again = dify_client.session_for('https://dify.example.com/v1/workflows/run')
+
+    assert override is again and override is not default
+    assert override.get_adapter('https://dify.example.com/')._pool_maxsize == 32
+    assert default.get_adapter('https://api.dify.ai/')._pool_maxsize == app.config['DIFY_POOL_MAXSIZE']
+
+
+def test_failed_requests_count_as_errors(app):
+    import requests
+    with app.app_context():
+        with pytest.raises(requests.exceptions.ConnectionError):
+            dify_client.post('http://127.0.0.1:9/unreachable', json={}, timeout=1)
+        assert dify_client.host_metrics()['http://127.0.0.1:9']['errors'] == 1
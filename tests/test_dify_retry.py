@@ -0,0 +1,153 @@
+"""Dify calls are retried with backoff, short-circuited while a hook is down and dead-lettered when they keep failing."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import tasks
+from services import dify_breaker
+from services.dify_async import review_submissions
+from services.dify_review import is_transient, retry_delay
+
+
+class _FlakyDify(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    statuses = []
+    calls = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        type(self).calls += 1
+        status = self.statuses.pop(0) if self.statuses else 200
+        answer = json.dumps({'success': True, 'auto_approved': True, 'score': 30, 'feedback': 'ok'})
+        body = json.dumps({'answer': answer}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def _fresh_breakers(monkeypatch):
+    monkeypatch.setattr(dify_breaker, '_local', {})
+
+
+@pytest.fixture
+def flaky_dify(app):
+    _FlakyDify.statuses, _FlakyDify.calls = [], 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FlakyDify)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.config.update(
+        EXTERNAL_HOOK_URL=f'http://127.0.0.1:{server.server_address[1]}/v1/chat-messages',
+        DIFY_RETRY_MAX=3, DIFY_RETRY_BACKOFF_SECONDS=0,
+    )
+    yield _FlakyDify
+    server.shutdown()
+
+
+@pytest.fixture
+def pending(db, make_user, make_challenge, make_submission):
+    submission = make_submission(make_user('player'), make_challenge('web'), status='pending')
+    db.session.commit()
+    return submission
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(response=response)
+
+
+def test_only_transient_failures_are_retried():
+    assert is_transient(requests.exceptions.ConnectionError())
+    assert is_transient(_http_error(503)) and is_transient(_http_error(429))
+    assert not is_transient(_http_error(401))
+
+
+def test_backoff_grows_exponentially_with_jitter_and_a_cap():
+    config = {'DIFY_RETRY_BACKOFF_SECONDS': 10, 'DIFY_RETRY_BACKOFF_MAX_SECONDS': 60}
+    delays = [retry_delay(3, config) for _ in range(200)]
+    assert 0 <= min(delays) and max(delays) <= 60
+    assert len(set(delays)) > 1
+    assert 5 <= retry_delay(0, config, minimum=5) <= 15
+
+
+def test_breaker_opens_then_lets_one_probe_through(app):
+    app.config.update(DIFY_BREAKER_THRESHOLD=2, DIFY_BREAKER_COOLDOWN_SECONDS=60)
+    url = 'http://dify.invalid/v1/chat-messages'
+    dify_breaker.record_failure(url)
+    assert dify_breaker.seconds_until_closed(url, 30) == 0
+    dify_breaker.record_failure(url)
+    assert 59 < dify_breaker.seconds_until_closed(url, 30) <= 60
+    assert dify_breaker.breaker_states()[url] == {'failures': 2, 'state': 'open'}
+
+    dify_breaker._local[url]['open_until'] = 0  # cool-down over
+    assert dify_breaker.seconds_until_closed(url, 30) == 0
+    assert dify_breaker.seconds_until_closed(url, 30) == 30
+
+    dify_breaker.record_success(url)
+    assert dify_breaker.seconds_until_closed(url, 30) == 0
+    assert dify_breaker.breaker_states() == {}
+
+
+def test_celery_task_retries_transient_errors(app, db, monkeypatch, flaky_dify, pending):
+    monkeypatch.setattr(tasks, '_flask_app', app)
+    flaky_dify.statuses = [503, 502]
+
+    result = tasks.trigger_external_hook.apply(args=(pending.id,)).get()
+
+    assert result['auto_status'] == 'approved'
+    assert flaky_dify.calls == 3
+    assert dify_breaker.breaker_states() == {}
+
+
+def test_permanent_errors_are_dead_lettered_without_retry(app, db, monkeypatch, flaky_dify, pending):
+    monkeypatch.setattr(tasks, '_flask_app', app)
+    flaky_dify.statuses = [401]
+
+    result = tasks.trigger_external_hook.apply(args=(pending.id,)).get()
+
+    assert result['dead_lettered'] and result['error'].startswith('Request failed: 401')
+    assert flaky_dify.calls == 1
+    db.session.expire_all()
+    assert pending.status == 'pending'
+
+
+def test_open_breaker_skips_the_call(app, db, monkeypatch, flaky_dify, pending):
+    monkeypatch.setattr(tasks, '_flask_app', app)
+    app.config.update(DIFY_RETRY_MAX=0, DIFY_BREAKER_THRESHOLD=1)
+    dify_breaker.record_failure(app.config['EXTERNAL_HOOK_URL'])
+
+    result = tasks.trigger_external_hook.apply(args=(pending.id,)).get()
+
+    assert result['dead_lettered'] and result['error'].startswith('Circuit open')
+    assert flaky_dify.calls == 0
+
+
+def test_async_executor_retries_then_dead_letters(app, flaky_dify, pending):
+    flaky_dify.statuses = [503] * 4
+
+    result, = review_submissions(app, [pending.id])
+
+    assert result['dead_lettered'] and '503' in result['error']
+    assert flaky_dify.calls == 4
+
+
+def test_dead_letter_admin_pages_work_without_redis(client, db, make_user):
+    admin = make_user('root', is_admin=True)
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin.id)
+
+    assert client.get('/admin/dify/dead-letters').status_code == 200
+    assert client.post('/admin/dify/dead-letters/redrive', json={}).status_code == 400
+    assert client.post('/admin/dify/dead-letters/redrive', json={'all': True}).get_json() == {
+        'success': True, 'redriven': [], 'skipped': []
+    }
+    assert client.get('/admin/dify/metrics').get_json()['breakers'] == {}
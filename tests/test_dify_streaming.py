@@ -0,0 +1,145 @@
+"""Streaming Dify reviews persist partial feedback as events arrive and apply the verdict at message_end."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import tasks
+from models import Submission
+from services.dify_async import review_submissions
+from services.dify_review import AnswerStream, partial_feedback, stream_review
+
+VERDICT = json.dumps({'success': True, 'auto_approved': True, 'score': 40, 'feedback': 'Nice "work"'})
+
+
+def _sse(event, **fields):
+    return f'data: {json.dumps({"event": event, **fields})}'
+
+
+def _answer_events(answer, size=10):
+    return [_sse('message', answer=answer[i:i + size]) for i in range(0, len(answer), size)]
+
+
+class _StreamingDify(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    events = []
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        assert payload['response_mode'] == 'streaming'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for event in self.events:
+            self.wfile.write(f'{event}\n\n'.encode())
+            self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def streaming_dify(app):
+    app.config['DIFY_RESPONSE_MODE'] = 'streaming'
+    app.config['DIFY_STREAM_FLUSH_SECONDS'] = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StreamingDify)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.config['EXTERNAL_HOOK_URL'] = f'http://127.0.0.1:{server.server_address[1]}/v1/chat-messages'
+    yield _StreamingDify
+    server.shutdown()
+
+
+@pytest.fixture
+def player(db, make_user):
+    return make_user('player')
+
+
+@pytest.fixture
+def pending(db, player, make_challenge, make_submission):
+    submission = make_submission(player, make_challenge('web'), status='pending')
+    db.session.commit()
+    return submission
+
+
+def test_answer_stream_assembles_chunks_and_ignores_noise():
+    stream = AnswerStream()
+    for line in ['event: ping', '', 'data: not json', *_answer_events(VERDICT), _sse('message_end', id='m1')]:
+        stream.feed(line)
+    assert stream.finished and stream.response() == {'event': 'message_end', 'id': 'm1', 'answer': VERDICT}
+
+
+def test_partial_feedback_reads_an_unterminated_string():
+    assert partial_feedback('{"score": 4') == ''
+    assert partial_feedback('{"feedback": "Nice \\"wo') == 'Nice "wo'
+    assert partial_feedback('{"feedback": "Nice \\') == 'Nice '
+    assert partial_feedback(VERDICT) == 'Nice "work"'
+
+
+def test_progress_is_persisted_before_the_verdict(db, pending):
+    seen = []
+
+    def lines():
+        for line in _answer_events(VERDICT):
+            yield line
+            if pending.dify_log is not None:
+                seen.append((pending.dify_log.status, pending.dify_log.feedback))
+        yield _sse('message_end')
+
+    result = stream_review(pending, lines(), flush_seconds=0)
+
+    assert result['auto_status'] == 'approved'
+    assert all(status == 'streaming' for status, _ in seen)
+    partial = [feedback for _, feedback in seen if feedback]
+    assert partial and all('Nice "work"'.startswith(feedback) for feedback in partial)
+    assert partial[0] != 'Nice "work"'
+    assert pending.dify_log.status == 'completed' and pending.dify_log.feedback == 'Nice "work"'
+
+
+def test_celery_task_streams_and_applies_the_verdict(app, db, monkeypatch, streaming_dify, pending):
+    monkeypatch.setattr(tasks, '_flask_app', app)
+    streaming_dify.events = [*_answer_events(VERDICT), _sse('message_end')]
+
+    result = tasks.trigger_external_hook(pending.id)
+
+    assert result['auto_status'] == 'approved' and result['score'] == 40
+    db.session.expire_all()
+    assert pending.status == 'approved'
+    assert pending.dify_log.status == 'completed'
+    assert pending.dify_log.answer_chars == len(VERDICT)
+
+
+def test_stream_error_marks_the_log_failed_and_keeps_pending(app, db, monkeypatch, streaming_dify, pending):
+    monkeypatch.setattr(tasks, '_flask_app', app)
+    streaming_dify.events = [*_answer_events(VERDICT[:30]), _sse('error', message='model overloaded')]
+
+    result = tasks.trigger_external_hook(pending.id)
+
+    assert result == {'success': False, 'error': 'Dify stream error: model overloaded', 'dead_lettered': True}
+    db.session.expire_all()
+    assert pending.status == 'pending'
+    assert pending.dify_log.status == 'failed'
+
+
+def test_async_executor_streams(app, db, streaming_dify, pending):
+    streaming_dify.events = [*_answer_events(VERDICT), _sse('message_end')]
+
+    results = review_submissions(app, [pending.id])
+
+    assert results[0]['auto_status'] == 'approved'
+    db.session.expire_all()
+    assert db.session.get(Submission, pending.id).dify_log.status == 'completed'
+
+
+def test_progress_endpoint_is_private_to_the_submitter(client, db, make_user, make_challenge, make_submission,
+                                                      player, pending):
+    others = make_submission(make_user('other'), make_challenge('pwn'), status='pending')
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(player.id)
+
+    assert client.get(f'/my-submissions/{pending.id}/progress').get_json() == {
+        'status': 'pending', 'review_status': None, 'answer_chars': 0
+    }
+    assert client.get(f'/my-submissions/{others.id}/progress').status_code == 403
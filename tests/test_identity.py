@@ -0,0 +1,88 @@
+"""The logged-in user is served from an identity snapshot that changes invalidate."""
+import pytest
+
+from models import CompetitionAccess
+from services.identity import Identity, _dump, _load, load_identity
+
+
+@pytest.fixture
+def player(db, make_user):
+    user = make_user('alice')
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def player_client(client, player):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(player.id)
+    return client
+
+
+def test_snapshot_round_trips(db, competition, player, make_user, make_team):
+    make_team('red', make_user('bob'), members=[player])
+    db.session.add(CompetitionAccess(user_id=player.id, competition_id=competition.id))
+    db.session.commit()
+
+    snapshot = _load(_dump(load_identity(player.id), '3'), '3')
+
+    assert snapshot == {'id': player.id, 'username': 'alice', 'is_admin': False, 'is_disabled': False,
+                        'team_id': player.team_membership.team_id, 'competition_ids': [competition.id]}
+
+
+def test_snapshot_from_before_an_invalidation_is_a_miss(player):
+    assert _load(_dump(load_identity(player.id), '3'), '4') is None
+    assert _load(None, '0') is None
+
+
+def test_other_attributes_come_from_the_user_row(player):
+    identity = Identity({'id': player.id, 'username': 'alice', 'is_admin': False, 'is_disabled': False})
+    assert identity.email == 'alice@example.com'
+    assert identity.check_password('password123')
+    assert identity.team_id is None and identity.competition_ids == frozenset()
+
+
+def test_deleted_user_is_logged_out(db, player):
+    db.session.delete(player)
+    db.session.commit()
+    assert load_identity(player.id) is None
+
+
+def test_pin_unlock_opens_the_competition(db, competition, player_client):
+    competition.pin = '123456'
+    db.session.commit()
+    assert player_client.get(f'/competition/{competition.id}').status_code == 302
+
+    player_client.post(f'/competition/{competition.id}/pin', data={'pin': '123456'})
+
+    assert player_client.get(f'/competition/{competition.id}').status_code == 200
+
+
+def test_joining_a_team_shows_up_in_the_identity(db, player, player_client, make_user, make_team):
+    team = make_team('red', make_user('bob'))
+    db.session.commit()
+
+    player_client.post('/teams/join', data={'invite_code': team.invite_code})
+
+    assert load_identity(player.id).team_id == team.id
+    assert player_client.post('/teams/join', data={'invite_code': team.invite_code}).status_code == 302
+
+
+def test_team_pages_use_the_snapshot_team_id(db, player, player_client, make_user, make_team, monkeypatch):
+    make_team('red', make_user('bob'), members=[player])
+    db.session.commit()
+    delegated = []
+    row_attribute = Identity.__getattr__
+
+    def _getattr(self, name):
+        delegated.append(name)
+        return row_attribute(self, name)
+
+    monkeypatch.setattr(Identity, '__getattr__', _getattr)
+
+    assert player_client.get('/teams').status_code == 200
+    assert player_client.get('/teams/my').status_code == 200
+    player_client.post('/teams/leave')
+
+    assert 'team_membership' not in delegated
+    assert load_identity(player.id).team_id is None
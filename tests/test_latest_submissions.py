@@ -0,0 +1,54 @@
+"""Latest-submission-per-challenge helper: one query, correct winner per challenge."""
+from models import CompetitionAccess
+from services.submissions import latest_submissions, submission_history
+from tests.test_leaderboard_queries import count_statements
+
+
+def test_latest_submission_per_challenge_in_one_query(db, make_user, make_challenge, make_submission):
+    alice, bob = make_user('alice'), make_user('bob')
+    web, pwn, misc = make_challenge('web'), make_challenge('pwn'), make_challenge('misc')
+    make_submission(alice, web, status='rejected', minutes=1)
+    newest_web = make_submission(alice, web, status='pending', minutes=5)
+    make_submission(alice, pwn, status='rejected', minutes=3)
+    # Same timestamp: the later row wins.
+    newest_pwn = make_submission(alice, pwn, status='approved', minutes=3)
+    make_submission(bob, misc, minutes=9)
+
+    with count_statements(db.engine) as statements:
+        latest = latest_submissions(alice.id, [web.id, pwn.id, misc.id])
+
+    assert {challenge_id: s.id for challenge_id, s in latest.items()} == {web.id: newest_web.id, pwn.id: newest_pwn.id}
+    assert len(statements) == 1
+    assert latest_submissions(alice.id, []) == {}
+
+
+def test_competition_page_does_not_query_per_challenge(app, db, client, competition, make_user, make_challenge,
+                                                       make_submission):
+    player = make_user('player')
+    db.session.add(CompetitionAccess(user_id=player.id, competition_id=competition.id))
+    for i in range(10):
+        make_submission(player, make_challenge(f'challenge-{i}'), minutes=i)
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(player.id)
+
+    with count_statements(db.engine) as statements:
+        response = client.get(f'/competition/{competition.id}')
+
+    assert response.status_code == 200
+    # User + competition + PIN access + challenges + latest submissions + settings.
+    assert len(statements) <= 7, statements
+
+
+def test_submission_history_loads_challenge_and_competition(db, make_user, make_challenge, make_submission):
+    player = make_user('player')
+    for i in range(3):
+        make_submission(player, make_challenge(f'challenge-{i}'), minutes=i)
+    player_id = player.id
+    db.session.expire_all()
+
+    with count_statements(db.engine) as statements:
+        names = [(s.challenge.title, s.challenge.competition.name) for s in submission_history(player_id)]
+
+    assert [title for title, _ in names] == ['challenge-2', 'challenge-1', 'challenge-0']
+    assert len(statements) == 1
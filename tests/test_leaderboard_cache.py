@@ -0,0 +1,95 @@
+"""Cached leaderboards round-trip exactly and are never served for another version."""
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from services import leaderboard_cache
+from services.leaderboard import build_leaderboard
+from services.leaderboard_cache import _cache_key, _dump, _load, _lock_key, get_leaderboard
+from services.scoring import refresh_submission_score
+from services.versions import competition_stamp
+
+
+def test_cached_board_round_trips(db, competition, make_user, make_team, make_challenge, make_submission):
+    alice, bob = make_user('alice'), make_user('bob')
+    make_team('red', bob)
+    web = make_challenge('web')
+    refresh_submission_score(make_submission(alice, web, points=70))
+    refresh_submission_score(make_submission(bob, web, points=90))
+    board = build_leaderboard(competition.id)
+
+    restored = _load(_dump(board, 3), competition.id, 3)
+
+    assert restored == board
+    assert isinstance(restored.teams[0].last_solve_time, datetime)
+
+
+def test_stale_version_is_a_miss(db, competition):
+    board = build_leaderboard(competition.id)
+    assert _load(_dump(board, 3), competition.id, 4) is None
+
+
+def test_without_redis_the_board_is_built_directly(db, competition, make_user, make_challenge, make_submission):
+    refresh_submission_score(make_submission(make_user('carol'), make_challenge('web')))
+    assert get_leaderboard(competition.id).individual[0].username == 'carol'
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Competition ids whose leaderboard was built from the database."""
+    built = []
+
+    def _build(competition_id):
+        built.append(competition_id)
+        return build_leaderboard(competition_id)
+    monkeypatch.setattr(leaderboard_cache, 'build_leaderboard', _build)
+    return built
+
+
+def test_second_read_is_a_cache_hit(db, redis_client, builds, competition, make_user, make_challenge,
+                                    make_submission):
+    refresh_submission_score(make_submission(make_user('alice'), make_challenge('web')))
+    db.session.commit()
+
+    first = get_leaderboard(competition.id)
+
+    assert get_leaderboard(competition.id) == first
+    assert builds == [competition.id]
+
+
+def test_version_bump_rebuilds_the_board(db, redis_client, builds, competition, make_user, make_challenge,
+                                         make_submission):
+    alice, web = make_user('alice'), make_challenge('web')
+    refresh_submission_score(make_submission(alice, web, points=40))
+    db.session.commit()
+    assert get_leaderboard(competition.id).individual[0].total_points == 40
+
+    # A scoring refresh bumps the version; the cached board is never served for it.
+    refresh_submission_score(make_submission(alice, web, points=90))
+    db.session.commit()
+
+    assert get_leaderboard(competition.id).individual[0].total_points == 90
+    assert builds == [competition.id, competition.id]
+
+
+def test_waiter_reads_the_board_another_worker_rebuilt(app, db, redis_client, builds, competition, make_user,
+                                                       make_challenge, make_submission):
+    refresh_submission_score(make_submission(make_user('alice'), make_challenge('web')))
+    db.session.commit()
+    version = competition_stamp(competition.id)[0]
+    rebuilt = build_leaderboard(competition.id)
+    redis_client.set(_lock_key(competition.id), 'other-worker', ex=app.config['LEADERBOARD_CACHE_LOCK_SECONDS'])
+
+    def _other_worker():
+        time.sleep(0.2)
+        redis_client.set(_cache_key(competition.id), _dump(rebuilt, version))
+    worker = threading.Thread(target=_other_worker)
+    worker.start()
+
+    board = get_leaderboard(competition.id)
+    worker.join()
+
+    assert board == rebuilt
+    assert builds == []
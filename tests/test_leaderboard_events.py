@@ -0,0 +1,144 @@
+"""Live leaderboard deltas only carry the rows that changed."""
+import json
+
+import services.leaderboard_events as leaderboard_events
+from services.leaderboard import build_leaderboard
+from services.leaderboard_events import channel_name, current_seq, diff_snapshots, notify_leaderboard_changed, snapshot
+from services.scoring import refresh_submission_score, refresh_team
+from services.versions import competition_stamp
+
+
+def test_delta_contains_only_changed_rows(db, competition, make_user, make_challenge, make_submission):
+    alice, bob, carol = make_user('alice'), make_user('bob'), make_user('carol')
+    web = make_challenge('web')
+    pwn = make_challenge('pwn')
+    for user, points in [(alice, 300), (bob, 200), (carol, 100)]:
+        refresh_submission_score(make_submission(user, web, points=points))
+    before = snapshot(build_leaderboard(competition.id))
+
+    # Carol overtakes Bob; Alice keeps first place and is not resent.
+    refresh_submission_score(make_submission(carol, pwn, points=150, minutes=5))
+    after = snapshot(build_leaderboard(competition.id))
+    delta = diff_snapshots(before, after)
+
+    upserts = {row['username']: row['rank'] for row in delta['leaderboard']['upsert']}
+    assert upserts == {'carol': 2, 'bob': 3}
+    assert delta['leaderboard']['remove'] == []
+    assert delta['team_leaderboard'] == {'upsert': [], 'remove': []}
+
+
+def test_joining_a_team_removes_the_individual_row(db, competition, make_user, make_team,
+                                                   make_challenge, make_submission):
+    dave = make_user('dave')
+    refresh_submission_score(make_submission(dave, make_challenge('web')))
+    before = snapshot(build_leaderboard(competition.id))
+
+    team = make_team('red', dave)
+    refresh_team(team.id)
+    delta = diff_snapshots(before, snapshot(build_leaderboard(competition.id)))
+
+    assert delta['leaderboard']['remove'] == ['dave']
+    assert [row['team_name'] for row in delta['team_leaderboard']['upsert']] == ['red']
+
+
+def test_only_changed_rows_are_published(db, redis_client, competition, make_user, make_challenge, make_submission):
+    alice, bob = make_user('alice'), make_user('bob')
+    web, pwn = make_challenge('web'), make_challenge('pwn')
+    refresh_submission_score(make_submission(alice, web, points=100))
+    refresh_submission_score(make_submission(bob, web, points=50))
+    db.session.commit()
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel_name(competition.id))
+
+    def published():
+        # get_message also returns None for the (ignored) subscribe confirmation.
+        messages = (pubsub.get_message(timeout=0.05) for _ in range(10))
+        return [json.loads(message['data']) for message in messages if message]
+
+    notify_leaderboard_changed(competition.id)
+    refresh_submission_score(make_submission(bob, pwn, points=60))
+    db.session.commit()
+    notify_leaderboard_changed(competition.id, append_only=True)
+    notify_leaderboard_changed(competition.id)  # Nothing changed: nothing published
+
+    first, second = published()
+    assert first['seq'] == 1 and {row['username'] for row in first['leaderboard']['upsert']} == {'alice', 'bob'}
+    assert second['seq'] == 2
+    assert [(row['username'], row['rank'], row['total_points']) for row in second['leaderboard']['upsert']] == [
+        ('bob', 1, 110), ('alice', 2, 100)
+    ]
+    assert current_seq(competition.id) == 2
+    pubsub.close()
+
+
+def test_a_notifier_with_an_older_version_publishes_nothing(db, redis_client, competition, make_user,
+                                                             make_challenge, make_submission, monkeypatch):
+    alice, bob = make_user('alice'), make_user('bob')
+    web = make_challenge('web')
+    refresh_submission_score(make_submission(alice, web, points=100))
+    db.session.commit()
+    stale = competition_stamp(competition.id)
+    refresh_submission_score(make_submission(bob, web, points=150))
+    db.session.commit()
+    notify_leaderboard_changed(competition.id)
+    stored = redis_client.get(f'leaderboard:{competition.id}:snapshot')
+
+    # A slower notifier that read the older version arrives last.
+    monkeypatch.setattr(leaderboard_events, 'competition_stamp', lambda competition_id: stale)
+    notify_leaderboard_changed(competition.id)
+
+    assert current_seq(competition.id) == 1
+    assert redis_client.get(f'leaderboard:{competition.id}:snapshot') == stored
+
+
+def test_a_notifier_that_loses_the_race_diffs_against_the_winner(db, redis_client, competition, make_user,
+                                                                 make_challenge, make_submission, monkeypatch):
+    alice, bob = make_user('alice'), make_user('bob')
+    web = make_challenge('web')
+    refresh_submission_score(make_submission(alice, web, points=100))
+    db.session.commit()
+    notify_leaderboard_changed(competition.id)
+    refresh_submission_score(make_submission(bob, web, points=150))
+    db.session.commit()
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel_name(competition.id))
+
+    # Another notifier stores the same version between this one's read and its swap.
+    build = leaderboard_events.get_leaderboard
+    raced = []
+
+    def get_leaderboard(competition_id, version=None):
+        if not raced:
+            raced.append(True)
+            notify_leaderboard_changed(competition_id)
+        return build(competition_id, version)
+
+    monkeypatch.setattr(leaderboard_events, 'get_leaderboard', get_leaderboard)
+    notify_leaderboard_changed(competition.id)
+
+    messages = [pubsub.get_message(timeout=0.05) for _ in range(10)]
+    deltas = [json.loads(message['data']) for message in messages if message]
+    assert [delta['seq'] for delta in deltas] == [2]
+    assert current_seq(competition.id) == 2
+    pubsub.close()
+
+
+def test_stream_unavailable_without_redis(client, competition, db):
+    db.session.commit()
+    response = client.get(f'/api/leaderboard/{competition.id}/stream')
+    assert response.status_code == 503
+
+
+def test_streams_past_the_per_worker_cap_are_refused(app, client, redis_client, competition, db):
+    app.config['LEADERBOARD_STREAM_MAX_PER_WORKER'] = 1
+    db.session.commit()
+    url = f'/api/leaderboard/{competition.id}/stream'
+
+    first = client.get(url, buffered=False)
+    assert first.status_code == 200
+    assert client.get(url).status_code == 503
+
+    first.close()
+    second = client.get(url, buffered=False)
+    assert second.status_code == 200
+    second.close()
@@ -0,0 +1,71 @@
+"""The leaderboard costs a constant number of SQL statements, whatever its size."""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from services.scoring import rebuild_competition
+
+
+@contextmanager
+def count_statements(engine):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', _record)
+
+
+@pytest.fixture
+def populated_competition(db, competition, make_user, make_team, make_challenge, make_submission):
+    challenges = [make_challenge(f'challenge-{i}') for i in range(3)]
+    users = [make_user(f'player{i}') for i in range(30)]
+    # First 12 players form four teams of three; the rest play solo.
+    for t in range(4):
+        captain, *members = users[t * 3:t * 3 + 3]
+        make_team(f'team-{t}', captain, members=members)
+    for i, user in enumerate(users):
+        for challenge in challenges[:1 + i % 3]:
+            make_submission(user, challenge, points=10 + i, minutes=i)
+    rebuild_competition(competition.id)
+    db.session.commit()
+    return competition
+
+
+def test_leaderboard_api_query_count_is_bounded(app, db, client, populated_competition):
+    with count_statements(db.engine) as statements:
+        response = client.get(f'/api/leaderboard/{populated_competition.id}')
+
+    data = response.get_json()
+    assert len(data['leaderboard']) == 18
+    assert len(data['team_leaderboard']) == 4
+    assert all(entry['member_count'] == 3 for entry in data['team_leaderboard'])
+    # Version stamp + competition lookup + individual board + team board.
+    assert len(statements) <= 4, statements
+
+
+def test_unchanged_leaderboard_is_a_single_lookup(app, db, client, populated_competition):
+    first = client.get(f'/api/leaderboard/{populated_competition.id}')
+    assert first.headers['ETag']
+
+    with count_statements(db.engine) as statements:
+        again = client.get(f'/api/leaderboard/{populated_competition.id}',
+                           headers={'If-None-Match': first.headers['ETag']})
+
+    assert again.status_code == 304
+    assert len(statements) == 1, statements
+
+
+def test_leaderboard_page_query_count_is_bounded(app, db, client, populated_competition):
+    with count_statements(db.engine) as statements:
+        response = client.get(f'/leaderboard/{populated_competition.id}')
+
+    assert response.status_code == 200
+    assert b'player29' in response.data
+    # Same as the API plus the platform settings context processor.
+    assert len(statements) <= 6, statements
@@ -20,6 +20,7 @@ def test_leaderboard_scoring():
     app = create_app()
 
     with app.app_context():
+        db.create_all()
         print("🧪 Testing Leaderboard Scoring Logic\n")
         print("=" * 60)
 
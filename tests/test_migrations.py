@@ -0,0 +1,58 @@
+"""The index migration stays in sync with the indexes declared on the models."""
+import importlib.util
+import os
+
+import sqlalchemy as sa
+
+from models import db
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions')
+
+
+def _load(filename):
+    spec = importlib.util.spec_from_file_location(filename[:-3], os.path.join(MIGRATIONS, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_access_path_indexes_match_models():
+    migration = _load('0001_submission_access_indexes.py')
+    declared = {
+        index.name: (table.name, [column.name for column in index.columns])
+        for table in db.metadata.tables.values() for index in table.indexes
+    }
+    for name, table, columns in migration.INDEXES:
+        assert declared[name] == (table, columns)
+
+
+def test_dify_log_progress_columns_match_models():
+    migration = _load('0002_dify_log_progress.py')
+    assert migration.down_revision == '0001_submission_access_indexes'
+    table = db.metadata.tables['submission_dify_logs']
+    for column in migration.COLUMNS:
+        assert type(table.c[column.name].type) is type(column.type)
+
+
+def test_review_cache_columns_match_models():
+    migration = _load('0003_review_cache_columns.py')
+    assert migration.down_revision == '0002_dify_log_progress'
+    migrated = {(table, column.name) for table, column in migration.COLUMNS}
+    for table, column in migration.COLUMNS:
+        assert type(db.metadata.tables[table].c[column.name].type) is type(column.type)
+    # Every model column of this kind must be migrated too, or existing databases lack it.
+    names = {name for _, name in migrated}
+    declared = {(table.name, column.name) for table in db.metadata.tables.values()
+                for column in table.columns if column.name in names}
+    assert declared <= migrated
+
+
+def test_rereview_tables_match_models():
+    migration = _load('0004_rereview_runs.py')
+    assert migration.down_revision == '0003_review_cache_columns'
+    for name, columns in migration._tables():
+        declared = db.metadata.tables[name].c
+        migrated = [column for column in columns if isinstance(column, sa.Column)]
+        assert {column.name for column in migrated} == set(declared.keys())
+        for column in migrated:
+            assert type(declared[column.name].type) is type(column.type)
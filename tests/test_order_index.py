@@ -19,6 +19,7 @@ def test_order_index():
     app = create_app('production')
 
     with app.app_context():
+        db.create_all()
         print("=" * 70)
         print("测试 order_index 功能 / Testing order_index functionality")
         print("=" * 70)
@@ -0,0 +1,69 @@
+"""Templates get the platform settings from a per-process cache that admin saves invalidate."""
+import pytest
+from sqlalchemy import event
+
+from models import PlatformSettings
+from services import platform_settings
+
+
+@pytest.fixture
+def settings_queries(db):
+    statements = []
+
+    def _count(conn, cursor, statement, *args):
+        if 'platform_settings' in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', _count)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', _count)
+
+
+def test_pages_reuse_the_cached_settings(client, settings_queries):
+    for _ in range(3):
+        assert client.get('/auth/login').status_code == 200
+    assert len(settings_queries) == 1
+
+
+def test_admin_save_shows_the_new_name_right_away(app, client, db, make_user, settings_queries):
+    admin = make_user('root', is_admin=True)
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin.id)
+    client.get('/auth/login')
+
+    response = client.post('/admin/settings', data={'platform_name': 'Spring CTF', 'footer_text': 'See you'},
+                           follow_redirects=True)
+
+    assert 'Spring CTF' in response.get_data(as_text=True)
+    assert platform_settings.template_settings()['FOOTER_TEXT'] == 'See you'
+
+
+def test_expired_cache_reloads(app, db, settings_queries):
+    app.config['PLATFORM_SETTINGS_CACHE_SECONDS'] = 0
+    assert platform_settings.template_settings()['PLATFORM_LOGO'] == 'logo.png'
+    PlatformSettings.query.filter_by(key='platform_logo').one().value = 'new.png'
+    db.session.commit()
+
+    assert platform_settings.template_settings()['PLATFORM_LOGO'] == 'new.png'
+    assert len(settings_queries) >= 2
+
+
+def test_a_new_shared_version_reloads(app, db, monkeypatch):
+    monkeypatch.setattr(platform_settings, '_version', lambda: '1')
+    assert platform_settings.template_settings()['PLATFORM_NAME'] == 'CTF Platform'
+    PlatformSettings.query.filter_by(key='platform_name').one().value = 'Saved elsewhere'
+    db.session.commit()
+    assert platform_settings.template_settings()['PLATFORM_NAME'] == 'CTF Platform'
+
+    monkeypatch.setattr(platform_settings, '_version', lambda: '2')
+    assert platform_settings.template_settings()['PLATFORM_NAME'] == 'Saved elsewhere'
+
+
+def test_missing_rows_fall_back_to_defaults(app, db):
+    PlatformSettings.query.delete()
+    db.session.commit()
+    assert platform_settings.template_settings() == {
+        'PLATFORM_NAME': 'CTF Platform', 'PLATFORM_LOGO': None,
+        'FOOTER_TEXT': platform_settings.DEFAULT_FOOTER_TEXT,
+    }
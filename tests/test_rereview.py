@@ -0,0 +1,187 @@
+"""Batch re-review sends a challenge's submissions to Dify again, as a dry run or applied."""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import tasks
+from models import ChallengeScore, ReReviewResult, ReReviewRun, Submission
+from services import rereview
+from services.dify_async import AsyncReviewer
+from services.rereview import apply_run, create_run, run_rereview
+from services.scoring import refresh_submission_score
+
+REJECT = json.dumps({'success': False, 'auto_approved': True, 'score': 0, 'feedback': 'Prompt v2 says no'})
+
+
+class _Dify(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    modes = []
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        type(self).modes.append(payload['response_mode'])
+        body = json.dumps({'answer': REJECT}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def dify(app):
+    _Dify.modes = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Dify)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.config.update(EXTERNAL_HOOK_URL=f'http://127.0.0.1:{server.server_address[1]}/v1/chat-messages',
+                      DIFY_RESPONSE_MODE='streaming')
+    yield _Dify
+    server.shutdown()
+
+
+@pytest.fixture
+def challenge(db, make_challenge):
+    return make_challenge('web', points=100)
+
+
+@pytest.fixture
+def reviewed(db, make_user, make_submission, challenge):
+    approved = make_submission(make_user('alice'), challenge, status='approved', points=100)
+    pending = make_submission(make_user('bob'), challenge, status='pending')
+    db.session.commit()
+    return approved, pending
+
+
+@pytest.fixture
+def admin_client(client, db, make_user):
+    admin = make_user('root', is_admin=True)
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin.id)
+    return client
+
+
+def _start(admin_client, monkeypatch, app, challenge, **form):
+    monkeypatch.setattr(tasks, '_flask_app', app)
+    monkeypatch.setattr(tasks.rereview_challenge, 'delay', tasks.rereview_challenge)
+    data = {'statuses': ['pending', 'approved', 'rejected'], 'concurrency': 2, 'rate_per_minute': 600, **form}
+    response = admin_client.post(f'/admin/challenges/{challenge.id}/rereview', data=data)
+    assert response.status_code == 302
+    return ReReviewRun.query.filter_by(challenge_id=challenge.id).one()
+
+
+def test_dry_run_stores_verdicts_without_touching_submissions(app, db, monkeypatch, admin_client, dify,
+                                                               challenge, reviewed):
+    approved, pending = reviewed
+
+    run = _start(admin_client, monkeypatch, app, challenge, dry_run='y')
+
+    assert dify.modes == ['blocking', 'blocking']
+    db.session.expire_all()
+    assert (approved.status, approved.points_awarded, pending.status) == ('approved', 100, 'pending')
+    assert approved.dify_log is None
+    rows = {row.submission_id: row for row in run.results}
+    assert (rows[approved.id].old_status, rows[approved.id].new_status) == ('approved', 'rejected')
+    assert rows[approved.id].feedback == 'Prompt v2 says no'
+    assert admin_client.get(f'/admin/rereview/{run.id}/status').get_json() == {
+        'id': run.id, 'status': 'completed', 'dry_run': True, 'total': 2, 'queued': 0, 'done': 2, 'failed': 0,
+        'changed': 2, 'applied': False,
+    }
+    assert admin_client.get(f'/admin/rereview/{run.id}').status_code == 200
+
+
+def test_applying_a_dry_run_skips_submissions_reviewed_since(app, db, monkeypatch, admin_client, dify,
+                                                            challenge, reviewed):
+    approved, pending = reviewed
+    run = _start(admin_client, monkeypatch, app, challenge, dry_run='y')
+    pending.status = 'approved'
+    db.session.commit()
+
+    admin_client.post(f'/admin/rereview/{run.id}/apply')
+
+    db.session.expire_all()
+    assert (approved.status, approved.points_awarded) == ('rejected', 0)
+    assert pending.status == 'approved'
+    assert db.session.get(ReReviewRun, run.id).applied_at is not None
+    assert len(dify.modes) == 2
+
+
+def test_run_without_dry_run_applies_verdicts(app, db, monkeypatch, admin_client, dify, challenge, reviewed):
+    approved, pending = reviewed
+
+    _start(admin_client, monkeypatch, app, challenge, statuses=['approved'])
+
+    db.session.expire_all()
+    assert approved.status == 'rejected' and approved.dify_log.feedback == 'Prompt v2 says no'
+    assert pending.status == 'pending' and len(dify.modes) == 1
+
+
+def test_a_run_the_worker_cannot_take_stays_queued_for_a_retry(app, db, monkeypatch, admin_client, dify,
+                                                                challenge, reviewed):
+    def unavailable(run_id):
+        raise ConnectionError('broker down')
+
+    monkeypatch.setattr(tasks.rereview_challenge, 'delay', unavailable)
+    response = admin_client.post(f'/admin/challenges/{challenge.id}/rereview', data={
+        'statuses': ['pending', 'approved'], 'concurrency': 2, 'rate_per_minute': 600, 'dry_run': 'y'})
+
+    assert response.status_code == 302
+    run = ReReviewRun.query.filter_by(challenge_id=challenge.id).one()
+    assert run.status == 'queued' and dify.modes == []
+
+    monkeypatch.setattr(tasks, '_flask_app', app)
+    monkeypatch.setattr(tasks.rereview_challenge, 'delay', tasks.rereview_challenge)
+    admin_client.post(f'/admin/rereview/{run.id}/enqueue')
+
+    db.session.expire_all()
+    assert db.session.get(ReReviewRun, run.id).status == 'completed' and len(dify.modes) == 2
+
+
+def test_applying_a_dry_run_refreshes_scores_and_notifies_once(app, db, monkeypatch, dify, challenge, make_user,
+                                                               make_submission):
+    approved = [make_submission(make_user(name), challenge, points=100) for name in ('alice', 'bob', 'carol')]
+    for submission in approved:
+        refresh_submission_score(submission)
+    db.session.commit()
+    run_id = create_run(challenge, ['approved'], dry_run=True, concurrency=3, rate_per_minute=600).id
+    run_rereview(app, run_id)
+    notified = []
+    monkeypatch.setattr(rereview, 'notify_leaderboard_changed',
+                        lambda competition_id, append_only=False: notified.append((competition_id, append_only)))
+
+    applied, skipped = apply_run(db.session.get(ReReviewRun, run_id))
+
+    assert (sorted(applied), skipped) == (sorted(submission.id for submission in approved), [])
+    assert notified == [(challenge.competition_id, False)]
+    assert ChallengeScore.query.filter(ChallengeScore.challenge_id == challenge.id,
+                                       ChallengeScore.points > 0).count() == 0
+
+
+def test_reviews_without_a_verdict_are_marked_failed(app, db, challenge, reviewed):
+    app.config['EXTERNAL_HOOK_URL'] = ''
+    run_id = create_run(challenge, ['pending'], dry_run=True, concurrency=1, rate_per_minute=60).id
+
+    run_rereview(app, run_id)
+
+    row = ReReviewResult.query.filter_by(run_id=run_id).one()
+    assert row.state == 'failed' and 'No Dify hook URL' in row.error
+    assert db.session.get(Submission, row.submission_id).status == 'pending'
+
+
+def test_rate_limit_spaces_call_starts(app):
+    reviewer = AsyncReviewer(app, max_per_minute=1200)
+
+    async def _starts():
+        for _ in range(4):
+            await reviewer._throttle()
+
+    start = time.monotonic()
+    asyncio.run(_starts())
+    assert time.monotonic() - start >= 0.14
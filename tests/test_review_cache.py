@@ -0,0 +1,109 @@
+"""Identical resubmissions are addressed by content and can reuse an earlier Dify verdict."""
+import json
+
+import pytest
+
+from models import SubmissionFile
+from services import review_cache
+from services.dify_review import ReviewRequest, apply_review, cached_review
+
+VERDICT = json.dumps({'success': True, 'auto_approved': True, 'score': 25, 'feedback': 'Same as before'})
+
+
+def _review(url='http://dify.invalid/v1/chat-messages', key='app-1'):
+    return ReviewRequest(url=url, headers={'Authorization': f'Bearer {key}'}, payload={'response_mode': 'blocking'})
+
+
+@pytest.fixture
+def challenge(db, make_challenge):
+    return make_challenge('web')
+
+
+@pytest.fixture
+def player(db, make_user):
+    return make_user('player')
+
+
+def _submit(db, make_submission, player, challenge, answer, hashes=()):
+    submission = make_submission(player, challenge, status='pending')
+    submission.answer_text = answer
+    for i, content_hash in enumerate(hashes):
+        db.session.add(SubmissionFile(submission_id=submission.id, filename=f'{i}.png', filepath=f'{i}.png',
+                                      content_hash=content_hash))
+    db.session.flush()
+    return submission
+
+
+def test_normalize_answer_ignores_whitespace_and_unicode_form():
+    assert review_cache.normalize_answer('  flag{café}\r\n\n  ok ') == 'flag{café} ok'
+    assert review_cache.normalize_answer(None) == ''
+
+
+def test_key_follows_content_not_formatting(db, make_submission, make_challenge, player, challenge):
+    first = _submit(db, make_submission, player, challenge, 'SQL injection\nin login', ['b' * 64, 'a' * 64])
+    same = _submit(db, make_submission, player, challenge, '  SQL injection in   login ', ['a' * 64, 'b' * 64])
+    other_file = _submit(db, make_submission, player, challenge, 'SQL injection in login', ['a' * 64])
+    other_challenge = _submit(db, make_submission, player, make_challenge('pwn'), 'SQL injection in login',
+                              ['a' * 64, 'b' * 64])
+
+    key = review_cache.cache_key(first, _review())
+    assert key == review_cache.cache_key(same, _review())
+    assert key != review_cache.cache_key(other_file, _review())
+    assert key != review_cache.cache_key(other_challenge, _review())
+    assert key != review_cache.cache_key(first, _review(url='http://other.invalid/v1/chat-messages'))
+    assert key != review_cache.cache_key(first, _review(key='app-2'))
+
+
+def test_files_without_a_stored_hash_are_hashed_from_disk(app, db, tmp_path, make_submission, player, challenge):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    (tmp_path / 'shot.png').write_bytes(b'\x89PNG screenshot')
+    submission = _submit(db, make_submission, player, challenge, 'answer')
+    db.session.add(SubmissionFile(submission_id=submission.id, filename='shot.png', filepath='shot.png'))
+    stored = _submit(db, make_submission, player, challenge, 'answer',
+                     [review_cache.file_digest(tmp_path / 'shot.png')])
+
+    assert review_cache.cache_key(submission, _review()) == review_cache.cache_key(stored, _review())
+    (tmp_path / 'shot.png').unlink()
+    assert review_cache.cache_key(submission, _review()) is None
+
+
+def test_cache_is_skipped_without_redis(db, make_submission, player, challenge):
+    submission = _submit(db, make_submission, player, challenge, 'answer')
+    assert cached_review(submission, _review()) == (None, None)
+
+    apply_review(submission, {'answer': VERDICT})
+
+    assert submission.dify_log.cache_key is None and submission.dify_log.cache_hit is None
+
+
+def test_hits_and_misses_are_recorded(client, db, monkeypatch, make_user, make_submission, player, challenge):
+    missed = _submit(db, make_submission, player, challenge, 'answer')
+    apply_review(missed, {'answer': VERDICT}, cache_key='k' * 64)
+    hit = _submit(db, make_submission, player, challenge, 'answer')
+    monkeypatch.setattr(review_cache, 'lookup', lambda submission, review: ('k' * 64, VERDICT))
+
+    key, result = cached_review(hit, _review())
+
+    assert key == 'k' * 64 and result['auto_status'] == 'approved' and result['score'] == 25
+    assert result['dify_response']['cached']
+    assert (missed.dify_log.cache_hit, hit.dify_log.cache_hit) == (False, True)
+
+    admin = make_user('root', is_admin=True)
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin.id)
+    assert client.get('/admin/dify/metrics').get_json()['verdict_cache'] == {
+        'hits': 1, 'misses': 1, 'hit_ratio': 0.5
+    }
+
+
+def test_a_new_generation_stops_serving_old_verdicts(db, redis_client, make_submission, player, challenge):
+    first = _submit(db, make_submission, player, challenge, 'answer')
+    key, _ = review_cache.lookup(first, _review())
+    review_cache.store(key, VERDICT)
+    assert review_cache.lookup(_submit(db, make_submission, player, challenge, 'answer'), _review()) == (key, VERDICT)
+
+    review_cache.bump_generation(challenge.id)
+
+    new_key, answer = review_cache.lookup(_submit(db, make_submission, player, challenge, 'answer'), _review())
+    assert new_key != key and answer is None
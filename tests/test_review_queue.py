@@ -0,0 +1,72 @@
+"""Admin review queue: keyset pages, filters, eager loading and the JSON variant."""
+from services.submissions import review_queue
+from tests.test_leaderboard_queries import count_statements
+
+
+def _login(client, user):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+
+
+def test_keyset_pages_cover_the_queue_once(db, make_user, make_challenge, make_submission):
+    player = make_user('player')
+    web = make_challenge('web')
+    # Pairs share a timestamp, so the id tie-break matters across page boundaries.
+    created = [make_submission(player, web, status='pending', minutes=i // 2) for i in range(7)]
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = review_queue(status='pending', before=cursor, limit=3)
+        seen.extend(submission.id for submission in page)
+        if cursor is None:
+            break
+
+    assert seen == [submission.id for submission in sorted(
+        created, key=lambda s: (s.submitted_at, s.id), reverse=True
+    )]
+
+
+def test_filters_by_competition_challenge_and_reviewer(db, competition, make_user, make_challenge, make_submission):
+    from models import Challenge, Competition
+    player = make_user('player')
+    web, pwn = make_challenge('web'), make_challenge('pwn')
+    other = Competition(name='Other', status='running')
+    db.session.add(other)
+    db.session.flush()
+    elsewhere = Challenge(title='elsewhere', description='', competition_id=other.id)
+    db.session.add(elsewhere)
+    db.session.flush()
+    by_ai = make_submission(player, web)
+    by_ai.reviewed_by_name = 'AI'
+    make_submission(player, pwn)
+    make_submission(player, elsewhere)
+
+    assert len(review_queue(competition_id=competition.id)[0]) == 2
+    assert [s.challenge_id for s in review_queue(challenge_id=pwn.id)[0]] == [pwn.id]
+    assert [s.id for s in review_queue(reviewer='AI')[0]] == [by_ai.id]
+
+
+def test_queue_page_and_json_use_constant_queries(app, db, client, make_user, make_challenge, make_submission):
+    admin = make_user('reviewer', is_admin=True)
+    for i in range(30):
+        make_submission(make_user(f'player{i}'), make_challenge(f'challenge-{i}'), status='pending', minutes=i)
+    db.session.commit()
+    _login(client, admin)
+
+    with count_statements(db.engine) as statements:
+        page = client.get('/admin/submissions?per_page=20')
+    assert page.status_code == 200
+    assert b'load-more' in page.data
+    # Current user + queue + competitions + reviewers + settings; no per-row lazy loads.
+    assert len(statements) <= 6, statements
+
+    first = client.get('/admin/submissions.json?per_page=20').get_json()
+    second = client.get(f"/admin/submissions.json?per_page=20&before={first['next_cursor']}").get_json()
+    assert len(first['submissions']) == 20 and len(second['submissions']) == 10
+    assert second['next_cursor'] is None
+    assert first['submissions'][0]['user']['username'] == 'player29'
+
+
+def test_malformed_cursor_is_rejected(app, db, client, make_user):
+    _login(client, make_user('reviewer', is_admin=True))
+    assert client.get('/admin/submissions.json?before=nonsense').status_code == 400
@@ -0,0 +1,109 @@
+"""Review scheduling: fair across players, first attempts take the priority lane; without Redis reviews go straight
+to the executor."""
+import pytest
+from celery.exceptions import Retry
+
+import tasks
+from services import review_scheduler
+from services.review_scheduler import enqueue_review, is_first_attempt, pump, queue_metrics
+
+
+def test_only_a_players_first_submission_to_a_challenge_is_a_first_attempt(db, make_user, make_challenge,
+                                                                          make_submission):
+    alice, bob = make_user('alice'), make_user('bob')
+    web = make_challenge('web')
+    first = make_submission(alice, web, status='pending')
+    assert is_first_attempt(alice.id, web.id, first.id)
+
+    retry = make_submission(alice, web, status='pending')
+    assert not is_first_attempt(alice.id, web.id, retry.id)
+    assert is_first_attempt(bob.id, web.id, make_submission(bob, web, status='pending').id)
+
+
+def test_without_redis_reviews_are_dispatched_directly(app, db, monkeypatch, make_user, make_challenge,
+                                                       make_submission):
+    submission = make_submission(make_user('alice'), make_challenge('web'), status='pending')
+    db.session.commit()
+    delayed = []
+    monkeypatch.setattr(tasks.trigger_external_hook, 'delay', delayed.append)
+
+    enqueue_review(submission.id)
+
+    assert delayed == [submission.id]
+    assert pump() == 0
+    assert queue_metrics() == {}
+
+
+@pytest.mark.parametrize('outcome, released', [(RuntimeError('boom'), [7]), (Retry(), [])])
+def test_celery_task_releases_its_slot_unless_a_retry_is_pending(app, monkeypatch, outcome, released):
+    monkeypatch.setattr(tasks, '_flask_app', app)
+    calls = []
+    monkeypatch.setattr(review_scheduler, 'release', calls.append)
+
+    def _review(task, app, submission_id):
+        raise outcome
+    monkeypatch.setattr(tasks, '_review_submission', _review)
+
+    with pytest.raises(type(outcome)):
+        tasks.trigger_external_hook.run(7)
+    assert calls == released
+
+
+@pytest.fixture
+def dispatched(app, redis_client, monkeypatch):
+    """Reviews handed to Celery, in order."""
+    delayed = []
+    monkeypatch.setattr(tasks.trigger_external_hook, 'delay', delayed.append)
+    return delayed
+
+
+def test_a_noisy_player_cannot_starve_another(app, db, dispatched, make_user, make_challenge, make_submission):
+    app.config.update(DIFY_FAIR_MAX_IN_FLIGHT=3, DIFY_FAIR_MAX_IN_FLIGHT_PER_USER=2)
+    alice, bob = make_user('alice'), make_user('bob')
+    web = make_challenge('web')
+    make_submission(bob, web, status='rejected')  # Not a first attempt: no priority lane for Bob
+    noisy = [make_submission(alice, web, status='pending').id for _ in range(5)]
+    quiet = make_submission(bob, web, status='pending').id
+    db.session.commit()
+
+    for submission_id in (*noisy, quiet):
+        enqueue_review(submission_id)
+
+    assert dispatched == [*noisy[:2], quiet]
+    assert queue_metrics()[web.competition_id]['depth'] == 3
+    assert queue_metrics()[web.competition_id]['in_flight'] == 3
+
+
+def test_release_frees_a_slot(app, db, dispatched, make_user, make_challenge, make_submission):
+    app.config.update(DIFY_FAIR_MAX_IN_FLIGHT=1)
+    alice, web = make_user('alice'), make_challenge('web')
+    first, second = (make_submission(alice, web, status='pending').id for _ in range(2))
+    db.session.commit()
+    enqueue_review(first)
+    enqueue_review(second)
+    assert dispatched == [first]
+
+    review_scheduler.release(first)
+
+    assert dispatched == [first, second]
+    review_scheduler.release(first)  # Releasing twice frees nothing more
+    assert queue_metrics()[web.competition_id]['in_flight'] == 1
+
+
+def test_an_expired_in_flight_review_is_reclaimed(app, db, dispatched, monkeypatch, make_user, make_challenge,
+                                                  make_submission):
+    app.config.update(DIFY_FAIR_MAX_IN_FLIGHT=1, DIFY_FAIR_INFLIGHT_TIMEOUT_SECONDS=60)
+    alice, web = make_user('alice'), make_challenge('web')
+    lost, waiting = (make_submission(alice, web, status='pending').id for _ in range(2))
+    db.session.commit()
+    enqueue_review(lost)
+    enqueue_review(waiting)
+    assert pump() == 0
+
+    now = review_scheduler.time.time()
+    monkeypatch.setattr(review_scheduler.time, 'time', lambda: now + 61)
+
+    assert pump() == 1
+    assert dispatched == [lost, waiting]
+    metrics = queue_metrics()[web.competition_id]
+    assert (metrics['in_flight'], metrics['depth']) == (1, 0)
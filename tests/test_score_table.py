@@ -0,0 +1,83 @@
+"""Materialized leaderboard scores stay in sync with submission reviews."""
+from models import ChallengeScore, TeamScore, UserScore
+from services.scoring import rebuild_competition, refresh_submission_score, refresh_team
+
+
+def _user_total(competition, user):
+    row = UserScore.query.filter_by(competition_id=competition.id, user_id=user.id).first()
+    return row.total_points if row else None
+
+
+def test_only_highest_score_per_challenge_counts(db, competition, make_user, make_challenge, make_submission):
+    alice = make_user('alice')
+    web = make_challenge('web', points=100)
+    pwn = make_challenge('pwn', points=200)
+
+    for points, challenge in [(60, web), (90, web), (150, pwn)]:
+        refresh_submission_score(make_submission(alice, challenge, points=points))
+
+    assert _user_total(competition, alice) == 240
+    assert ChallengeScore.query.filter_by(user_id=alice.id, challenge_id=web.id).one().points == 90
+
+
+def test_rejecting_the_only_approval_removes_the_score(db, competition, make_user, make_challenge, make_submission):
+    bob = make_user('bob')
+    web = make_challenge('web')
+    submission = make_submission(bob, web)
+    refresh_submission_score(submission)
+    assert _user_total(competition, bob) == 100
+
+    submission.status = 'rejected'
+    submission.points_awarded = 0
+    refresh_submission_score(submission)
+
+    assert _user_total(competition, bob) is None
+    assert ChallengeScore.query.filter_by(user_id=bob.id).count() == 0
+
+
+def test_team_total_takes_best_member_score_per_challenge(db, competition, make_user, make_team,
+                                                          make_challenge, make_submission):
+    carol, dave = make_user('carol'), make_user('dave')
+    team = make_team('red', carol, members=[dave])
+    web = make_challenge('web')
+    pwn = make_challenge('pwn', points=300)
+
+    refresh_submission_score(make_submission(carol, web, points=40))
+    refresh_submission_score(make_submission(dave, web, points=80))
+    refresh_submission_score(make_submission(dave, pwn, points=300))
+
+    assert TeamScore.query.filter_by(competition_id=competition.id, team_id=team.id).one().total_points == 380
+
+    # Dave leaves: only Carol's score remains for the team.
+    db.session.delete(dave.team_membership)
+    refresh_team(team.id)
+    assert TeamScore.query.filter_by(competition_id=competition.id, team_id=team.id).one().total_points == 40
+
+
+def test_rebuild_matches_incremental_maintenance(db, competition, make_user, make_team,
+                                                 make_challenge, make_submission):
+    erin, frank = make_user('erin'), make_user('frank')
+    make_team('blue', erin)
+    web = make_challenge('web')
+    make_submission(erin, web, points=70)
+    make_submission(frank, web, points=100)
+    make_submission(frank, web, status='rejected')
+
+    rebuild_competition(competition.id)
+
+    assert _user_total(competition, erin) == 70
+    assert _user_total(competition, frank) == 100
+    assert TeamScore.query.filter_by(competition_id=competition.id).one().total_points == 70
+
+
+def test_leaderboard_api_reads_materialized_scores(db, client, competition, make_user, make_challenge,
+                                                   make_submission):
+    grace = make_user('grace')
+    web = make_challenge('web')
+    refresh_submission_score(make_submission(grace, web, points=55))
+    db.session.commit()
+
+    data = client.get(f'/api/leaderboard/{competition.id}').get_json()
+
+    assert data['leaderboard'][0]['username'] == 'grace'
+    assert data['leaderboard'][0]['total_points'] == 55
@@ -0,0 +1,77 @@
+"""Score timeline replays leaderboard rules per bucket and extends incrementally."""
+from services.scoring import refresh_submission_score
+from services.timeline import _apply, _approved_rows, _empty_state, _entity_resolver, _unreplayed_rows
+
+
+def test_timeline_api_buckets_cumulative_best_scores(db, client, competition, make_user, make_challenge,
+                                                     make_submission):
+    alice = make_user('alice')
+    web, pwn = make_challenge('web', 100), make_challenge('pwn', 200)
+    for submission in (
+        make_submission(alice, web, points=40, minutes=0),
+        make_submission(alice, web, points=100, minutes=2),
+        make_submission(alice, web, points=60, minutes=3),
+        make_submission(alice, pwn, points=200, minutes=12),
+    ):
+        refresh_submission_score(submission)
+    db.session.commit()
+
+    data = client.get(f'/api/leaderboard/{competition.id}/timeline?bucket=300').get_json()
+
+    assert data['series'][0]['name'] == 'alice'
+    assert data['series'][0]['points'] == [['2026-01-01T12:00:00', 100], ['2026-01-01T12:10:00', 300]]
+
+
+def test_timeline_team_scope_and_incremental_cursor(db, competition, make_user, make_team, make_challenge,
+                                                    make_submission):
+    alice, bob, carol = make_user('alice'), make_user('bob'), make_user('carol')
+    red = make_team('red', alice, [bob])
+    web, pwn = make_challenge('web'), make_challenge('pwn')
+    make_submission(alice, web, minutes=0)
+    make_submission(carol, web, minutes=1)
+    state = _empty_state()
+    _apply(state, _approved_rows(competition.id, None), _entity_resolver('teams'), 60)
+
+    make_submission(bob, web, minutes=5)
+    make_submission(bob, pwn, minutes=6)
+    new_rows = _unreplayed_rows(competition.id, state)
+    _apply(state, new_rows, _entity_resolver('teams'), 60)
+
+    assert len(new_rows) == 2
+    assert state['totals'] == {str(red.id): 200}
+    assert [points for _, points in state['series'][str(red.id)]] == [100, 200]
+
+
+def test_approval_committed_behind_the_cursor_is_not_skipped(db, client, redis_client, competition, make_user,
+                                                             make_challenge, make_submission):
+    alice, bob = make_user('alice'), make_user('bob')
+    web = make_challenge('web')
+    for submission in (make_submission(alice, web, minutes=0), make_submission(alice, make_challenge('pwn'), minutes=5)):
+        refresh_submission_score(submission)
+    db.session.commit()
+    url = f'/api/leaderboard/{competition.id}/timeline?bucket=60'
+    assert [series['name'] for series in client.get(url).get_json()['series']] == ['alice']
+
+    # Reviewed at minute 3, but committed after the minute-5 approval was replayed.
+    refresh_submission_score(make_submission(bob, web, minutes=3))
+    db.session.commit()
+
+    series = {series['name']: series['points'] for series in client.get(url).get_json()['series']}
+    assert series == {'alice': [['2026-01-01T12:00:00', 100], ['2026-01-01T12:05:00', 200]],
+                      'bob': [['2026-01-01T12:03:00', 100]]}
+
+
+def test_replayed_rows_inside_the_window_are_not_applied_twice(db, competition, make_user, make_challenge,
+                                                               make_submission):
+    alice = make_user('alice')
+    make_submission(alice, make_challenge('web'), minutes=0)
+    state = _empty_state()
+    _apply(state, _approved_rows(competition.id), _entity_resolver('users'), 60)
+
+    assert _unreplayed_rows(competition.id, state) == []
+    make_submission(alice, make_challenge('pwn'), minutes=1)
+    assert len(_unreplayed_rows(competition.id, state)) == 1
+
+
+def test_timeline_rejects_unknown_scope(client, competition):
+    assert client.get(f'/api/leaderboard/{competition.id}/timeline?scope=clans').status_code == 400
@@ -0,0 +1,50 @@
+"""The compiled translation catalog matches translations.json and follows edits to it."""
+import json
+import os
+
+import pytest
+
+from services import translations
+
+
+@pytest.fixture
+def catalog_file(tmp_path, monkeypatch):
+    path = tmp_path / 'translations.json'
+    monkeypatch.setattr(translations, 'CATALOG_PATH', str(path))
+    monkeypatch.setattr(translations, 'RELOAD_CHECK_SECONDS', 0)
+    monkeypatch.setattr(translations, '_catalog', {})
+    monkeypatch.setattr(translations, '_mtime', None)
+    return path
+
+
+def test_catalog_matches_json_load_of_the_shipped_file():
+    with open(translations.CATALOG_PATH, encoding='utf-8') as f:
+        raw = json.load(f)
+    for text, by_locale in raw.items():
+        for locale, translated in by_locale.items():
+            assert translations.gettext(text, locale) == translated
+
+
+def test_last_duplicate_key_wins():
+    raw = json.loads('{"Save": {"zh": "保存"}, "Save": {"zh": "存储", "en": "Save"}}')
+    assert translations.compile_catalog(raw) == {'zh': {'Save': '存储'}, 'en': {'Save': 'Save'}}
+
+
+def test_reloads_when_the_file_changes(catalog_file):
+    catalog_file.write_text(json.dumps({'Save': {'zh': '保存'}}), encoding='utf-8')
+    assert translations.gettext('Save', 'zh') == '保存'
+    assert translations.gettext('Missing', 'zh') == 'Missing'
+    assert translations.gettext('Save', 'fr') == 'Save'
+
+    catalog_file.write_text(json.dumps({'Save': {'zh': '存储'}}), encoding='utf-8')
+    os.utime(catalog_file, ns=(1, 10 ** 18))
+    assert translations.gettext('Save', 'zh') == '存储'
+
+
+def test_a_broken_file_keeps_the_last_good_catalog(catalog_file):
+    catalog_file.write_text(json.dumps({'Save': {'zh': '保存'}}), encoding='utf-8')
+    assert translations.gettext('Save', 'zh') == '保存'
+
+    catalog_file.write_text('{"Save": ', encoding='utf-8')
+    os.utime(catalog_file, ns=(1, 10 ** 18))
+    assert translations.gettext('Save', 'zh') == '保存'
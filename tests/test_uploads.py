@@ -0,0 +1,65 @@
+"""Uploads are served behind content-versioned URLs with strong ETags, ranges and optional offload."""
+import os
+
+import pytest
+from flask import url_for
+
+
+@pytest.fixture
+def upload(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    (tmp_path / 'shot.png').write_bytes(b'0123456789')
+    return tmp_path / 'shot.png'
+
+
+def _url(app, filename='shot.png'):
+    with app.test_request_context():
+        return url_for('uploaded_file', filename=filename)
+
+
+def test_versioned_url_is_immutable(app, client, upload):
+    url = _url(app)
+    assert '?v=' in url
+
+    response = client.get(url)
+
+    assert response.data == b'0123456789'
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert not response.headers['ETag'].startswith('W/')
+    assert client.get('/uploads/shot.png').headers['Cache-Control'] == 'no-cache'
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_changed_file_gets_a_new_url(app, upload):
+    before = _url(app)
+    upload.write_bytes(b'a different screenshot')
+    os.utime(upload, ns=(1, 10 ** 18))
+    assert _url(app) != before
+
+
+def test_range_request(app, client, upload):
+    response = client.get(_url(app), headers={'Range': 'bytes=2-4'})
+    assert response.status_code == 206
+    assert response.data == b'234'
+    assert response.headers['Content-Range'] == 'bytes 2-4/10'
+
+
+def test_x_accel_hands_the_bytes_to_nginx(app, client, upload):
+    app.config['UPLOAD_SERVE_MODE'] = 'x-accel'
+
+    response = client.get(_url(app))
+
+    assert response.headers['X-Accel-Redirect'] == '/_uploads/shot.png'
+    assert response.headers['Content-Type'] == 'image/png'
+    assert response.data == b''
+    assert client.get(_url(app), headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_x_sendfile_names_the_absolute_path(app, client, upload):
+    app.config['UPLOAD_SERVE_MODE'] = 'x-sendfile'
+    assert client.get(_url(app)).headers['X-Sendfile'] == str(upload)
+
+
+def test_paths_outside_the_upload_folder_are_not_served(app, client, upload):
+    assert client.get('/uploads/../conftest.py').status_code == 404
+    assert client.get('/uploads/missing.png').status_code == 404
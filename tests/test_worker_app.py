@@ -0,0 +1,15 @@
+"""Celery tasks share one Flask app per worker process."""
+import app as app_module
+import tasks
+
+
+def test_worker_builds_the_app_once(monkeypatch):
+    built = []
+    monkeypatch.setattr(app_module, 'create_app', lambda: built.append(object()) or built[-1])
+    monkeypatch.setattr(tasks, '_flask_app', None)
+
+    tasks._init_worker_app()
+    first = tasks.get_flask_app()
+
+    assert tasks.get_flask_app() is first
+    assert len(built) == 1